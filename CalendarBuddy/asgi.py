@@ -3,6 +3,10 @@ ASGI config for CalendarBuddy project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve the site through this (e.g. ``uvicorn CalendarBuddy.asgi:application
+--workers 4``) for the live calendar event stream, calendar_app.views.event_stream;
+under WSGI a long-lived streaming response ties up a whole worker.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -85,6 +85,46 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Local memory is per process; point this at Redis/Memcached when running
+# several workers so cache invalidation reaches all of them.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "calendarbuddy",
+    }
+}
+
+# Seconds a computed month view stays cached (invalidated early on change)
+CALENDAR_MONTH_CACHE_TIMEOUT = 60 * 60
+
+# Domain in the UIDs of feed events (task-<id>@<domain>); changing it makes
+# subscribed clients see every event as new
+CALENDAR_UID_DOMAIN = "calendarbuddy"
+
+# Seconds a geocoded address is trusted before it is looked up again, and
+# how long an address with no match is remembered as such
+GEOCODE_TTL = 30 * 24 * 60 * 60
+GEOCODE_NEGATIVE_TTL = 24 * 60 * 60
+# Addresses kept in each process's in-memory cache
+GEOCODE_LRU_SIZE = 1024
+# Requests per second sent to Nominatim by all processes together (its
+# usage policy allows one)
+GEOCODE_RATE = 1
+
+# Seconds a weather.gov forecast is reused when it has no caching headers,
+# and how long an expired one is still shown while it is refreshed
+WEATHER_FORECAST_TTL = 60 * 60
+WEATHER_STALE_TTL = 24 * 60 * 60
+
+# Failures in a row that open an upstream API's circuit breaker, and the
+# seconds it stays open before one probe request is let through
+UPSTREAM_FAILURE_THRESHOLD = 5
+UPSTREAM_RESET_TIMEOUT = 30
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
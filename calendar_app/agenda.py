@@ -0,0 +1,131 @@
+"""
+Keyset pagination for the agenda: visible tasks in (date, start_time, id)
+order, all-day tasks first within a day.
+
+A cursor is the sort key of the last task on the previous page, and the
+next page is whatever sorts after it. The database seeks straight to that
+key on the (user, date) visibility index instead of counting past an
+OFFSET, so page 500 costs what page 1 does. Recurring series are expanded
+in Python between the cursor and the last one-off task on the page.
+"""
+import base64
+import heapq
+from datetime import date, time, timedelta
+
+from django.db.models import F, Q
+
+from home import recurrence
+from home.models import Task
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+# How far past the cursor series are expanded when the page is not already
+# filled by one-off tasks and the range is open-ended
+LOOKAHEAD_DAYS = 5 * 366
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def sort_key(task):
+    # None sorts before any time, like NULLS FIRST
+    return (
+        task.date,
+        task.start_time is not None,
+        task.start_time or time.min,
+        task.id,
+    )
+
+
+def encode_cursor(task):
+    start = task.start_time.isoformat() if task.start_time is not None else ""
+    raw = f"{task.date.isoformat()}|{start}|{task.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(value):
+    """(date, start_time or None, id) from encode_cursor's output"""
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode()
+        day, start, task_id = raw.split("|")
+        return (
+            date.fromisoformat(day),
+            time.fromisoformat(start) if start else None,
+            int(task_id),
+        )
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise InvalidCursor(value) from exc
+
+
+def _after(cursor):
+    """Q for one-off tasks sorting after the cursor"""
+    day, start, task_id = cursor
+    if start is None:
+        same_day = Q(start_time__isnull=False) | Q(start_time__isnull=True, id__gt=task_id)
+    else:
+        same_day = Q(start_time__gt=start) | Q(start_time=start, id__gt=task_id)
+    return Q(visibility__date__gt=day) | Q(visibility__date=day) & same_day
+
+
+def page(user, start, end=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Up to `limit` tasks visible to the user dated in [start, end] (end may
+    be None for open-ended) and sorting after `cursor`, plus the cursor
+    for the next page or None on the last one.
+    """
+    if cursor is not None:
+        start = max(start, cursor[0])
+        cursor_key = (cursor[0], cursor[1] is not None, cursor[1] or time.min, cursor[2])
+
+    # Every visibility lookup goes in one filter() so they share the join
+    lookups = {"visibility__user": user, "visibility__date__gte": start}
+    if end is not None:
+        lookups["visibility__date__lte"] = end
+    seek = [_after(cursor)] if cursor is not None else []
+    one_offs = list(
+        Task.objects.select_related("assigned_by", "group")
+        .filter(*seek, recurrence="", **lookups)
+        .order_by("visibility__date", F("start_time").asc(nulls_first=True), "id")[
+            : limit + 1
+        ]
+    )
+
+    # Series occurrences can only land on this page up to the last
+    # one-off date it could show
+    if len(one_offs) > limit:
+        horizon = one_offs[limit - 1].date
+    elif end is not None:
+        horizon = end
+    else:
+        horizon = start + min(timedelta(days=LOOKAHEAD_DAYS), date.max - start)
+
+    occurrences = []
+    for series in Task.objects.select_related("assigned_by", "group").series_visible_to(
+        user, start, horizon
+    ):
+        # Lazily, so a series stops once it has filled a page on its own
+        dates = recurrence.iter_occurrence_dates(
+            series.date,
+            series.recurrence,
+            series.recurrence_interval,
+            start,
+            horizon,
+            until=series.recurrence_until,
+            count=series.recurrence_count,
+            exceptions=series.recurrence_exceptions,
+        )
+        taken = 0
+        for day in dates:
+            key = (day, series.start_time is not None, series.start_time or time.min, series.id)
+            if cursor is not None and key <= cursor_key:
+                continue
+            occurrences.extend(series.occurrences_between(day, day))
+            taken += 1
+            if taken > limit:
+                break
+
+    items = list(heapq.merge(one_offs, sorted(occurrences, key=sort_key), key=sort_key))
+    next_cursor = encode_cursor(items[limit - 1]) if len(items) > limit else None
+    return items[:limit], next_cursor
@@ -0,0 +1,349 @@
+import heapq
+import itertools
+import json
+from datetime import date, time
+
+from django.contrib.auth.decorators import login_required
+from django.db.models import Q
+from django.http import JsonResponse
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_GET, require_POST
+
+from home.decorators import user_data_condition
+from home import bulk, recurrence
+from home.models import RULE_FIELDS, Task, TaskTombstone, TaskVisibility
+from . import agenda
+
+# Longest window a single request may ask for
+MAX_RANGE_DAYS = 400
+
+COLOR_CODES = [value for value, _ in Task.COLOR_CHOICES]
+CATEGORY_CODES = [""] + [value for value, _ in Task.CATEGORY_CHOICES]
+
+
+def _minutes(value):
+    return None if value is None else value.hour * 60 + value.minute
+
+
+def _code(table):
+    index = {value: i for i, value in enumerate(table)}
+    return lambda value: index.get(value)
+
+
+# API field -> (model column, encoder)
+TASK_FIELDS = {
+    "id": ("id", None),
+    "date": ("date", None),  # encoded relative to `start`, see tasks_api
+    "start": ("start_time", _minutes),
+    "end": ("end_time", _minutes),
+    "color": ("color", _code(COLOR_CODES)),
+    "category": ("category", _code(CATEGORY_CODES)),
+    "title": ("title", None),
+    "location": ("location", None),
+    "completed": ("completed", int),
+    "group": ("group_id", None),
+    "project": ("project_id", None),
+}
+DEFAULT_FIELDS = ["id", "date", "start", "end", "color", "category", "title"]
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@require_GET
+@login_required
+@gzip_page
+@user_data_condition("api-tasks")
+def tasks_api(request):
+    """
+    Visible tasks in [start, end] as parallel arrays, one per field.
+
+    `date` is days since `start`, `start`/`end` are minutes since midnight
+    (null for all-day tasks), and `color`/`category` index into the
+    `colors`/`categories` tables sent alongside. Choose columns with
+    ?fields=id,date,title. Rows come straight from one indexed
+    values_list() query, without building Task objects; recurring series
+    come from a second, small query and are expanded for the window only.
+    """
+    start = _parse_date(request.GET.get("start"))
+    end = _parse_date(request.GET.get("end"))
+    if start is None or end is None:
+        return JsonResponse(
+            {"error": "start and end are required (YYYY-MM-DD)."}, status=400
+        )
+    if end < start or (end - start).days > MAX_RANGE_DAYS:
+        return JsonResponse(
+            {"error": f"end must be on or after start and within {MAX_RANGE_DAYS} days."},
+            status=400,
+        )
+
+    fields = request.GET.get("fields")
+    # Each field once, in the order asked for
+    fields = (
+        list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        if fields
+        else DEFAULT_FIELDS
+    )
+    if not fields:
+        return JsonResponse(
+            {"error": "Ask for at least one field.", "fields": list(TASK_FIELDS)}, status=400
+        )
+    unknown = [f for f in fields if f not in TASK_FIELDS]
+    if unknown:
+        return JsonResponse(
+            {"error": f"Unknown fields: {', '.join(unknown)}", "fields": list(TASK_FIELDS)},
+            status=400,
+        )
+
+    columns = [TASK_FIELDS[f][0] for f in fields]
+    # Every row is prefixed with its sort key (date, start_time, id)
+    rows = list(
+        Task.objects.visible_to(request.user, start=start, end=end)
+        .filter(recurrence="")
+        .order_by("date", "start_time", "id")
+        .values_list("date", "start_time", "id", *columns)
+    )
+
+    # Recurring series: one row each, expanded for this window only
+    series = (
+        Task.objects.series_visible_to(request.user, start, end)
+        .order_by()
+        .values_list("date", "start_time", "id", *RULE_FIELDS, *columns)
+    )
+    date_index = columns.index("date") if "date" in columns else None
+    expanded = False
+    for row in series:
+        first, start_time, task_id = row[:3]
+        freq, interval, until, count, exceptions = row[3 : 3 + len(RULE_FIELDS)]
+        values = list(row[3 + len(RULE_FIELDS) :])
+        for day in recurrence.occurrence_dates(
+            first, freq, interval, start, end, until=until, count=count, exceptions=exceptions
+        ):
+            if date_index is not None:
+                values[date_index] = day
+            rows.append((day, start_time, task_id, *values))
+            expanded = True
+    if expanded:
+        rows.sort(key=lambda row: (row[0], row[1] or time.min, row[2]))
+
+    encoders = []
+    for f in fields:
+        if f == "date":
+            encoders.append(lambda value: (value - start).days)
+        else:
+            encoders.append(TASK_FIELDS[f][1])
+
+    data = {f: [] for f in fields}
+    appenders = [(data[f].append, encoder) for f, encoder in zip(fields, encoders)]
+    for row in rows:
+        for value, (append, encoder) in zip(row[3:], appenders):
+            append(value if encoder is None else encoder(value))
+
+    payload = {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "count": len(data[fields[0]]),
+        "fields": fields,
+        "columns": data,
+    }
+    if "color" in fields:
+        payload["colors"] = COLOR_CODES
+    if "category" in fields:
+        payload["categories"] = CATEGORY_CODES
+    return JsonResponse(payload)
+
+
+def _agenda_item(task):
+    return {
+        "id": task.id,
+        "date": task.date.isoformat(),
+        "start": task.start_time.strftime("%H:%M") if task.start_time else None,
+        "end": task.end_time.strftime("%H:%M") if task.end_time else None,
+        "title": task.title,
+        "location": task.location,
+        "color": task.color,
+        "completed": task.completed,
+        "recurring": task.is_recurring(),
+    }
+
+
+@require_GET
+@login_required
+@user_data_condition("api-agenda")
+def agenda_api(request):
+    """
+    One page of the agenda, for infinite scroll. Pass back `next` as
+    ?cursor= to get the following page; it is null on the last one.
+    ?start= defaults to today, ?end= is optional, ?limit= up to 100.
+    """
+    start = _parse_date(request.GET.get("start")) if request.GET.get("start") else date.today()
+    end = _parse_date(request.GET.get("end")) if request.GET.get("end") else None
+    if start is None or (request.GET.get("end") and end is None):
+        return JsonResponse({"error": "start and end must be YYYY-MM-DD."}, status=400)
+
+    try:
+        limit = int(request.GET.get("limit", agenda.DEFAULT_PAGE_SIZE))
+        cursor = request.GET.get("cursor")
+        cursor = agenda.decode_cursor(cursor) if cursor else None
+    except ValueError:
+        return JsonResponse({"error": "Invalid limit or cursor."}, status=400)
+    if not 1 <= limit <= agenda.MAX_PAGE_SIZE:
+        return JsonResponse(
+            {"error": f"limit must be between 1 and {agenda.MAX_PAGE_SIZE}."}, status=400
+        )
+
+    items, next_cursor = agenda.page(request.user, start, end, cursor, limit)
+    return JsonResponse({
+        "items": [_agenda_item(task) for task in items],
+        "next": next_cursor,
+    })
+
+
+# Columns sent for every upserted task in the change feed
+CHANGE_FIELDS = [
+    "id", "title", "description", "date", "start_time", "end_time", "location",
+    "color", "category", "completed", "user_id", "group_id", "project_id",
+    "is_deletable", *RULE_FIELDS, "updated_at",
+]
+CHANGES_PAGE_SIZE = 500
+
+UPSERT, DELETE = 0, 1
+
+
+def _parse_change_cursor(value):
+    """(seq, kind, id) from `since`; a bare number means "after seq\""""
+    parts = value.split(".")
+    if len(parts) == 1:
+        return int(parts[0]), DELETE, 0
+    seq, kind, row_id = map(int, parts)
+    if kind not in (UPSERT, DELETE):
+        raise ValueError(value)
+    return seq, kind, row_id
+
+
+def _json_value(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+@require_GET
+@login_required
+@gzip_page
+def changes_api(request):
+    """
+    Delta sync. Without ?since= this is a full snapshot of the user's
+    tasks; pass back `cursor` as ?since= to get only what changed after
+    it: {"op": "upsert", "task": {...}} for tasks created, edited or newly
+    visible, {"op": "delete", "id": ...} for tasks deleted or no longer
+    visible. Keep calling while `has_more` is true.
+
+    Rows are ordered by `seq`, the user's data version at the time of the
+    change (see UserDataVersion.stamp), not by updated_at: versions are
+    handed out in commit order, so a cursor can't skip a concurrent
+    writer's rows the way a timestamp could.
+    """
+    since = request.GET.get("since")
+    try:
+        cursor = _parse_change_cursor(since) if since else None
+        limit = int(request.GET.get("limit", CHANGES_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({"error": "Invalid since or limit."}, status=400)
+    if not 1 <= limit <= CHANGES_PAGE_SIZE:
+        return JsonResponse(
+            {"error": f"limit must be between 1 and {CHANGES_PAGE_SIZE}."}, status=400
+        )
+
+    # Keyset over (seq, kind, id): upserts sort before deletes of the same seq
+    upserts = TaskVisibility.objects.filter(user=request.user, seq__gt=0)
+    deletes = TaskTombstone.objects.filter(user=request.user, seq__gt=0)
+    if cursor is None:
+        deletes = deletes.none()  # a snapshot has nothing to delete
+    else:
+        seq, kind, row_id = cursor
+        if kind == UPSERT:
+            upserts = upserts.filter(Q(seq__gt=seq) | Q(seq=seq, id__gt=row_id))
+            deletes = deletes.filter(seq__gte=seq)
+        else:
+            upserts = upserts.filter(seq__gt=seq)
+            deletes = deletes.filter(Q(seq__gt=seq) | Q(seq=seq, id__gt=row_id))
+
+    upsert_rows = list(
+        upserts.order_by("seq", "id").values_list(
+            "seq", "id", *(f"task__{field}" for field in CHANGE_FIELDS)
+        )[: limit + 1]
+    )
+    delete_rows = list(
+        deletes.order_by("seq", "id").values_list("seq", "id", "task_id")[: limit + 1]
+    )
+
+    merged = heapq.merge(
+        ((row[0], UPSERT, row[1], row) for row in upsert_rows),
+        ((row[0], DELETE, row[1], row) for row in delete_rows),
+    )
+    changes = []
+    last = cursor or (0, DELETE, 0)
+    for seq, kind, row_id, row in itertools.islice(merged, limit):
+        if kind == UPSERT:
+            task = {field: _json_value(value) for field, value in zip(CHANGE_FIELDS, row[2:])}
+            changes.append({"op": "upsert", "task": task})
+        else:
+            changes.append({"op": "delete", "id": row[2]})
+        last = (seq, kind, row_id)
+
+    return JsonResponse({
+        "changes": changes,
+        "cursor": "%d.%d.%d" % last,
+        "has_more": len(upsert_rows) + len(delete_rows) > len(changes),
+    })
+
+
+@require_POST
+@login_required
+def bulk_tasks_api(request):
+    """
+    Apply one operation to many tasks: POST a JSON body like
+    {"op": "move", "ids": [1, 2, 3], "date": "2026-03-01"}.
+
+    `op` is "complete", "delete", "move" (needs `date`) or "recolor"
+    (needs `color`). Everything happens in one transaction with one
+    UPDATE or DELETE; see home.bulk. Each id gets a result: "ok",
+    "not_found" (not visible to you), "forbidden" (assigned tasks
+    their group made undeletable) or "recurring" (series can't be
+    completed or moved in bulk, only a date at a time).
+    """
+    try:
+        body = json.loads(request.body)
+        op = body["op"]
+        ids = [int(task_id) for task_id in body["ids"]]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"error": "Send JSON with op and a list of ids."}, status=400)
+    if op not in bulk.OPERATIONS:
+        return JsonResponse(
+            {"error": f"op must be one of {', '.join(bulk.OPERATIONS)}."}, status=400
+        )
+    if not 1 <= len(ids) <= bulk.MAX_TASKS:
+        return JsonResponse(
+            {"error": f"Send between 1 and {bulk.MAX_TASKS} ids."}, status=400
+        )
+
+    params = {}
+    if op == "move":
+        params["date"] = _parse_date(body.get("date"))
+        if params["date"] is None:
+            return JsonResponse({"error": "date is required (YYYY-MM-DD)."}, status=400)
+    elif op == "recolor":
+        params["color"] = body.get("color")
+        if params["color"] not in COLOR_CODES:
+            return JsonResponse(
+                {"error": f"color must be one of {', '.join(COLOR_CODES)}."}, status=400
+            )
+
+    results = bulk.apply(request.user, ids, op, **params)
+    return JsonResponse({
+        "op": op,
+        "count": sum(status == bulk.OK for status in results.values()),
+        "results": [{"id": task_id, "status": status} for task_id, status in results.items()],
+    })
@@ -0,0 +1,143 @@
+"""
+Per-user month cache for calendar_view (and the week/day grids).
+
+Each (user, year, month) has a version token stored in the cache, and each
+user has one more for changes that can touch any month (recurring series).
+Payload keys embed both tokens, so invalidating is a single write that
+orphans every cached variant (one per search/filter combination).
+Tokens are random rather than counters: if one is evicted the month simply
+gets a fresh token and can never collide with an older payload.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+MONTH_CACHE_TIMEOUT = getattr(settings, "CALENDAR_MONTH_CACHE_TIMEOUT", 60 * 60)
+
+HITS_KEY = "calendar:month:hits"
+MISSES_KEY = "calendar:month:misses"
+
+
+def _version_key(user_id, year, month):
+    return f"calendar:month:v:{user_id}:{year}:{month}"
+
+
+def _user_version_key(user_id):
+    return f"calendar:month:v:{user_id}:*"
+
+
+def _versions(*keys):
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def normalize_filters(cleaned_data):
+    """Stable string for a CalendarSearchForm's cleaned data"""
+    parts = []
+    for name in sorted(cleaned_data or {}):
+        value = cleaned_data[name]
+        if value in (None, ""):
+            continue
+        if hasattr(value, "isoformat"):
+            value = value.isoformat()
+        parts.append(f"{name}={str(value).strip().lower()}")
+    return "&".join(parts)
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Counter missing or evicted; start it again
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def _get_or_compute(key, compute):
+    payload = cache.get(key)
+    if payload is not None:
+        _count(HITS_KEY)
+        return payload
+
+    _count(MISSES_KEY)
+    payload = compute()
+    cache.set(key, payload, MONTH_CACHE_TIMEOUT)
+    return payload
+
+
+def get_month(user_id, year, month, filters, compute):
+    """
+    Return the cached month payload, calling compute() to build it on a miss.
+    """
+    user_version, month_version = _versions(
+        _user_version_key(user_id), _version_key(user_id, year, month)
+    )
+    digest = hashlib.md5(normalize_filters(filters).encode()).hexdigest()
+    key = (
+        f"calendar:month:{user_id}:{year}:{month}:"
+        f"{user_version}:{month_version}:{digest}"
+    )
+    return _get_or_compute(key, compute)
+
+
+def get_window(user_id, kind, start, end, compute):
+    """
+    Like get_month for any date range (a week or day grid, a whole year).
+    The key embeds the version of every month the range touches, so the
+    usual month invalidation covers it.
+    """
+    months = [
+        divmod(index, 12)
+        for index in range(start.year * 12 + start.month - 1, end.year * 12 + end.month)
+    ]
+    versions = _versions(
+        _user_version_key(user_id),
+        *(_version_key(user_id, year, month + 1) for year, month in months),
+    )
+    # A year spans 13 tokens; hash them to stay within memcached's key limit
+    digest = hashlib.md5(":".join(versions).encode()).hexdigest()
+    key = f"calendar:{kind}:{user_id}:{start.isoformat()}:{end.isoformat()}:{digest}"
+    return _get_or_compute(key, compute)
+
+
+def invalidate(changes):
+    """
+    Bump the version of every (user, month) touched by `changes`, an
+    iterable of (user_id, date) pairs; a None date bumps all of the user's
+    months. Done now and again on commit, so a reader that refilled the
+    cache from the pre-commit state is discarded.
+    """
+    keys = {
+        _user_version_key(user_id) if d is None else _version_key(user_id, d.year, d.month)
+        for user_id, d in changes
+    }
+    if not keys:
+        return
+
+    def bump():
+        cache.set_many({key: uuid.uuid4().hex for key in keys}, None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / total if total else 0.0,
+    }
+
+
+def reset_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
@@ -0,0 +1,168 @@
+"""
+Cross-process pub/sub for live calendar updates (see views.event_stream).
+
+Every worker process with at least one open event stream binds a Unix
+datagram socket in CALENDAR_EVENTS_DIR. publish() sends each event once
+to every socket there, and the receiving process hands it to the queues
+of just the subscribers it is addressed to. So a change costs one
+datagram per worker plus one queue put per subscriber, and idle tabs
+cost nothing until something happens.
+
+Sockets left behind by dead workers are removed the first time a publish
+to them is refused.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import tempfile
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Events waiting for a slow client before it is told to refresh instead
+QUEUE_SIZE = 100
+# Largest event we send; events are a few hundred bytes
+MAX_DATAGRAM = 8192
+
+REFRESH = {"type": "refresh"}
+# Users per REFRESH datagram, which keeps each well under MAX_DATAGRAM
+REFRESH_BATCH = 500
+
+
+def events_dir():
+    return getattr(
+        settings,
+        "CALENDAR_EVENTS_DIR",
+        os.path.join(tempfile.gettempdir(), "calendarbuddy-events"),
+    )
+
+
+def publish(user_ids, event):
+    """Send `event` (a JSON-able dict) to every subscriber among `user_ids`"""
+    user_ids = sorted(set(user_ids))
+    directory = events_dir()
+    if not user_ids or not os.path.isdir(directory):
+        return
+    datagrams = [_encode(user_ids, event)]
+    if len(datagrams[0]) > MAX_DATAGRAM:
+        # Huge fan-outs (e.g. a big group) just ask those tabs to reload,
+        # a batch of users at a time
+        datagrams = [
+            _encode(user_ids[i : i + REFRESH_BATCH], REFRESH)
+            for i in range(0, len(user_ids), REFRESH_BATCH)
+        ]
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        sock.setblocking(False)
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            try:
+                for data in datagrams:
+                    sock.sendto(data, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Nobody listening any more
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            except OSError as exc:
+                # A full socket buffer drops the event for that worker only
+                logger.warning("Dropped calendar event for %s: %s", path, exc)
+
+
+def _encode(user_ids, event):
+    return json.dumps({"users": user_ids, "event": event}, separators=(",", ":")).encode()
+
+
+class Subscription:
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = user_id
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too far behind to be useful; replace the backlog with a refresh
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(REFRESH)
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class _Protocol(asyncio.DatagramProtocol):
+    def __init__(self, broker):
+        self.broker = broker
+
+    def datagram_received(self, data, addr):
+        try:
+            message = json.loads(data)
+        except ValueError:
+            return
+        self.broker.dispatch(message["users"], message["event"])
+
+
+class Broker:
+    """This process's subscribers, and the socket that feeds them"""
+
+    def __init__(self):
+        self.subscribers = {}  # user_id -> set of Subscription
+        self.transport = None
+        self.path = None
+        self.loop = None
+
+    async def subscribe(self, user_id):
+        await self._listen()
+        subscription = Subscription(self, user_id)
+        self.subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscribers = self.subscribers.get(subscription.user_id, set())
+        subscribers.discard(subscription)
+        if not subscribers:
+            self.subscribers.pop(subscription.user_id, None)
+        if not self.subscribers:
+            self._close()
+
+    def dispatch(self, user_ids, event):
+        for user_id in user_ids:
+            for subscription in self.subscribers.get(user_id, ()):
+                subscription.put(event)
+
+    async def _listen(self):
+        loop = asyncio.get_running_loop()
+        if self.transport is not None and self.loop is loop:
+            return
+        self._close()
+        directory = events_dir()
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{os.getpid()}-{id(loop)}.sock")
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.transport, _ = await loop.create_datagram_endpoint(
+            lambda: _Protocol(self), local_addr=self.path, family=socket.AF_UNIX
+        )
+        self.loop = loop
+
+    def _close(self):
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+        if self.path:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+
+broker = Broker()
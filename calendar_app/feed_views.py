@@ -0,0 +1,142 @@
+"""
+iCalendar subscription feeds. Calendar clients poll these every few
+minutes without a session, so the URL carries the user's FeedToken.
+
+The ETag is built from data versions alone: an unchanged poll is answered
+with a 304 after a single token/version lookup (a few, for project feeds)
+and never reads task rows. A changed feed is streamed from the database into the response
+and kept in the cache under its ETag for the next client that polls.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.db.models import Q
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import redirect
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.views.decorators.http import require_POST, require_safe
+
+from home.models import FeedToken, ProjectMembership, Task, TaskVisibility, UserDataVersion
+from . import ics
+
+FEED_CACHE_TIMEOUT = getattr(settings, "CALENDAR_FEED_CACHE_TIMEOUT", 24 * 60 * 60)
+# Right-hand side of every event UID. Fixed rather than the request's host,
+# so a cached feed is the same whichever hostname it was generated for
+UID_DOMAIN = getattr(settings, "CALENDAR_UID_DOMAIN", "calendarbuddy")
+# Rows fetched from the database per round trip while generating a feed
+FEED_CHUNK_SIZE = 500
+
+CONTENT_TYPE = "text/calendar; charset=utf-8"
+
+
+def _caching(chunks, key):
+    """Pass the chunks through, then cache the whole feed once it's done"""
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    cache.set(key, "".join(parts), FEED_CACHE_TIMEOUT)
+
+
+def _feed_response(request, etag, tasks, name, filename):
+    """304, cached feed or freshly streamed feed, in that order of preference"""
+    etag = quote_etag(etag)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        key = f"calendar:feed:{etag}"
+        body = cache.get(key)
+        if body is not None:
+            response = HttpResponse(body, content_type=CONTENT_TYPE)
+        else:
+            chunks = ics.calendar(
+                tasks.values(*ics.EVENT_FIELDS).iterator(chunk_size=FEED_CHUNK_SIZE),
+                name,
+                UID_DOMAIN,
+            )
+            response = StreamingHttpResponse(_caching(chunks, key), content_type=CONTENT_TYPE)
+        response["Content-Disposition"] = f'inline; filename="{filename}"'
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@require_safe
+def user_feed(request, token):
+    """Everything the token's owner can see, as an .ics subscription"""
+    row = (
+        FeedToken.objects.filter(token=token)
+        .values_list("user_id", "user__username", "user__data_version__version")
+        .first()
+    )
+    if row is None:
+        raise Http404("No such feed")
+    user_id, username, version = row
+
+    tasks = Task.objects.visible_to(user_id).order_by("visibility__date", "id")
+    return _feed_response(
+        request,
+        f"ics-user-{user_id}-{version or 0}",
+        tasks,
+        f"CalendarBuddy ({username})",
+        "calendarbuddy.ics",
+    )
+
+
+@require_safe
+def project_feed(request, token, project_id):
+    """
+    A project's shared calendar as an .ics subscription: the members'
+    tasks plus the project's own, like project_calendar. Only members'
+    tokens work.
+
+    The project's own tasks can be seen, and changed, by people outside
+    it (a group task filed under the project, say), so the ETag covers
+    the data versions of everyone who sees one as well as the members'.
+    """
+    row = (
+        ProjectMembership.objects.filter(project_id=project_id, user__feed_token__token=token)
+        .values_list("project__name", flat=True)
+        .first()
+    )
+    if row is None:
+        raise Http404("No such feed")
+
+    # Any member's change, or a change of members, changes the feed
+    members = list(
+        ProjectMembership.objects.filter(project_id=project_id)
+        .order_by("user_id")
+        .values_list("user_id", "user__data_version__version")
+    )
+    viewers = list(
+        TaskVisibility.objects.filter(task__project_id=project_id)
+        .order_by("user_id")
+        .values_list("user_id", "user__data_version__version")
+        .distinct()
+    )
+    digest = hashlib.md5(repr((members, viewers)).encode()).hexdigest()
+
+    member_ids = [user_id for user_id, _ in members]
+    tasks = Task.objects.filter(Q(user_id__in=member_ids) | Q(project_id=project_id)).order_by(
+        "date", "id"
+    )
+    return _feed_response(
+        request,
+        f"ics-project-{project_id}-{digest}",
+        tasks,
+        f"CalendarBuddy: {row}",
+        f"project-{project_id}.ics",
+    )
+
+
+@require_POST
+@login_required
+def reset_feed_token(request):
+    """New feed URLs; clients subscribed with the old ones stop updating"""
+    FeedToken.for_user(request.user).reset()
+    # The account page shows the URL, so let its ETag change too
+    UserDataVersion.bump([request.user.pk])
+    messages.success(request, "Your calendar feed links have been reset.")
+    return redirect("account_dashboard")
@@ -0,0 +1,267 @@
+"""
+Address -> coordinates for the map on user_page, backed by Nominatim.
+
+Tasks are geocoded when they are written, not when the page is shown:
+saving a task with an unresolved location queues its id (see
+signals.queue_geocoding) and a background thread looks it up and links the
+task to a home.models.Location. user_page only reads those stored
+coordinates, and queues whatever is still missing or out of date for next
+time.
+
+Results are kept in Location rows, shared by every task with the same
+(normalized) address, with a small in-process LRU in front. Addresses
+Nominatim has no match for are stored too, for the shorter
+GEOCODE_NEGATIVE_TTL, so a typo isn't looked up again on every save.
+Timeouts and error responses are never stored.
+
+Nominatim allows one request per second per application, however many
+web processes it runs, so every request first waits for its slot from a
+Throttle kept in the database (a home.models.RateLimit row): GEOCODE_RATE
+requests a second across all processes. Each process has its own worker
+thread and in-memory LRU; they only save work, the limit doesn't rely on
+them.
+"""
+import json
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from home.models import Location, RateLimit, Task, TaskVisibility, UserDataVersion
+from . import upstream
+
+logger = logging.getLogger(__name__)
+
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+USER_AGENT = "calendar_buddy_app"
+# Seconds to wait for Nominatim
+TIMEOUT = 5
+
+TTL = getattr(settings, "GEOCODE_TTL", 30 * 24 * 60 * 60)
+NEGATIVE_TTL = getattr(settings, "GEOCODE_NEGATIVE_TTL", 24 * 60 * 60)
+LRU_SIZE = getattr(settings, "GEOCODE_LRU_SIZE", 1024)
+# Requests per second sent to Nominatim, from all processes together
+RATE = getattr(settings, "GEOCODE_RATE", 1)
+
+# A lookup that failed, as opposed to one that found nothing
+ERRORS = (requests.RequestException, ValueError, KeyError, IndexError)
+
+_MAX_QUERY = Location._meta.get_field("query").max_length
+
+
+def normalize(address):
+    """The cache key for an address: case-folded, whitespace collapsed"""
+    return " ".join(address.split()).casefold()[:_MAX_QUERY]
+
+
+def is_fresh(location, now=None):
+    ttl = TTL if location.found else NEGATIVE_TTL
+    return (now or timezone.now()) - location.fetched_at < timedelta(seconds=ttl)
+
+
+def stored_place(task):
+    """The task's Location if it still matches task.location, else None"""
+    if not task.place_id:
+        return None
+    place = task.place
+    return place if place.query == normalize(task.location) else None
+
+
+def needs_lookup(task):
+    if not task.location.strip():
+        return False
+    place = stored_place(task)
+    return place is None or not is_fresh(place)
+
+
+class LRU:
+    """Thread-safe {query: Location} holding at most `size` entries"""
+
+    def __init__(self, size):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, query):
+        with self._lock:
+            location = self._items.get(query)
+            if location is None:
+                return None
+            if not is_fresh(location):
+                del self._items[query]
+                return None
+            self._items.move_to_end(query)
+            return location
+
+    def put(self, query, location):
+        with self._lock:
+            self._items[query] = location
+            self._items.move_to_end(query)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class Throttle:
+    """`rate` calls a second across every process sharing `name`; take() blocks"""
+
+    def __init__(self, name, rate):
+        self.name = name
+        self.rate = rate
+
+    def take(self):
+        # The slot is reserved now, even if it has to be waited for
+        delay = RateLimit.reserve(self.name, 1 / self.rate)
+        if delay:
+            time.sleep(delay)
+
+
+_lru = LRU(LRU_SIZE)
+throttle = Throttle("nominatim", RATE)
+# While Nominatim is down, queued tasks are skipped instead of each waiting
+# for a timeout; user_page queues them again
+breaker = upstream.CircuitBreaker("nominatim")
+
+
+def clear():
+    """Forget this process's in-memory results (the table is untouched)"""
+    _lru.clear()
+
+
+def fetch(query):
+    """
+    (lat, lon) from Nominatim, or None when it has no match. Raises
+    requests.RequestException or ValueError when the lookup failed.
+    """
+    if breaker.state == upstream.OPEN:
+        # Don't wait for a slot just to be turned away
+        raise upstream.Unavailable("nominatim is unavailable")
+    throttle.take()
+    response, body = upstream.get(
+        breaker,
+        NOMINATIM_URL,
+        params={"q": query, "format": "json", "limit": 1},
+        headers={"User-Agent": USER_AGENT},
+        timeout=TIMEOUT,
+    )
+    response.raise_for_status()
+    data = json.loads(body)
+    if not data:
+        return None
+    return float(data[0]["lat"]), float(data[0]["lon"])
+
+
+def lookup(address):
+    """
+    The Location for `address` (check .found), or None if it is blank or
+    couldn't be looked up right now.
+    """
+    query = normalize(address)
+    if not query:
+        return None
+    location = _lru.get(query)
+    if location is not None:
+        return location
+
+    location = Location.objects.filter(query=query).first()
+    if location is None or not is_fresh(location):
+        try:
+            coordinates = fetch(query)
+        except ERRORS as exc:
+            logger.warning("Geocoding %r failed: %s", query, exc)
+            # Better an old match than none
+            return location if location is not None and location.found else None
+        latitude, longitude = coordinates or (None, None)
+        # One upsert statement, so the worker never holds a read lock it
+        # then has to upgrade while a request is writing
+        (location,) = Location.objects.bulk_create(
+            [
+                Location(
+                    query=query,
+                    latitude=latitude,
+                    longitude=longitude,
+                    found=coordinates is not None,
+                    fetched_at=timezone.now(),
+                )
+            ],
+            update_conflicts=True,
+            unique_fields=["query"],
+            update_fields=["latitude", "longitude", "found", "fetched_at"],
+        )
+        if location.pk is None:
+            location = Location.objects.get(query=query)
+    _lru.put(query, location)
+    return location
+
+
+def geocode_tasks(task_ids):
+    """
+    Look up the locations of the tasks among `task_ids` that need it and
+    link them, each distinct address once. Runs on the worker.
+    """
+    by_query = {}
+    tasks = Task.objects.filter(id__in=task_ids).exclude(location="").select_related("place")
+    for task in tasks:
+        if needs_lookup(task):
+            by_query.setdefault(normalize(task.location), []).append(task.pk)
+    mapped = []
+    for query, ids in by_query.items():
+        location = lookup(query)
+        if location is None:
+            continue
+        # Not an edit, so no tasks_changed
+        Task.objects.filter(id__in=ids).exclude(place=location).update(place=location)
+        if location.found:
+            mapped.extend(ids)
+    if mapped:
+        # New markers for user_page, whose ETag follows the data version
+        UserDataVersion.bump(
+            TaskVisibility.objects.filter(task_id__in=mapped).values_list("user_id", flat=True)
+        )
+
+
+class Worker:
+    """A daemon thread working through queued task ids, started on demand"""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def enqueue(self, task_ids):
+        with self._lock:
+            task_ids = set(task_ids) - self._pending
+            if not task_ids:
+                return
+            self._pending |= task_ids
+            self._queue.put(task_ids)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="geocoder", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            task_ids = self._queue.get()
+            try:
+                geocode_tasks(task_ids)
+            except Exception:
+                logger.exception("Geocoding tasks %s failed", sorted(task_ids))
+            finally:
+                with self._lock:
+                    self._pending -= task_ids
+                connection.close()
+                self._queue.task_done()
+
+
+worker = Worker()
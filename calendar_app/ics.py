@@ -0,0 +1,310 @@
+"""
+iCalendar (RFC 5545) output for subscription feeds (see feed_views), and
+the reader behind the bulk importer (see importer).
+
+Tasks have no time zone, so times are written as floating local times,
+which calendar clients show as-is. All-day tasks become DATE events and
+recurring series are written once with an RRULE, the way they are stored.
+Read events are turned into rows of TaskForm field values, with zoned
+times converted to the site's time zone.
+"""
+import zoneinfo
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+
+from home import recurrence
+from home.models import RULE_FIELDS, Task
+
+PRODID = "-//CalendarBuddy//Tasks//EN"
+
+# Task columns event() reads
+EVENT_FIELDS = [
+    "id",
+    "title",
+    "description",
+    "location",
+    "date",
+    "start_time",
+    "end_time",
+    "category",
+    "completed",
+    "updated_at",
+    *RULE_FIELDS,
+]
+
+FREQUENCIES = {
+    recurrence.DAILY: "DAILY",
+    recurrence.WEEKLY: "WEEKLY",
+    recurrence.MONTHLY: "MONTHLY",
+}
+
+
+def escape(text):
+    return (
+        text.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def fold(line):
+    """Split a content line into 75-octet pieces, as the RFC requires"""
+    data = line.encode()
+    if len(data) <= 75:
+        return line + "\r\n"
+    parts = []
+    while data:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(data))
+        # Never split inside a multi-byte character
+        while cut < len(data) and data[cut] & 0xC0 == 0x80:
+            cut -= 1
+        parts.append(data[:cut].decode())
+        data = data[cut:]
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _date(value):
+    return value.strftime("%Y%m%d")
+
+
+def _local(day, value):
+    return datetime.combine(day, value).strftime("%Y%m%dT%H%M%S")
+
+
+def _utc(value):
+    return value.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def event(task, domain):
+    """VEVENT text for one row of EVENT_FIELDS values (a dict)"""
+    day = task["date"]
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:task-{task['id']}@{domain}",
+        f"DTSTAMP:{_utc(task['updated_at'])}",
+        f"LAST-MODIFIED:{_utc(task['updated_at'])}",
+        f"SUMMARY:{escape(task['title'])}",
+    ]
+    start, end = task["start_time"], task["end_time"]
+    if start is None:
+        lines.append(f"DTSTART;VALUE=DATE:{_date(day)}")
+        lines.append(f"DTEND;VALUE=DATE:{_date(day + timedelta(days=1))}")
+    else:
+        lines.append(f"DTSTART:{_local(day, start)}")
+        if end is not None and end > start:
+            lines.append(f"DTEND:{_local(day, end)}")
+    if task["description"]:
+        lines.append(f"DESCRIPTION:{escape(task['description'])}")
+    if task["location"]:
+        lines.append(f"LOCATION:{escape(task['location'])}")
+    if task["category"]:
+        lines.append(f"CATEGORIES:{escape(task['category'].capitalize())}")
+    if task["completed"]:
+        lines.append("X-CALENDARBUDDY-COMPLETED:TRUE")
+
+    freq = FREQUENCIES.get(task["recurrence"])
+    if freq:
+        rule = f"RRULE:FREQ={freq};INTERVAL={max(task['recurrence_interval'] or 1, 1)}"
+        if task["recurrence_count"]:
+            rule += f";COUNT={task['recurrence_count']}"
+        elif task["recurrence_until"]:
+            # UNTIL takes the same value type as DTSTART
+            until = _date(task["recurrence_until"])
+            rule += f";UNTIL={until}" if start is None else f";UNTIL={until}T235959"
+        lines.append(rule)
+        for skipped in task["recurrence_exceptions"] or ():
+            skipped = skipped.replace("-", "")
+            if start is None:
+                lines.append(f"EXDATE;VALUE=DATE:{skipped}")
+            else:
+                lines.append(f"EXDATE:{skipped}T{start.strftime('%H%M%S')}")
+    lines.append("END:VEVENT")
+    return "".join(fold(line) for line in lines)
+
+
+def calendar(tasks, name, domain):
+    """Yield a VCALENDAR a piece at a time, one VEVENT per task row"""
+    yield "".join(
+        fold(line)
+        for line in [
+            "BEGIN:VCALENDAR",
+            "VERSION:2.0",
+            f"PRODID:{PRODID}",
+            "CALSCALE:GREGORIAN",
+            "METHOD:PUBLISH",
+            f"X-WR-CALNAME:{escape(name)}",
+        ]
+    )
+    for task in tasks:
+        yield event(task, domain)
+    yield "END:VCALENDAR\r\n"
+
+
+# Reading
+
+RECURRENCES = {code: name for name, code in FREQUENCIES.items()}
+CATEGORIES = {value for value, _ in Task.CATEGORY_CHOICES}
+YEARLY = "YEARLY"
+RULE_PARTS = {"FREQ", "INTERVAL", "COUNT", "UNTIL", "WKST"}
+
+
+class UnsupportedEvent(ValueError):
+    pass
+
+
+def unescape(text):
+    out = []
+    chars = iter(text)
+    for char in chars:
+        if char == "\\":
+            char = next(chars, "")
+            out.append("\n" if char in "nN" else char)
+        else:
+            out.append(char)
+    return "".join(out)
+
+
+def unfold(lines):
+    """(line number, logical line) for physical lines, joining continuations"""
+    current, start = None, 0
+    for number, line in enumerate(lines, 1):
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current:
+            yield start, current
+        current, start = line, number
+    if current:
+        yield start, current
+
+
+def parse_line(line):
+    """(NAME, {PARAM: value}, value); parameter values may be quoted"""
+    quoted = False
+    for i, char in enumerate(line):
+        if char == '"':
+            quoted = not quoted
+        elif char == ":" and not quoted:
+            head, value = line[:i], line[i + 1 :]
+            break
+    else:
+        raise ValueError(line)
+    name, *params = head.split(";")
+    parsed = {}
+    for param in params:
+        key, _, param_value = param.partition("=")
+        parsed[key.upper()] = param_value.strip('"')
+    return name.upper(), parsed, value
+
+
+def _when(value, params):
+    """date, or (date, time) in the site's time zone, for a DTSTART/DTEND"""
+    if params.get("VALUE") == "DATE" or len(value) == 8:
+        return datetime.strptime(value[:8], "%Y%m%d").date()
+    moment = datetime.strptime(value[:15], "%Y%m%dT%H%M%S")
+    if value.endswith("Z"):
+        moment = timezone.localtime(moment.replace(tzinfo=dt_timezone.utc))
+    elif "TZID" in params:
+        try:
+            zone = zoneinfo.ZoneInfo(params["TZID"])
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            zone = None  # Windows-style names; keep the wall time
+        if zone is not None:
+            moment = timezone.localtime(moment.replace(tzinfo=zone))
+    return moment.date(), moment.time().replace(microsecond=0)
+
+
+def _rule(value, row):
+    parts = dict(part.partition("=")[::2] for part in value.upper().split(";"))
+    if set(parts) - RULE_PARTS:
+        raise UnsupportedEvent(f"Unsupported repeat rule {value}")
+    interval = int(parts.get("INTERVAL") or 1)
+    freq = parts.get("FREQ")
+    if freq == YEARLY:
+        freq, interval = "MONTHLY", interval * 12
+    if freq not in RECURRENCES:
+        raise UnsupportedEvent(f"Unsupported repeat rule {value}")
+    row["recurrence"] = RECURRENCES[freq]
+    row["recurrence_interval"] = interval
+    if parts.get("COUNT"):
+        row["recurrence_count"] = int(parts["COUNT"])
+    if parts.get("UNTIL"):
+        row["recurrence_until"] = datetime.strptime(parts["UNTIL"][:8], "%Y%m%d").date()
+
+
+def _row(props):
+    row = {"recurrence_exceptions": []}
+    for name, params, value in props:
+        if name == "SUMMARY":
+            row["title"] = unescape(value)
+        elif name == "DESCRIPTION":
+            row["description"] = unescape(value)
+        elif name == "LOCATION":
+            row["location"] = unescape(value)
+        elif name == "CATEGORIES":
+            # Other apps' categories don't map onto ours; leave those out
+            category = unescape(value).split(",")[0].strip().lower()
+            if category in CATEGORIES:
+                row["category"] = category
+        elif name == "DTSTART":
+            row["_start"] = _when(value, params)
+        elif name == "DTEND":
+            row["_end"] = _when(value, params)
+        elif name == "RRULE":
+            _rule(value, row)
+        elif name == "EXDATE":
+            for item in value.split(","):
+                day = _when(item, params)
+                row["recurrence_exceptions"].append(
+                    (day if isinstance(day, date) else day[0]).isoformat()
+                )
+        elif name == "X-CALENDARBUDDY-COMPLETED":
+            row["completed"] = value.upper() == "TRUE"
+
+    start, end = row.pop("_start", None), row.pop("_end", None)
+    if isinstance(start, tuple):
+        row["date"], row["start_time"] = start
+        # Tasks live within one day; longer events keep just their start
+        if isinstance(end, tuple) and end[0] == start[0] and end[1] > start[1]:
+            row["end_time"] = end[1]
+    elif start is not None:
+        row["date"] = start
+    return row
+
+
+def read_events(lines):
+    """
+    Yield (line number, row) for each VEVENT in an iterable of text
+    lines, where row holds TaskForm field values, or (line number,
+    UnsupportedEvent) for events that can't be represented as a task.
+    Reads one event at a time, so memory doesn't grow with the file.
+    """
+    props, start, depth = None, 0, 0
+    for number, line in unfold(lines):
+        try:
+            name, params, value = parse_line(line)
+        except ValueError:
+            continue
+        if name == "BEGIN":
+            if value.upper() == "VEVENT":
+                props, start, depth = [], number, 0
+            elif props is not None:
+                depth += 1  # VALARM and friends
+        elif name == "END" and props is not None:
+            if value.upper() == "VEVENT":
+                try:
+                    yield start, _row(props)
+                except UnsupportedEvent as exc:
+                    yield start, exc
+                except ValueError:
+                    yield start, UnsupportedEvent("Unreadable date or repeat rule")
+                props = None
+            else:
+                depth -= 1
+        elif props is not None and depth == 0:
+            props.append((name, params, value))
@@ -0,0 +1,361 @@
+"""
+Bulk import of tasks from .ics and .csv uploads (see views.import_tasks),
+which runs inside the request; forms.IMPORT_MAX_SIZE keeps it to seconds.
+
+Rows are parsed one at a time from the upload and checked with TaskForm's
+field and cross-field rules (without building a form per row). Valid rows
+are written IMPORT_BATCH_SIZE at a time, each batch in its own transaction
+with its visibility rows, so a big import never holds the database's
+write lock for long and other users' saves go through in between. The
+cleaned values are inserted as they are (see insert_rows) rather than
+through Task instances and bulk_create. If a batch can't be written the
+import stops there and reports how far it got. One tasks_changed covers
+everything that was written.
+
+Overlaps with existing tasks and among the imported ones are found
+afterwards in a single sweep over the imported date range, a day at a
+time, instead of a get_conflicts() call per row.
+"""
+import csv
+import heapq
+import io
+import itertools
+from collections import namedtuple
+from datetime import date, time
+from functools import partial
+
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from home import recurrence, scheduling
+from home.models import RULE_FIELDS, Task, TaskVisibility
+from home.signals import tasks_changed
+from . import ics
+from .forms import TaskForm, check_task
+
+IMPORT_BATCH_SIZE = 1000
+# Errors and conflicts listed in the report; the rest are only counted
+MAX_REPORTED = 100
+
+Slot = namedtuple("Slot", "id title date start_time end_time")
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.errors = []  # (line, message)
+        self.error_count = 0
+        self.conflicts = []  # (imported Slot, other Slot)
+        self.conflict_count = 0
+        # (line, message) if the import stopped before the end of the file
+        self.stopped = None
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED:
+            self.errors.append((line, message))
+
+
+class RowValidator:
+    """TaskForm's rules, applied to plain dicts of field values"""
+
+    def __init__(self):
+        self.fields = TaskForm.base_fields
+        self.defaults = {
+            name: Task._meta.get_field(name).get_default() for name in self.fields
+        }
+
+    def _value(self, name, value):
+        field = self.fields[name]
+        if value is None or value == "":
+            if not field.required:
+                return field.clean(value)
+            if self.defaults[name] not in (None, ""):
+                return self.defaults[name]
+        elif isinstance(value, str):
+            value = value.strip()
+            # Skip the input-format guessing for the usual ISO values
+            try:
+                if name in ("date", "recurrence_until"):
+                    value = date.fromisoformat(value)
+                elif name in ("start_time", "end_time"):
+                    value = time.fromisoformat(value)
+            except ValueError:
+                pass
+        return field.clean(value)
+
+    def clean(self, row):
+        """(cleaned data, {field: message})"""
+        cleaned, errors = {}, {}
+        for name in self.fields:
+            try:
+                cleaned[name] = self._value(name, row.get(name))
+            except ValidationError as exc:
+                errors[name] = exc.messages[0]
+        if not errors:
+            errors.update(check_task(cleaned))
+        return cleaned, errors
+
+
+def _csv_rows(upload):
+    text = io.TextIOWrapper(upload, encoding="utf-8-sig", errors="replace", newline="")
+    reader = csv.DictReader(text)
+    if reader.fieldnames:
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    for row in reader:
+        exceptions = row.get("recurrence_exceptions")
+        if exceptions is not None:
+            row["recurrence_exceptions"] = [
+                day.strip() for day in exceptions.replace(";", ",").split(",") if day.strip()
+            ]
+        yield reader.line_num, row
+
+
+def _ics_rows(upload):
+    text = io.TextIOWrapper(upload, encoding="utf-8-sig", errors="replace", newline="")
+    yield from ics.read_events(text)
+
+
+def rows_from_upload(upload):
+    """(line, row) pairs from an uploaded .ics or .csv file"""
+    if upload.name.lower().endswith(".ics"):
+        return _ics_rows(upload)
+    return _csv_rows(upload)
+
+
+def _exceptions(values):
+    days = []
+    for value in values or ():
+        day = date.fromisoformat(value) if isinstance(value, str) else value
+        days.append(day.isoformat())
+    return days
+
+
+def insert_rows(model, columns, rows, returning=False):
+    """
+    INSERT `rows` (tuples of values for the `columns` attnames) into
+    `model`'s table, as multi-row statements, without bulk_create's
+    per-value preparation. Date, time and JSON values are converted;
+    everything else must already be what the database stores. With
+    `returning`, the new primary keys in row order.
+    """
+    fields = [model._meta.get_field(column) for column in columns]
+    ops = connection.ops
+    adapters = {
+        "DateField": ops.adapt_datefield_value,
+        "DateTimeField": ops.adapt_datetimefield_value,
+        "TimeField": ops.adapt_timefield_value,
+        "JSONField": None,
+    }
+    prepare = []
+    for i, field in enumerate(fields):
+        kind = field.get_internal_type()
+        if kind in adapters:
+            prepare.append(
+                (i, adapters[kind] or partial(field.get_db_prep_save, connection=ops.connection))
+            )
+    quote = ops.quote_name
+    sql = "INSERT INTO {} ({}) VALUES ".format(
+        quote(model._meta.db_table), ", ".join(quote(field.column) for field in fields)
+    )
+    placeholders = "({})".format(", ".join(["%s"] * len(fields)))
+    returning_sql = f" RETURNING {quote(model._meta.pk.column)}" if returning else ""
+    batch_size = connection.ops.bulk_batch_size(fields, rows)
+    ids = []
+    with connection.cursor() as cursor:
+        for i in range(0, len(rows), batch_size):
+            chunk = rows[i : i + batch_size]
+            params = []
+            for row in chunk:
+                row = list(row)
+                for index, prep in prepare:
+                    if row[index] is not None:
+                        row[index] = prep(row[index])
+                params.extend(row)
+            cursor.execute(sql + ", ".join([placeholders] * len(chunk)) + returning_sql, params)
+            if returning:
+                ids.extend(pk for (pk,) in cursor.fetchall())
+    return ids
+
+
+def import_tasks(user, rows):
+    """
+    Create a personal task for `user` from every valid row of (line,
+    row) pairs. Invalid rows are skipped and reported. Returns an
+    ImportResult.
+    """
+    result = ImportResult()
+    validator = RowValidator()
+    fields = list(TaskForm.base_fields)
+    derived = [
+        "user_id", "completed", "recurrence_exceptions", "recurrence_end",
+        "created_at", "updated_at",
+    ]
+    # Everything else is left at its default
+    others = [
+        field
+        for field in Task._meta.concrete_fields
+        if not field.primary_key and field.attname not in fields + derived
+    ]
+    columns = fields + derived + [field.attname for field in others]
+    defaults = tuple(field.get_default() for field in others)
+    imported = set()
+    changes = set()
+    first = last = None
+
+    def flush(batch):
+        """Write `batch` in a transaction of its own; False if it failed"""
+        nonlocal first, last
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                ids = insert_rows(
+                    Task,
+                    columns,
+                    [
+                        tuple(cleaned[name] for name in fields)
+                        + (user.pk, completed, exceptions, end, now, now)
+                        + defaults
+                        for _, cleaned, completed, exceptions, end in batch
+                    ],
+                    returning=True,
+                )
+                insert_rows(
+                    TaskVisibility,
+                    ["user_id", "task_id", "date", "recurring", "seq"],
+                    [
+                        (user.pk, task_id, cleaned["date"], bool(cleaned["recurrence"]), 0)
+                        for task_id, (_, cleaned, *_) in zip(ids, batch)
+                    ],
+                )
+        except DatabaseError as exc:
+            result.stopped = (batch[0][0], str(exc))
+            return False
+        for _, cleaned, _, _, end in batch:
+            changes.add((user.pk, None if cleaned["recurrence"] else cleaned["date"]))
+            end = end or cleaned["date"]
+            first = cleaned["date"] if first is None else min(first, cleaned["date"])
+            last = end if last is None else max(last, end)
+        imported.update(ids)
+        result.created += len(ids)
+        return True
+
+    batch = []
+    try:
+        for line, row in rows:
+            if isinstance(row, Exception):
+                result.add_error(line, str(row))
+                continue
+            cleaned, errors = validator.clean(row)
+            try:
+                exceptions = _exceptions(row.get("recurrence_exceptions"))
+            except (TypeError, ValueError):
+                errors["recurrence_exceptions"] = "Enter dates as YYYY-MM-DD."
+            if errors:
+                result.add_error(
+                    line, "; ".join(f"{field}: {message}" for field, message in errors.items())
+                )
+                continue
+
+            # What Task.save() would derive
+            end = None
+            if cleaned["recurrence"]:
+                end = recurrence.series_end(
+                    cleaned["date"],
+                    cleaned["recurrence"],
+                    cleaned["recurrence_interval"],
+                    cleaned["recurrence_until"],
+                    cleaned["recurrence_count"],
+                )
+            completed = str(row.get("completed", "")).lower() in ("1", "true", "yes")
+            batch.append(
+                (line, cleaned, completed, exceptions if cleaned["recurrence"] else [], end)
+            )
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                if not flush(batch):
+                    break
+                batch = []
+        else:
+            if batch:
+                flush(batch)
+    finally:
+        # One tasks_changed for everything that was committed
+        if imported:
+            tasks_changed.send(sender=Task, changes=changes, action="created", task_ids=imported)
+
+    if imported:
+        find_conflicts(user, imported, first, last, result)
+    return result
+
+
+def find_conflicts(user, imported, start, end, result):
+    """
+    One sweep over the user's timed tasks in [start, end], a day at a
+    time, recording pairs where at least one side was just imported.
+    """
+    one_offs = (
+        Slot(*row)
+        for row in Task.objects.visible_to(user, start, end)
+        .filter(recurrence="", start_time__isnull=False, end_time__isnull=False)
+        .order_by("visibility__date")
+        .values_list("id", "title", "date", "start_time", "end_time")
+        .iterator(chunk_size=IMPORT_BATCH_SIZE)
+    )
+
+    # Series are few; expand the timed ones for the window up front
+    series_days = {}
+    for row in (
+        Task.objects.series_visible_to(user, start, end)
+        .filter(start_time__isnull=False, end_time__isnull=False)
+        .values_list("id", "title", "date", "start_time", "end_time", *RULE_FIELDS)
+    ):
+        task_id, title, first, start_time, end_time = row[:5]
+        freq, interval, until, count, exceptions = row[5:]
+        for day in recurrence.occurrence_dates(
+            first, freq, interval, start, end, until=until, count=count, exceptions=exceptions
+        ):
+            series_days.setdefault(day, []).append(
+                Slot(task_id, title, day, start_time, end_time)
+            )
+
+    days = (
+        list(slots) + series_days.pop(day, [])
+        for day, slots in itertools.groupby(one_offs, key=lambda slot: slot.date)
+    )
+    for slots in itertools.chain(days, series_days.values()):
+        _day_conflicts(slots, imported, result)
+
+
+def _day_conflicts(slots, imported, result):
+    """
+    Count one day's overlapping pairs with at least one imported side,
+    listing them until MAX_REPORTED. The same sweep as
+    scheduling.overlap_pairs, but pairs are counted from the size of the
+    running set instead of being produced one by one: a packed day of n
+    imported tasks has n * (n - 1) / 2 of them.
+    """
+    timed = sorted(
+        (slot for slot in slots if scheduling.is_timed(slot)), key=lambda slot: slot.start_time
+    )
+    running = []  # (end_time, seq, slot) for everything still running
+    running_imported = []  # (end_time, seq) for the imported ones among them
+    for seq, slot in enumerate(timed):
+        while running and running[0][0] <= slot.start_time:
+            heapq.heappop(running)
+        while running_imported and running_imported[0][0] <= slot.start_time:
+            heapq.heappop(running_imported)
+        is_imported = slot.id in imported
+        # Pairs of two existing tasks aren't the import's doing
+        result.conflict_count += len(running) if is_imported else len(running_imported)
+        for _, _, other in running:
+            if len(result.conflicts) >= MAX_REPORTED:
+                break
+            if other.id in imported:
+                # Both imported, or only the earlier one: earlier first
+                result.conflicts.append((other, slot))
+            elif is_imported:
+                result.conflicts.append((slot, other))
+        heapq.heappush(running, (slot.end_time, seq, slot))
+        if is_imported:
+            heapq.heappush(running_imported, (slot.end_time, seq))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from calendar_app import cache as month_cache
+
+
+class Command(BaseCommand):
+    help = "Show hit/miss counters for the calendar month cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Reset the counters after printing them",
+        )
+
+    def handle(self, *args, **options):
+        stats = month_cache.stats()
+        self.stdout.write(
+            f"hits={stats['hits']} misses={stats['misses']} "
+            f"hit_rate={stats['hit_rate']:.1%}"
+        )
+        if options["reset"]:
+            month_cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
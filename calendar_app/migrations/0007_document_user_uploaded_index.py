@@ -0,0 +1,20 @@
+# Generated by Django 5.1.13 on 2026-10-17 04:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendar_app', '0006_alter_document_title'),
+        ('home', '0008_task_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['user', '-uploaded_at'], name='document_user_uploaded_idx'),
+        ),
+    ]
@@ -17,6 +17,9 @@ class Document(models.Model):
     
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            models.Index(fields=['user', '-uploaded_at'], name='document_user_uploaded_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         # Auto-detect file type from extension
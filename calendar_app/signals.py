@@ -0,0 +1,45 @@
+from django.db import transaction
+from django.dispatch import receiver
+
+from home.signals import tasks_changed
+
+from . import cache as month_cache
+from . import events, geocoding
+
+
+@receiver(tasks_changed)
+def invalidate_month_cache(sender, changes, **kwargs):
+    month_cache.invalidate(changes)
+
+
+@receiver(tasks_changed)
+def publish_task_event(sender, changes, task=None, action=None, task_ids=None, **kwargs):
+    """Tell open calendars of everyone affected, once the change commits"""
+    user_ids = {user_id for user_id, _ in changes}
+    if not user_ids or action is None:
+        return
+    if task_ids is not None:
+        event = {"type": action, "ids": sorted(task_ids)}
+    elif task is None:
+        event = {"type": action}
+    else:
+        event = {
+            "type": action,
+            "id": task.pk,
+            "date": task.date.isoformat(),
+            "recurring": task.is_recurring(),
+        }
+    transaction.on_commit(lambda: events.publish(user_ids, event))
+
+
+@receiver(tasks_changed)
+def queue_geocoding(sender, changes, task=None, action=None, task_ids=None, **kwargs):
+    """Look up new or changed task locations in the background"""
+    if action == "created" and task_ids is not None:
+        # Imports; the worker skips tasks without a location
+        ids = set(task_ids)
+    elif task is not None and action != "deleted" and task.location.strip() and not task.place_id:
+        ids = {task.pk}
+    else:
+        return
+    transaction.on_commit(lambda: geocoding.worker.enqueue(ids))
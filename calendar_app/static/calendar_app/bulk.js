@@ -0,0 +1,75 @@
+// Select several tasks and act on them at once (calendar_app:bulk_tasks_api).
+// Ctrl/Cmd-click any [data-task-id] element inside the [data-bulk-url] root
+// to select it; buttons with data-bulk-op in #bulk-toolbar send the
+// selection, along with #bulk-date for "move" and #bulk-color for "recolor".
+(function() {
+    const root = document.querySelector('[data-bulk-url]');
+    const toolbar = document.getElementById('bulk-toolbar');
+    if (!root || !toolbar) return;
+
+    const selected = new Set();
+
+    function csrfToken() {
+        const input = document.querySelector('[name=csrfmiddlewaretoken]');
+        if (input) return input.value;
+        const match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+        return match ? decodeURIComponent(match[1]) : '';
+    }
+
+    function refresh() {
+        root.querySelectorAll('[data-task-id]').forEach(function(element) {
+            element.classList.toggle('bulk-selected', selected.has(element.dataset.taskId));
+        });
+        toolbar.querySelector('.bulk-count').textContent = selected.size;
+        toolbar.classList.toggle('d-none', selected.size === 0);
+    }
+
+    root.addEventListener('click', function(event) {
+        if (!(event.ctrlKey || event.metaKey)) return;
+        const element = event.target.closest('[data-task-id]');
+        if (!element) return;
+        // Selecting shouldn't also open the task or submit its form
+        event.preventDefault();
+        event.stopImmediatePropagation();
+        const id = element.dataset.taskId;
+        selected.has(id) ? selected.delete(id) : selected.add(id);
+        refresh();
+    }, true);
+
+    toolbar.addEventListener('click', function(event) {
+        const button = event.target.closest('[data-bulk-op]');
+        if (!button) return;
+        const op = button.dataset.bulkOp;
+        if (op === 'clear') {
+            selected.clear();
+            refresh();
+            return;
+        }
+        if (op === 'delete' && !confirm('Delete ' + selected.size + ' task(s)?')) return;
+
+        const body = { op: op, ids: Array.from(selected, Number) };
+        if (op === 'move') body.date = document.getElementById('bulk-date').value;
+        if (op === 'recolor') body.color = document.getElementById('bulk-color').value;
+
+        fetch(root.dataset.bulkUrl, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrfToken() },
+            body: JSON.stringify(body),
+        })
+            .then(response => response.json())
+            .then(function(data) {
+                if (data.error) {
+                    alert(data.error);
+                    return;
+                }
+                const skipped = data.results.filter(result => result.status !== 'ok');
+                if (skipped.some(result => result.status === 'recurring')) {
+                    alert(skipped.length + ' task(s) could not be changed. ' +
+                          'Repeating tasks are completed or moved one date at a time.');
+                } else if (skipped.length) {
+                    alert(skipped.length + ' task(s) could not be changed.');
+                }
+                window.location.reload();
+            });
+    });
+})();
@@ -0,0 +1,46 @@
+// Reload an open calendar page when one of the user's tasks changes.
+// The server pushes events over SSE (calendar_app:event_stream); the page
+// sets data-live-url, and optionally data-live-start/data-live-end
+// (YYYY-MM-DD) to ignore changes to other dates. Servers without ASGI
+// answer 204, which ends the stream for good.
+(function() {
+    const root = document.querySelector('[data-live-url]');
+    if (!root || !window.EventSource) return;
+
+    const start = root.dataset.liveStart;
+    const end = root.dataset.liveEnd;
+    let timer = null;
+
+    function affectsPage(event) {
+        if (!event.date || event.recurring || !start || !end) return true;
+        return event.date >= start && event.date <= end;
+    }
+
+    function scheduleReload() {
+        if (timer) return;
+        timer = setTimeout(function() {
+            const active = document.activeElement;
+            const typing = active && ['INPUT', 'TEXTAREA', 'SELECT'].includes(active.tagName);
+            if (typing || document.querySelector('.modal.show')) {
+                // Don't throw away what the user is doing; offer a reload instead
+                document.getElementById('live-update-banner')?.classList.remove('d-none');
+                timer = null;
+                return;
+            }
+            window.location.reload();
+        }, 1000);
+    }
+
+    const source = new EventSource(root.dataset.liveUrl);
+    source.onerror = function() {
+        // A 204 (live updates are off on this server) or any other non-200
+        // answer closes the stream; make sure it stays closed
+        if (source.readyState === EventSource.CLOSED) source.close();
+    };
+    ['created', 'assigned', 'updated', 'completed', 'deleted', 'granted', 'revoked', 'refresh']
+        .forEach(function(type) {
+            source.addEventListener(type, function(message) {
+                if (affectsPage(JSON.parse(message.data))) scheduleReload();
+            });
+        });
+})();
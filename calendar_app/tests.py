@@ -1,3 +1,1352 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import socket
+import tempfile
+import time as time_module
+from datetime import date, time, timedelta
+from unittest import mock
 
-# Create your tests here.
+import requests
+import urllib3
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from home import recurrence
+from home.models import (
+    FeedToken, Group, GroupMembership, Location, Project, ProjectMembership, RateLimit,
+    Task, TaskTombstone,
+)
+from .models import Document
+from . import cache as month_cache, events, geocoding, ics, importer, upstream, views, weather
+
+
+def fake_response(status_code=200, data=None, headers=None):
+    """A requests.Response with `data` as its JSON body, not yet read"""
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    body = json.dumps(data).encode() if data is not None else b""
+    response.raw = urllib3.HTTPResponse(io.BytesIO(body), preload_content=False)
+    return response
+
+
+class TricklingBody:
+    """A response body arriving a byte at a time, and never finishing"""
+
+    def read(self, amt=None):
+        time_module.sleep(0.01)
+        return b" "
+
+    def close(self):
+        pass
+
+
+class QueryPlanTests(TestCase):
+    """
+    Run EXPLAIN QUERY PLAN over every query a view issues and fail if any of
+    them reads the task or document tables with a full table scan.
+    """
+
+    WATCHED_TABLES = ("home_task", "calendar_app_document")
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="planner")
+        self.group = Group.objects.create(name="Team", created_by=self.user)
+        GroupMembership.objects.create(group=self.group, user=self.user, role="admin")
+        Task.objects.create(
+            user=self.user,
+            title="Standup",
+            date=date.today(),
+            start_time=time(9, 0),
+            end_time=time(9, 30),
+        )
+        Task.objects.create(group=self.group, title="Retro", date=date.today())
+        Document.objects.create(user=self.user, file="documents/notes.txt")
+        self.client.force_login(self.user)
+
+    def assertNoTableScans(self, queries):
+        scans = []
+        with connection.cursor() as cursor:
+            for query in queries:
+                sql = query["sql"]
+                if not sql.startswith("SELECT") or not any(
+                    table in sql for table in self.WATCHED_TABLES
+                ):
+                    continue
+                cursor.execute("EXPLAIN QUERY PLAN " + sql)
+                for row in cursor.fetchall():
+                    detail = row[-1]
+                    if any(
+                        detail == f"SCAN {table}" or detail.startswith(f"SCAN {table} ")
+                        for table in self.WATCHED_TABLES
+                    ):
+                        scans.append(f"{detail}\n    {sql}")
+        self.assertFalse(scans, "Table scans found:\n" + "\n".join(scans))
+
+    def assertViewUsesIndexes(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNoTableScans(ctx.captured_queries)
+
+    def test_calendar_view_uses_indexes(self):
+        self.assertViewUsesIndexes(reverse("calendar_app:calendar_view"))
+
+    def test_week_view_uses_indexes(self):
+        self.assertViewUsesIndexes(reverse("calendar_app:week_view"))
+
+    @mock.patch("calendar_app.weather.requests.get")
+    def test_user_page_uses_indexes(self, mock_get):
+        mock_get.side_effect = lambda *args, **kwargs: fake_response(503)
+        self.assertViewUsesIndexes(reverse("calendar_app:user_page"))
+
+    def test_account_dashboard_uses_indexes(self):
+        self.assertViewUsesIndexes(reverse("account_dashboard"))
+
+    def test_document_list_uses_indexes(self):
+        self.assertViewUsesIndexes(reverse("calendar_app:document_list"))
+
+    def test_get_conflicts_uses_indexes(self):
+        with CaptureQueriesContext(connection) as ctx:
+            conflicts = Task.get_conflicts(
+                self.user, date.today(), time(9, 15), time(10, 0)
+            )
+        self.assertNoTableScans(ctx.captured_queries)
+        self.assertEqual(len(conflicts), 1)
+
+
+class MonthCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="cached")
+        self.other = User.objects.create_user(username="teammate")
+        self.group = Group.objects.create(name="Team", created_by=self.user)
+        GroupMembership.objects.create(group=self.group, user=self.user, role="admin")
+        GroupMembership.objects.create(group=self.group, user=self.other)
+        Task.objects.create(user=self.user, title="Dentist", date=date(2025, 3, 4))
+        self.client.force_login(self.user)
+        self.march = reverse("calendar_app:calendar_view") + "?month=3&year=2025"
+
+    def test_repeat_views_hit_cache(self):
+        self.client.get(self.march)
+        with self.assertNumQueries(3):  # session, user, data version
+            response = self.client.get(self.march)
+        self.assertContains(response, "Dentist")
+        self.assertEqual(month_cache.stats()["hits"], 1)
+        self.assertEqual(month_cache.stats()["misses"], 1)
+
+    def test_filters_are_cached_separately(self):
+        self.client.get(self.march)
+        response = self.client.get(self.march + "&search=gym")
+        self.assertNotContains(response, "Dentist")
+        self.assertEqual(month_cache.stats()["misses"], 2)
+
+    def test_change_in_month_invalidates(self):
+        self.client.get(self.march)
+        Task.objects.create(user=self.user, title="Haircut", date=date(2025, 3, 20))
+        response = self.client.get(self.march)
+        self.assertContains(response, "Haircut")
+        self.assertEqual(month_cache.stats()["misses"], 2)
+
+    def test_change_elsewhere_keeps_cache(self):
+        self.client.get(self.march)
+        Task.objects.create(user=self.user, title="Later", date=date(2025, 4, 2))
+        Task.objects.create(user=self.other, title="Not mine", date=date(2025, 3, 5))
+        self.client.get(self.march)
+        self.assertEqual(month_cache.stats()["hits"], 1)
+
+    def test_group_task_invalidates_every_member(self):
+        self.client.get(self.march)
+        Task.objects.create(group=self.group, title="Offsite", date=date(2025, 3, 12))
+        self.assertContains(self.client.get(self.march), "Offsite")
+
+    def test_moving_task_out_invalidates_old_month(self):
+        task = Task.objects.get(title="Dentist")
+        self.client.get(self.march)
+        task.date = date(2025, 5, 1)
+        task.save()
+        self.assertNotContains(self.client.get(self.march), "Dentist")
+
+
+class CalendarConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        weather.breaker.reset()
+        self.user = User.objects.create_user(username="polling")
+        Task.objects.create(user=self.user, title="Dentist", date=date.today())
+        self.client.force_login(self.user)
+
+    def test_calendar_view_304(self):
+        url = reverse("calendar_app:calendar_view")
+        first = self.client.get(url)
+        self.assertIn("private", first["Cache-Control"])
+        with self.assertNumQueries(3):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    @mock.patch("calendar_app.weather.requests.get")
+    def test_user_page_304(self, mock_get):
+        mock_get.side_effect = lambda *args, **kwargs: fake_response(503)
+        url = reverse("calendar_app:user_page")
+        etag = self.client.get(url)["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(mock_get.call_count, 1)
+
+
+class TasksApiTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="mobile")
+        self.group = Group.objects.create(name="Team", created_by=self.user)
+        GroupMembership.objects.create(group=self.group, user=self.user, role="admin")
+        self.meeting = Task.objects.create(
+            user=self.user,
+            title="Sync",
+            date=date(2025, 3, 4),
+            start_time=time(9, 30),
+            end_time=time(10, 15),
+            color="green",
+            category="work",
+        )
+        self.offsite = Task.objects.create(group=self.group, title="Offsite", date=date(2025, 3, 10))
+        Task.objects.create(user=self.user, title="Outside", date=date(2025, 4, 1))
+        self.client.force_login(self.user)
+        self.url = reverse("calendar_app:tasks_api")
+
+    def test_columnar_payload(self):
+        response = self.client.get(self.url, {"start": "2025-03-01", "end": "2025-03-31"})
+        payload = response.json()
+        columns = payload["columns"]
+        self.assertEqual(payload["count"], 2)
+        self.assertEqual(columns["id"], [self.meeting.id, self.offsite.id])
+        self.assertEqual(columns["date"], [3, 9])
+        self.assertEqual(columns["start"], [570, None])
+        self.assertEqual(columns["end"], [615, None])
+        self.assertEqual(payload["colors"][columns["color"][0]], "green")
+        self.assertEqual(payload["categories"][columns["category"][0]], "work")
+        self.assertEqual(payload["categories"][columns["category"][1]], "")
+
+    def test_field_selection(self):
+        response = self.client.get(
+            self.url, {"start": "2025-03-01", "end": "2025-03-31", "fields": "id,title"}
+        )
+        payload = response.json()
+        self.assertEqual(set(payload["columns"]), {"id", "title"})
+        self.assertNotIn("colors", payload)
+
+    def test_repeated_fields_are_sent_once(self):
+        response = self.client.get(
+            self.url, {"start": "2025-03-01", "end": "2025-03-31", "fields": "id, id,title,id"}
+        )
+        payload = response.json()
+        self.assertEqual(payload["fields"], ["id", "title"])
+        self.assertEqual(payload["columns"]["id"], [self.meeting.id, self.offsite.id])
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        bad_range = {"start": "2025-03-31", "end": "2025-03-01"}
+        self.assertEqual(self.client.get(self.url, bad_range).status_code, 400)
+        bad_field = {"start": "2025-03-01", "end": "2025-03-31", "fields": "secret"}
+        self.assertEqual(self.client.get(self.url, bad_field).status_code, 400)
+        no_fields = {"start": "2025-03-01", "end": "2025-03-31", "fields": ","}
+        self.assertEqual(self.client.get(self.url, no_fields).status_code, 400)
+
+    def test_gzip_and_single_task_query(self):
+        # session, user, data version, one-off tasks, recurring series
+        with self.assertNumQueries(5):
+            response = self.client.get(
+                self.url,
+                {"start": "2025-03-01", "end": "2025-03-31"},
+                HTTP_ACCEPT_ENCODING="gzip",
+            )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+
+class TaskSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="searcher")
+        self.client.force_login(self.user)
+        self.standup = Task.objects.create(
+            user=self.user, title="Team standup", date=date(2025, 3, 4)
+        )
+        self.review = Task.objects.create(
+            user=self.user,
+            title="Design review",
+            description="Review the standup notes",
+            date=date(2025, 3, 4),
+        )
+        self.dentist = Task.objects.create(
+            user=self.user, title="Dentist", location="Midtown clinic", date=date(2025, 3, 5)
+        )
+
+    def search(self, keyword):
+        return list(Task.objects.visible_to(self.user).search(keyword).order_by("search_rank"))
+
+    def test_prefix_match_across_fields(self):
+        self.assertEqual(self.search("stand"), [self.standup, self.review])
+        self.assertEqual(self.search("midt"), [self.dentist])
+        self.assertEqual(self.search("review notes"), [self.review])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.dentist.title = "Orthodontist"
+        self.dentist.save()
+        self.assertEqual(self.search("ortho"), [self.dentist])
+        self.assertEqual(self.search("dentist"), [])
+        self.standup.delete()
+        self.assertEqual(self.search("standup"), [self.review])
+
+    def test_fallback_without_fts(self):
+        with mock.patch("home.fts.available", return_value=False):
+            self.assertEqual(
+                set(self.search("clinic")), {self.dentist}
+            )
+
+    def test_calendar_view_search(self):
+        response = self.client.get(
+            reverse("calendar_app:calendar_view"),
+            {"month": 3, "year": 2025, "search": "stand"},
+        )
+        day = response.context["tasks_by_date"][4]
+        self.assertEqual(day, [self.standup, self.review])
+        self.assertNotContains(response, "Dentist")
+
+
+class RecurringCalendarTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="weekly")
+        self.client.force_login(self.user)
+        self.series = Task.objects.create(
+            user=self.user,
+            title="Book club",
+            date=date(2025, 1, 2),
+            recurrence="weekly",
+            recurrence_interval=2,
+        )
+
+    def test_month_view_shows_each_occurrence(self):
+        response = self.client.get(
+            reverse("calendar_app:calendar_view"), {"month": 3, "year": 2025}
+        )
+        self.assertEqual(sorted(response.context["tasks_by_date"]), [13, 27])
+
+    def test_series_change_invalidates_every_month(self):
+        url = reverse("calendar_app:calendar_view") + "?month=3&year=2025"
+        self.client.get(url)
+        self.series.recurrence_exceptions = ["2025-03-13"]
+        self.series.save()
+        response = self.client.get(url)
+        self.assertEqual(sorted(response.context["tasks_by_date"]), [27])
+
+    def test_api_expands_series(self):
+        response = self.client.get(
+            reverse("calendar_app:tasks_api"),
+            {"start": "2025-03-01", "end": "2025-03-31", "fields": "id,date"},
+        )
+        columns = response.json()["columns"]
+        self.assertEqual(columns["id"], [self.series.id, self.series.id])
+        self.assertEqual(columns["date"], [12, 26])
+
+    def test_add_recurring_task_form(self):
+        self.client.post(
+            reverse("calendar_app:calendar_view"),
+            {
+                "add_task": "true",
+                "title": "Yoga",
+                "date": "2025-03-03",
+                "color": "blue",
+                "recurrence": "daily",
+                "recurrence_interval": 1,
+                "recurrence_count": 5,
+            },
+        )
+        task = Task.objects.get(title="Yoga")
+        self.assertEqual(task.recurrence_end, date(2025, 3, 7))
+
+
+class CompleteTaskTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="finisher")
+        self.client.force_login(self.user)
+
+    def test_completes_one_occurrence_of_a_series(self):
+        series = Task.objects.create(
+            user=self.user, title="Standup", date=date(2025, 3, 3), recurrence="daily",
+            recurrence_count=5,
+        )
+        url = reverse("calendar_app:complete_task", args=[series.id])
+        self.client.post(url, {"date": "2025-03-05"})
+
+        series.refresh_from_db()
+        self.assertFalse(series.completed)
+        days = Task.objects.occurrences(self.user, date(2025, 3, 1), date(2025, 3, 31))
+        self.assertEqual(
+            [(t.date.day, t.completed) for t in days],
+            [(3, False), (4, False), (5, True), (6, False), (7, False)],
+        )
+        # Skipped dates still count towards the series' five occurrences
+        self.assertEqual(series.recurrence_end, date(2025, 3, 7))
+
+    def test_completes_a_one_off_task(self):
+        task = Task.objects.create(user=self.user, title="Dentist", date=date(2025, 3, 3))
+        self.client.post(reverse("calendar_app:complete_task", args=[task.id]))
+        task.refresh_from_db()
+        self.assertTrue(task.completed)
+
+
+class TimeGridTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="planner")
+        day = date(2025, 3, 4)
+        for title, start, end in [
+            ("Standup", time(9, 0), time(10, 0)),
+            ("Review", time(9, 30), time(11, 0)),
+            ("Lunch", time(10, 0), time(10, 30)),
+            ("Gym", time(18, 0), time(19, 0)),
+        ]:
+            Task.objects.create(user=self.user, title=title, date=day,
+                                start_time=start, end_time=end)
+        Task.objects.create(user=self.user, title="Birthday", date=day)
+        self.client.force_login(self.user)
+        self.week = reverse("calendar_app:week_view") + "?date=2025-03-05"
+
+    def test_week_view_lays_out_columns(self):
+        response = self.client.get(self.week)
+        days = response.context["days"]
+        self.assertEqual([d["date"] for d in days][0], date(2025, 3, 2))
+        tuesday = days[2]
+        self.assertEqual([t.title for t in tuesday["all_day"]], ["Birthday"])
+        layout = {t.title: (t.column, t.columns) for t in tuesday["timed"]}
+        self.assertEqual(layout, {
+            "Standup": (0, 2), "Review": (1, 2), "Lunch": (0, 2), "Gym": (0, 1),
+        })
+        self.assertContains(response, "left: 50.000%; width: 50.000%;")
+
+    def test_layout_is_cached_until_tasks_change(self):
+        self.client.get(self.week)
+        with self.assertNumQueries(3):  # session, user, data version
+            self.client.get(self.week)
+        Task.objects.create(user=self.user, title="Call", date=date(2025, 3, 8),
+                            start_time=time(8, 0), end_time=time(8, 30))
+        self.assertContains(self.client.get(self.week), "Call")
+
+    def test_day_view(self):
+        response = self.client.get(reverse("calendar_app:day_view"), {"date": "2025-03-04"})
+        self.assertEqual(len(response.context["days"]), 1)
+        self.assertContains(response, "Gym")
+
+    def test_dates_at_the_ends_of_the_calendar(self):
+        for name in ("calendar_app:week_view", "calendar_app:day_view"):
+            for value in ("9999-12-31", "0001-01-01"):
+                response = self.client.get(reverse(name), {"date": value})
+                self.assertEqual(response.status_code, 200)
+
+
+class YearHeatmapTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="yearly")
+        self.other = User.objects.create_user(username="teammate")
+        self.group = Group.objects.create(name="Team", created_by=self.other)
+        GroupMembership.objects.create(group=self.group, user=self.user)
+        Task.objects.create(user=self.user, title="A", date=date(2025, 3, 4), completed=True)
+        Task.objects.create(user=self.user, title="B", date=date(2025, 3, 4))
+        Task.objects.create(group=self.group, title="C", date=date(2025, 3, 4))
+        Task.objects.create(user=self.other, title="Not mine", date=date(2025, 3, 4))
+        Task.objects.create(user=self.user, title="Weekly", date=date(2025, 12, 17),
+                            recurrence="weekly")
+        self.client.force_login(self.user)
+        self.url = reverse("calendar_app:year_view") + "?year=2025"
+
+    def test_day_counts(self):
+        counts = Task.objects.day_counts(self.user, date(2025, 1, 1), date(2025, 12, 31))
+        self.assertEqual(counts, {
+            date(2025, 3, 4): (3, 1),
+            date(2025, 12, 17): (1, 0),
+            date(2025, 12, 24): (1, 0),
+            date(2025, 12, 31): (1, 0),
+        })
+
+    def test_year_view_is_cached_per_year(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.context["total"], 6)
+        self.assertEqual(response.context["busiest"], 3)
+        self.assertContains(response, 'class="heat-4" title="Mar 4: 3 tasks, 1 done"')
+        with self.assertNumQueries(3):  # session, user, data version
+            self.client.get(self.url)
+        Task.objects.create(user=self.user, title="D", date=date(2025, 8, 1))
+        self.assertEqual(self.client.get(self.url).context["total"], 7)
+
+    def test_years_out_of_range_fall_back_to_this_year(self):
+        url = reverse("calendar_app:year_view")
+        for year in ("99999999999", "9999", "1", "0", "-5"):
+            response = self.client.get(url, {"year": year})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context["year"], date.today().year)
+
+
+class AgendaTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="agenda")
+        self.client.force_login(self.user)
+        self.url = reverse("calendar_app:agenda_api")
+        for day in (3, 4, 5):
+            Task.objects.create(user=self.user, title=f"All day {day}", date=date(2025, 3, day))
+            Task.objects.create(user=self.user, title=f"Late {day}", date=date(2025, 3, day),
+                                start_time=time(17, 0), end_time=time(18, 0))
+            Task.objects.create(user=self.user, title=f"Early {day}", date=date(2025, 3, day),
+                                start_time=time(8, 0), end_time=time(9, 0))
+        Task.objects.create(user=self.user, title="Lunch", date=date(2025, 3, 4),
+                            start_time=time(12, 0), end_time=time(13, 0), recurrence="daily")
+
+    def walk(self, limit, **params):
+        titles, cursor, pages = [], None, 0
+        while True:
+            query = dict(params, limit=limit, **({"cursor": cursor} if cursor else {}))
+            data = self.client.get(self.url, query).json()
+            titles += [(item["date"][-2:], item["title"]) for item in data["items"]]
+            pages += 1
+            cursor = data["next"]
+            if cursor is None:
+                return titles, pages
+
+    def test_pages_walk_in_order_without_gaps(self):
+        expected, _ = self.walk(50, start="2025-03-01", end="2025-03-06")
+        self.assertEqual(expected[:4], [
+            ("03", "All day 3"), ("03", "Early 3"), ("03", "Late 3"), ("04", "All day 4"),
+        ])
+        self.assertEqual(expected[5:7], [("04", "Lunch"), ("04", "Late 4")])
+        self.assertEqual(len(expected), 12)  # 9 one-offs, Lunch on the 4th to 6th
+        for limit in (1, 2, 5):
+            titles, pages = self.walk(limit, start="2025-03-01", end="2025-03-06")
+            self.assertEqual(titles, expected)
+            self.assertEqual(pages, -(-len(expected) // limit))
+
+    def test_seek_query_does_not_use_offset(self):
+        first = self.client.get(self.url, {"start": "2025-03-01", "limit": 2}).json()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url, {"start": "2025-03-01", "limit": 2, "cursor": first["next"]})
+        sql = " ".join(q["sql"] for q in ctx.captured_queries)
+        self.assertNotIn("OFFSET", sql)
+        self.assertIn("LIMIT 3", sql)
+
+    def test_bad_cursor(self):
+        self.assertEqual(self.client.get(self.url, {"cursor": "!!"}).status_code, 400)
+
+    def test_agenda_page(self):
+        response = self.client.get(reverse("calendar_app:agenda_view"), {"start": "2025-03-05"})
+        self.assertContains(response, "Early 5")
+        self.assertNotContains(response, "Early 4")
+
+    def test_open_ended_agenda_at_the_end_of_the_calendar(self):
+        data = self.client.get(self.url, {"start": "9999-12-30"}).json()
+        self.assertEqual([item["date"] for item in data["items"]], ["9999-12-30", "9999-12-31"])
+        self.assertIsNone(data["next"])
+        response = self.client.get(reverse("calendar_app:agenda_view"), {"start": "9999-12-31"})
+        self.assertContains(response, "Lunch")
+
+    def test_series_expansion_stops_once_the_page_is_full(self):
+        with mock.patch(
+            "home.recurrence.nth_occurrence", wraps=recurrence.nth_occurrence
+        ) as nth_occurrence:
+            data = self.client.get(self.url, {"start": "2025-04-01", "limit": 2}).json()
+        self.assertEqual([item["title"] for item in data["items"]], ["Lunch", "Lunch"])
+        # A few per date on the page, not five years of daily dates
+        self.assertLess(nth_occurrence.call_count, 20)
+
+
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="syncer")
+        self.admin = User.objects.create_user(username="lead")
+        self.group = Group.objects.create(name="Team", created_by=self.admin)
+        GroupMembership.objects.create(group=self.group, user=self.admin, role="admin")
+        self.membership = GroupMembership.objects.create(group=self.group, user=self.user)
+        self.mine = Task.objects.create(user=self.user, title="Mine", date=date(2025, 3, 3))
+        self.shared = Task.objects.create(group=self.group, title="Shared", date=date(2025, 3, 4))
+        self.client.force_login(self.user)
+        self.url = reverse("calendar_app:changes_api")
+
+    def sync(self, since=None, limit=None):
+        params = {k: v for k, v in (("since", since), ("limit", limit)) if v is not None}
+        return self.client.get(self.url, params).json()
+
+    def ops(self, data):
+        return [
+            (c["op"], c["task"]["title"] if c["op"] == "upsert" else c["id"])
+            for c in data["changes"]
+        ]
+
+    def test_snapshot_then_only_changes(self):
+        snapshot = self.sync()
+        self.assertEqual(sorted(self.ops(snapshot)), [("upsert", "Mine"), ("upsert", "Shared")])
+        self.assertEqual(self.ops(self.sync(snapshot["cursor"])), [])
+
+        self.mine.completed = True
+        self.mine.save()
+        Task.objects.create(user=self.admin, title="Not mine", date=date(2025, 3, 5))
+        data = self.sync(snapshot["cursor"])
+        self.assertEqual(self.ops(data), [("upsert", "Mine")])
+        self.assertTrue(data["changes"][0]["task"]["completed"])
+
+    def test_deletions_and_lost_visibility_leave_tombstones(self):
+        cursor = self.sync()["cursor"]
+        mine_id, shared_id = self.mine.id, self.shared.id
+        self.client.post(reverse("calendar_app:delete_task", args=[mine_id]))
+        self.membership.delete()
+        self.assertEqual(self.ops(self.sync(cursor)), [("delete", mine_id), ("delete", shared_id)])
+
+    def test_group_cascade_and_new_membership(self):
+        other = Group.objects.create(name="Other", created_by=self.admin)
+        later = Task.objects.create(group=other, title="Later", date=date(2025, 3, 6))
+        cursor = self.sync()["cursor"]
+        GroupMembership.objects.create(group=other, user=self.user)
+        data = self.sync(cursor)
+        self.assertEqual(self.ops(data), [("upsert", "Later")])
+        other.delete()
+        self.assertEqual(self.ops(self.sync(data["cursor"])), [("delete", later.id)])
+
+    def test_small_batches_cover_everything_once(self):
+        for i in range(5):
+            Task.objects.create(user=self.user, title=f"T{i}", date=date(2025, 3, 10))
+        seen, cursor = [], None
+        while True:
+            data = self.sync(cursor, limit=2)
+            seen += self.ops(data)
+            cursor = data["cursor"]
+            if not data["has_more"]:
+                break
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+
+    def test_bad_cursor(self):
+        self.assertEqual(self.client.get(self.url, {"since": "x"}).status_code, 400)
+
+
+class BulkTasksTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="bulker")
+        self.admin = User.objects.create_user(username="lead")
+        self.group = Group.objects.create(name="Team", created_by=self.admin)
+        GroupMembership.objects.create(group=self.group, user=self.admin, role="admin")
+        GroupMembership.objects.create(group=self.group, user=self.user)
+        self.mine = [
+            Task.objects.create(user=self.user, title=f"Mine {i}", date=date(2025, 3, 3))
+            for i in range(3)
+        ]
+        self.locked = Task.objects.create(
+            group=self.group, assigned_by=self.admin, is_deletable=False,
+            title="Locked", date=date(2025, 3, 4),
+        )
+        self.hidden = Task.objects.create(user=self.admin, title="Hidden", date=date(2025, 3, 4))
+        self.client.force_login(self.user)
+        self.url = reverse("calendar_app:bulk_tasks_api")
+
+    def post(self, **body):
+        return self.client.post(self.url, body, content_type="application/json")
+
+    def statuses(self, response):
+        return {r["id"]: r["status"] for r in response.json()["results"]}
+
+    def test_delete_respects_permissions_and_visibility(self):
+        ids = [t.id for t in self.mine] + [self.locked.id, self.hidden.id]
+        response = self.post(op="delete", ids=ids)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 3)
+        statuses = self.statuses(response)
+        self.assertEqual(statuses[self.locked.id], "forbidden")
+        self.assertEqual(statuses[self.hidden.id], "not_found")
+        self.assertEqual(
+            set(Task.objects.values_list("title", flat=True)), {"Locked", "Hidden"}
+        )
+        # One tombstone per deleted task, none from the per-task handler
+        self.assertEqual(TaskTombstone.objects.filter(user=self.user).count(), 3)
+
+    def test_move_is_set_based_and_keeps_visibility_and_cache_in_step(self):
+        self.client.get(reverse("calendar_app:calendar_view"), {"month": 3, "year": 2025})
+        ids = [t.id for t in self.mine] + [self.locked.id]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.post(op="move", ids=ids, date="2025-04-01")
+        self.assertEqual(set(self.statuses(response).values()), {"ok"})
+        # Same number of statements however many tasks move
+        task_writes = [q for q in ctx.captured_queries if q["sql"].startswith('UPDATE "home_task"')]
+        self.assertEqual(len(task_writes), 1)
+
+        april = Task.objects.visible_to(self.admin, date(2025, 4, 1), date(2025, 4, 1))
+        self.assertEqual(list(april.values_list("title", flat=True)), ["Locked"])
+        march = self.client.get(
+            reverse("calendar_app:calendar_view"), {"month": 3, "year": 2025}
+        )
+        self.assertNotContains(march, "Mine 0")
+
+    def test_series_are_not_completed_or_moved_in_bulk(self):
+        series = Task.objects.create(
+            user=self.user, title="Daily", date=date(2025, 3, 3),
+            recurrence="daily", recurrence_until=date(2025, 3, 31),
+        )
+        response = self.post(op="complete", ids=[series.id, self.mine[0].id])
+        self.assertEqual(
+            self.statuses(response), {series.id: "recurring", self.mine[0].id: "ok"}
+        )
+        # Every occurrence is still open
+        march = Task.objects.occurrences(self.user, date(2025, 3, 1), date(2025, 3, 31))
+        daily = [t for t in march if t.title == "Daily"]
+        self.assertEqual(len(daily), 29)
+        self.assertFalse(any(t.completed for t in daily))
+
+    def test_moving_a_series_past_its_end_is_refused(self):
+        series = Task.objects.create(
+            user=self.user, title="Daily", date=date(2025, 3, 3),
+            recurrence="daily", recurrence_until=date(2025, 3, 31),
+        )
+        response = self.post(op="move", ids=[series.id], date="2025-06-01")
+        self.assertEqual(self.statuses(response), {series.id: "recurring"})
+        series.refresh_from_db()
+        self.assertEqual(series.date, date(2025, 3, 3))
+        march = Task.objects.occurrences(self.user, date(2025, 3, 1), date(2025, 3, 31))
+        self.assertEqual(len([t for t in march if t.title == "Daily"]), 29)
+
+    def test_complete_and_recolor_reach_the_change_feed(self):
+        changes = reverse("calendar_app:changes_api")
+        cursor = self.client.get(changes).json()["cursor"]
+        self.post(op="complete", ids=[self.mine[0].id])
+        self.post(op="recolor", ids=[self.mine[1].id], color="red")
+        data = self.client.get(changes, {"since": cursor}).json()
+        tasks = {c["task"]["title"]: c["task"] for c in data["changes"]}
+        self.assertEqual(set(tasks), {"Mine 0", "Mine 1"})
+        self.assertTrue(tasks["Mine 0"]["completed"])
+        self.assertEqual(tasks["Mine 1"]["color"], "red")
+
+    def test_bad_requests(self):
+        self.assertEqual(self.post(op="explode", ids=[1]).status_code, 400)
+        self.assertEqual(self.post(op="move", ids=[self.mine[0].id]).status_code, 400)
+        self.assertEqual(self.post(op="recolor", ids=[1], color="plaid").status_code, 400)
+        self.assertEqual(self.post(op="complete", ids=[]).status_code, 400)
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+
+
+class FeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="subscriber")
+        self.other = User.objects.create_user(username="colleague")
+        self.group = Group.objects.create(name="Team", created_by=self.other)
+        GroupMembership.objects.create(group=self.group, user=self.user)
+        Task.objects.create(
+            user=self.user, title="Standup", date=date(2025, 3, 4),
+            start_time=time(9, 0), end_time=time(9, 15),
+        )
+        Task.objects.create(
+            group=self.group, title="Retro", date=date(2025, 3, 7), recurrence="weekly",
+            recurrence_count=4, recurrence_exceptions=["2025-03-14"],
+        )
+        Task.objects.create(user=self.other, title="Private", date=date(2025, 3, 4))
+        self.token = FeedToken.for_user(self.user).token
+        self.url = reverse("calendar_app:user_feed", args=[self.token])
+
+    def body(self, response):
+        return b"".join(response.streaming_content if response.streaming else [response.content]).decode()
+
+    def test_feed_lists_visible_tasks_and_series_rules(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response["Content-Type"], "text/calendar; charset=utf-8")
+        body = self.body(response)
+        self.assertTrue(body.startswith("BEGIN:VCALENDAR\r\n"))
+        self.assertIn("SUMMARY:Standup\r\nDTSTART:20250304T090000\r\nDTEND:20250304T091500", body)
+        self.assertIn("DTSTART;VALUE=DATE:20250307\r\nDTEND;VALUE=DATE:20250308", body)
+        self.assertIn("RRULE:FREQ=WEEKLY;INTERVAL=1;COUNT=4\r\nEXDATE;VALUE=DATE:20250314", body)
+        self.assertNotIn("Private", body)
+
+    def test_unchanged_poll_is_a_304_without_task_queries(self):
+        first = self.client.get(self.url)
+        body = self.body(first)
+        # token + data version, in one query
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 304)
+        # A client without the ETag is served from the cache
+        with self.assertNumQueries(1):
+            self.assertEqual(self.body(self.client.get(self.url)), body)
+
+        Task.objects.create(user=self.user, title="Dentist", date=date(2025, 3, 5))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Dentist", self.body(response))
+
+    def test_uids_do_not_depend_on_the_requested_host(self):
+        first = self.body(self.client.get(self.url, HTTP_HOST="calendar.example.com"))
+        uid = f"UID:task-{Task.objects.get(title='Standup').pk}@calendarbuddy\r\n"
+        self.assertIn(uid, first)
+        # The cached copy is served to a client on another hostname as is
+        self.assertEqual(self.body(self.client.get(self.url, HTTP_HOST="evil.example")), first)
+
+    def test_project_feed_is_for_members_only(self):
+        project = Project.objects.create(name="Launch", created_by=self.other)
+        ProjectMembership.objects.create(project=project, user=self.other, role="admin")
+        url = reverse("calendar_app:project_feed", args=[self.token, project.id])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        ProjectMembership.objects.create(project=project, user=self.user)
+        body = self.body(self.client.get(url))
+        self.assertIn("Private", body)
+        self.assertIn("Standup", body)
+
+    def test_project_feed_follows_project_tasks_members_cannot_see(self):
+        project = Project.objects.create(name="Launch", created_by=self.other)
+        ProjectMembership.objects.create(project=project, user=self.user)
+        outsider = User.objects.create_user(username="outsider")
+        task = Task.objects.create(
+            user=outsider, project=project, title="Outside help", date=date(2025, 3, 6)
+        )
+        url = reverse("calendar_app:project_feed", args=[self.token, project.id])
+        first = self.client.get(url)
+        self.assertIn("Outside help", self.body(first))
+
+        task.title = "Outside review"
+        task.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Outside review", self.body(response))
+
+    def test_unknown_or_reset_token(self):
+        self.assertEqual(
+            self.client.get(reverse("calendar_app:user_feed", args=["nope"])).status_code, 404
+        )
+        self.client.force_login(self.user)
+        self.client.post(reverse("calendar_app:reset_feed_token"))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_long_lines_are_folded(self):
+        folded = ics.fold("DESCRIPTION:" + "é" * 80)
+        lines = folded.split("\r\n ")
+        self.assertTrue(all(len(line.encode()) <= 75 for line in lines))
+        self.assertEqual("".join(lines), "DESCRIPTION:" + "é" * 80 + "\r\n")
+
+
+class ImportTasksTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="importer")
+        Task.objects.create(
+            user=self.user, title="Standup", date=date(2025, 3, 4),
+            start_time=time(9, 0), end_time=time(9, 30),
+        )
+        self.client.force_login(self.user)
+        self.url = reverse("calendar_app:import_tasks")
+
+    def upload(self, name, content):
+        return self.client.post(
+            self.url, {"file": SimpleUploadedFile(name, content.encode())}
+        )
+
+    def test_csv_import_validates_rows_and_reports_conflicts(self):
+        content = (
+            "title,date,start_time,end_time,color,category,recurrence,recurrence_until\n"
+            "Planning,2025-03-04,09:15,10:00,green,work,,\n"
+            "Lunch,2025-03-04,12:00,13:00,,,,\n"
+            ",2025-03-05,,,,,,\n"
+            "Bad colour,2025-03-05,,,plaid,,,\n"
+            "Backwards,2025-03-10,,,,,weekly,2025-03-01\n"
+            "Gym,2025-03-03,,,,,weekly,2025-03-31\n"
+        )
+        with mock.patch.object(importer, "IMPORT_BATCH_SIZE", 2):
+            response = self.upload("team.csv", content)
+        result = response.context["result"]
+        self.assertEqual(result.created, 3)
+        self.assertEqual([line for line, _ in result.errors], [4, 5, 6])
+        self.assertIn("title", result.errors[0][1])
+        self.assertIn("recurrence_until", result.errors[2][1])
+        self.assertEqual(result.conflict_count, 1)
+        imported, other = result.conflicts[0]
+        self.assertEqual((imported.title, other.title), ("Planning", "Standup"))
+
+        # Visibility rows, the FTS index and recurrence_end are all in place
+        march = Task.objects.visible_to(self.user, date(2025, 3, 1), date(2025, 3, 31))
+        self.assertEqual(march.count(), 4)
+        self.assertEqual(Task.objects.search("planning").count(), 1)
+        self.assertEqual(Task.objects.get(title="Gym").recurrence_end, date(2025, 3, 31))
+        calendar = self.client.get(reverse("calendar_app:calendar_view"), {"month": 3, "year": 2025})
+        self.assertContains(calendar, "Lunch")
+
+    def test_each_batch_is_committed_and_a_failed_batch_stops_the_import(self):
+        content = "title,date\n" + "".join(f"Task {i},2025-04-{i + 1:02d}\n" for i in range(5))
+        insert_rows = importer.insert_rows
+        batches = []
+
+        def insert_or_fail(model, *args, **kwargs):
+            if model is Task:
+                batches.append(args)
+                if len(batches) == 3:
+                    raise OperationalError("database is locked")
+            return insert_rows(model, *args, **kwargs)
+
+        with mock.patch.object(importer, "IMPORT_BATCH_SIZE", 2), mock.patch.object(
+            importer, "insert_rows", side_effect=insert_or_fail
+        ):
+            response = self.upload("big.csv", content)
+        result = response.context["result"]
+        self.assertContains(response, "The import stopped at line 6")
+        self.assertEqual(result.created, 4)
+        self.assertEqual(result.stopped, (6, "database is locked"))
+        self.assertEqual(
+            list(Task.objects.filter(title__startswith="Task").values_list("title", flat=True)),
+            ["Task 0", "Task 1", "Task 2", "Task 3"],
+        )
+        april = self.client.get(reverse("calendar_app:calendar_view"), {"month": 4, "year": 2025})
+        self.assertContains(april, "Task 3")
+
+    def test_conflicts_are_counted_without_listing_every_pair(self):
+        for i in range(2):
+            Task.objects.create(
+                user=self.user, title=f"Existing {i}", date=date(2025, 3, 4),
+                start_time=time(9, 0), end_time=time(10, 0),
+            )
+        content = "title,date,start_time,end_time\n" + "".join(
+            f"New {i},2025-03-04,09:{i:02d},11:00\n" for i in range(4)
+        )
+        with mock.patch.object(importer, "MAX_REPORTED", 5):
+            result = self.upload("dense.csv", content).context["result"]
+        # 7 overlapping tasks make 21 pairs, 3 of them between existing ones
+        self.assertEqual(result.conflict_count, 18)
+        self.assertEqual(len(result.conflicts), 5)
+        self.assertTrue(all(imported.title.startswith("New") for imported, _ in result.conflicts))
+
+    def test_ics_import_reads_events_rules_and_zones(self):
+        content = "\r\n".join([
+            "BEGIN:VCALENDAR",
+            "BEGIN:VEVENT",
+            "SUMMARY:Review\\, part 1",
+            "DTSTART:20250304T091000Z",
+            "DTEND:20250304T094500Z",
+            "CATEGORIES:WORK,MEETING",
+            "BEGIN:VALARM",
+            "SUMMARY:Reminder",
+            "END:VALARM",
+            "END:VEVENT",
+            "BEGIN:VEVENT",
+            "SUMMARY:Yoga with a long description that the exporter folded over ",
+            " two lines",
+            "DTSTART;VALUE=DATE:20250301",
+            "RRULE:FREQ=YEARLY;COUNT=3",
+            "EXDATE;VALUE=DATE:20260301",
+            "END:VEVENT",
+            "BEGIN:VEVENT",
+            "SUMMARY:Odd",
+            "DTSTART;VALUE=DATE:20250301",
+            "RRULE:FREQ=WEEKLY;BYDAY=MO,WE",
+            "END:VEVENT",
+            "END:VCALENDAR",
+        ])
+        result = self.upload("export.ics", content).context["result"]
+        self.assertEqual(result.created, 2)
+        self.assertEqual(result.errors, [(18, "Unsupported repeat rule FREQ=WEEKLY;BYDAY=MO,WE")])
+        review = Task.objects.get(title="Review, part 1")
+        self.assertEqual((review.start_time, review.end_time), (time(9, 10), time(9, 45)))
+        self.assertEqual(review.category, "work")
+        yoga = Task.objects.get(title__startswith="Yoga")
+        self.assertTrue(yoga.title.endswith("over two lines"))
+        self.assertEqual(
+            (yoga.recurrence, yoga.recurrence_interval, yoga.recurrence_exceptions),
+            ("monthly", 12, ["2026-03-01"]),
+        )
+        self.assertEqual(result.conflict_count, 1)
+
+    def test_rejects_other_file_types(self):
+        response = self.upload("notes.txt", "hello")
+        self.assertIsNone(response.context["result"])
+        self.assertFalse(response.context["form"].is_valid())
+
+    def test_rejects_files_over_the_size_limit(self):
+        with mock.patch("calendar_app.forms.IMPORT_MAX_SIZE", 20):
+            response = self.upload("big.csv", "title,date\nLong enough,2025-03-04\n")
+        self.assertIsNone(response.context["result"])
+        self.assertIn("Files can be up to", response.context["form"].errors["file"][0])
+
+
+class GeocodingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        geocoding.clear()
+        geocoding.breaker.reset()
+        self.user = User.objects.create_user(username="mapper")
+        self.client.force_login(self.user)
+        patcher = mock.patch("calendar_app.geocoding.requests.get", side_effect=self.fake_get)
+        self.mock_get = patcher.start()
+        self.addCleanup(patcher.stop)
+        # Jobs are run by hand here rather than on the worker thread
+        patcher = mock.patch.object(geocoding.worker, "enqueue")
+        self.enqueue = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(geocoding, "throttle", geocoding.Throttle("test", 1000))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(geocoding.clear)
+        self.results = {"klaus advanced computing building": [{"lat": "33.77", "lon": "-84.39"}]}
+
+    def fake_get(self, url, params=None, **kwargs):
+        if url != geocoding.NOMINATIM_URL:
+            return fake_response(503)  # weather
+        return fake_response(data=self.results.get(params["q"], []))
+
+    def geocode_calls(self):
+        return [c for c in self.mock_get.call_args_list if c.args[0] == geocoding.NOMINATIM_URL]
+
+    def queued(self):
+        return set().union(*(c.args[0] for c in self.enqueue.call_args_list))
+
+    def test_saving_queues_a_lookup(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            task = Task.objects.create(
+                user=self.user, title="Lab", date=date.today(), location="Klaus"
+            )
+        self.assertEqual(self.queued(), {task.pk})
+        geocoding.geocode_tasks([task.pk])
+        task.refresh_from_db()
+        self.assertIsNotNone(task.place_id)
+
+        self.enqueue.reset_mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            task.title = "Lab meeting"
+            task.save()
+        self.assertEqual(self.queued(), set())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            task.location = "Klaus Advanced Computing Building"
+            task.save()
+        self.assertIsNone(task.place_id)
+        self.assertEqual(self.queued(), {task.pk})
+
+    def test_import_queues_lookups(self):
+        upload = SimpleUploadedFile(
+            "tasks.csv", b"title,date,location\nLab,2025-03-03,Klaus\nGym,2025-03-04,\n"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            importer.import_tasks(self.user, importer.rows_from_upload(upload))
+        self.assertEqual(self.queued(), set(Task.objects.values_list("id", flat=True)))
+        geocoding.geocode_tasks(self.queued())
+        self.assertEqual(len(self.geocode_calls()), 1)
+
+    def test_each_address_is_looked_up_once(self):
+        today = date.today()
+        for title, location in [("Lab", "Klaus Advanced Computing Building"),
+                                ("Office hours", "  klaus advanced  computing building ")]:
+            Task.objects.create(user=self.user, title=title, date=today, location=location)
+        geocoding.geocode_tasks(Task.objects.values_list("id", flat=True))
+        self.assertEqual(len(self.geocode_calls()), 1)
+        place = Location.objects.get()
+        self.assertEqual(set(Task.objects.values_list("place", flat=True)), {place.pk})
+
+    def test_user_page_only_reads_stored_coordinates(self):
+        today = date.today()
+        lab = Task.objects.create(
+            user=self.user, title="Lab", date=today, location="Klaus Advanced Computing Building"
+        )
+        gym = Task.objects.create(user=self.user, title="Gym", date=today, location="CRC")
+        geocoding.geocode_tasks([lab.pk])
+        self.mock_get.reset_mock()
+
+        response = self.client.get(reverse("calendar_app:user_page"))
+        markers = json.loads(response.context["markers_json"])
+        self.assertEqual([(m["title"], m["lat"]) for m in markers], [("Lab", 33.77)])
+        self.assertEqual(self.geocode_calls(), [])
+        # Not looked up yet; the worker gets to it for next time
+        self.assertEqual(self.queued(), {gym.pk})
+
+    def test_throttle_is_shared_between_processes(self):
+        # Two throttles with one name, like two web processes
+        throttles = [geocoding.Throttle("shared", 20), geocoding.Throttle("shared", 20)]
+        started = time_module.monotonic()
+        for throttle in throttles + throttles[:1]:
+            throttle.take()
+        self.assertGreaterEqual(time_module.monotonic() - started, 0.09)
+        # Each caller is handed the next slot, not the same one
+        delays = [RateLimit.reserve("slots", 10) for _ in range(3)]
+        self.assertEqual(delays[0], 0)
+        self.assertAlmostEqual(delays[1], 10, delta=1)
+        self.assertAlmostEqual(delays[2], 20, delta=1)
+
+    def test_misses_are_cached_until_they_expire(self):
+        self.assertFalse(geocoding.lookup("Nowhere Street").found)
+        self.assertFalse(geocoding.lookup("nowhere street").found)
+        geocoding.clear()
+        self.assertFalse(geocoding.lookup("Nowhere Street").found)
+        self.assertEqual(len(self.geocode_calls()), 1)
+
+        Location.objects.update(
+            fetched_at=timezone.now() - timedelta(seconds=geocoding.NEGATIVE_TTL + 1)
+        )
+        geocoding.clear()
+        self.results["nowhere street"] = [{"lat": "1", "lon": "2"}]
+        location = geocoding.lookup("Nowhere Street")
+        self.assertTrue(location.found)
+        self.assertEqual((location.latitude, location.longitude), (1.0, 2.0))
+        self.assertEqual(len(self.geocode_calls()), 2)
+
+    def test_failures_are_not_cached(self):
+        self.mock_get.side_effect = requests.Timeout
+        self.assertIsNone(geocoding.lookup("Klaus Advanced Computing Building"))
+        self.assertFalse(Location.objects.exists())
+        self.mock_get.side_effect = self.fake_get
+        self.assertTrue(geocoding.lookup("Klaus Advanced Computing Building").found)
+
+
+class WeatherTests(TestCase):
+    FORECAST_URL = "https://api.weather.gov/gridpoints/FFC/51,87/forecast"
+
+    def setUp(self):
+        cache.clear()
+        weather.breaker.reset()
+        self.forecast_headers = {"Cache-Control": "public, max-age=600"}
+        self.temperature = 71
+        patcher = mock.patch("calendar_app.weather.requests.get", side_effect=self.fake_get)
+        self.mock_get = patcher.start()
+        self.addCleanup(patcher.stop)
+        # Background refreshes run inline
+        patcher = mock.patch.object(weather, "_in_background", side_effect=lambda f, *a: f(*a))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fake_get(self, url, **kwargs):
+        if url == self.FORECAST_URL:
+            return fake_response(
+                data={"properties": {"periods": [{
+                    "name": "Today",
+                    "temperature": self.temperature,
+                    "temperatureUnit": "F",
+                    "probabilityOfPrecipitation": {"value": 20},
+                    "detailedForecast": "Sunny.",
+                }]}},
+                headers=self.forecast_headers,
+            )
+        return fake_response(data={"properties": {"forecast": self.FORECAST_URL}})
+
+    def urls(self):
+        return [c.args[0] for c in self.mock_get.call_args_list]
+
+    def expire_forecast(self):
+        key = f"weather:forecast:{self.FORECAST_URL}"
+        entry = cache.get(key)
+        entry["expires"] = 0
+        cache.set(key, entry)
+
+    def test_forecast_is_cached_for_its_max_age(self):
+        self.assertEqual(weather.forecast(33.7756, -84.3963)["temperature"], 71)
+        self.assertEqual(weather.forecast(33.7756, -84.3963)["temperature"], 71)
+        self.assertEqual(len(self.urls()), 2)
+        self.assertEqual(self.urls()[1], self.FORECAST_URL)
+
+    def test_stale_forecast_is_served_while_it_refreshes(self):
+        weather.forecast(33.7756, -84.3963)
+        self.expire_forecast()
+        self.temperature = 65
+        # The stale forecast right away; the refresh fetched only the forecast
+        self.assertEqual(weather.forecast(33.7756, -84.3963)["temperature"], 71)
+        self.assertEqual(self.urls()[2:], [self.FORECAST_URL])
+        self.assertEqual(weather.forecast(33.7756, -84.3963)["temperature"], 65)
+        self.assertEqual(len(self.urls()), 3)
+
+    def test_failures_leave_the_stale_forecast(self):
+        weather.forecast(33.7756, -84.3963)
+        self.expire_forecast()
+        self.mock_get.side_effect = requests.ConnectionError
+        self.assertEqual(weather.forecast(33.7756, -84.3963)["temperature"], 71)
+        cache.clear()
+        self.assertEqual(weather.forecast(33.7756, -84.3963), {})
+
+    def test_ttl_from_headers(self):
+        self.assertEqual(weather.ttl_from({"Cache-Control": "public, max-age=1800"}), 1800)
+        self.assertEqual(weather.ttl_from({"Cache-Control": "no-cache"}), weather.MIN_TTL)
+        expires = timezone.now() + timedelta(hours=2)
+        ttl = weather.ttl_from({"Expires": expires.strftime("%a, %d %b %Y %H:%M:%S GMT")})
+        self.assertAlmostEqual(ttl, 7200, delta=5)
+        self.assertEqual(weather.ttl_from({}), weather.FORECAST_TTL)
+
+
+class UpstreamTests(TestCase):
+    def setUp(self):
+        self.breaker = upstream.CircuitBreaker("test", threshold=2, reset_timeout=0.05)
+        self.status = 503
+        patcher = mock.patch(
+            "calendar_app.upstream.requests.get",
+            side_effect=lambda *args, **kwargs: fake_response(self.status),
+        )
+        self.mock_get = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def call(self):
+        return upstream.get(self.breaker, "https://example.com/", timeout=5)
+
+    def test_breaker_opens_and_probes(self):
+        self.call()
+        self.call()
+        self.assertEqual(self.breaker.state, upstream.OPEN)
+        with self.assertRaises(upstream.Unavailable):
+            self.call()
+        self.assertEqual(self.mock_get.call_count, 2)
+
+        # Half-open: one probe, which fails and re-opens the circuit
+        time_module.sleep(0.06)
+        self.call()
+        self.assertEqual(self.breaker.state, upstream.OPEN)
+        time_module.sleep(0.06)
+        self.status = 200
+        self.call()
+        self.assertEqual(self.breaker.state, upstream.CLOSED)
+        self.assertEqual(self.mock_get.call_count, 4)
+
+    def test_budget_is_shared_by_calls(self):
+        @upstream.latency_budget(0.05)
+        def view(request):
+            self.status = 200
+            self.call()
+            self.assertLessEqual(self.mock_get.call_args.kwargs["timeout"], 0.05)
+            time_module.sleep(0.06)
+            self.call()
+
+        with self.assertRaises(upstream.Unavailable):
+            view(None)
+        self.assertEqual(self.mock_get.call_count, 1)
+        # Nothing outside the view is cut short
+        self.call()
+        self.assertEqual(self.mock_get.call_args.kwargs["timeout"], 5)
+
+    def test_body_is_returned_with_the_response(self):
+        self.mock_get.side_effect = lambda *args, **kwargs: fake_response(200, {"ok": True})
+        response, body = self.call()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(body), {"ok": True})
+
+    def test_slow_body_is_cut_off_at_the_deadline(self):
+        def trickle(*args, **kwargs):
+            response = fake_response(200)
+            response.raw = TricklingBody()
+            return response
+
+        self.mock_get.side_effect = trickle
+
+        @upstream.latency_budget(0.1)
+        def view(request):
+            started = time_module.monotonic()
+            with self.assertRaises(requests.Timeout):
+                self.call()
+            return time_module.monotonic() - started
+
+        self.assertLess(view(None), 0.3)
+        # The budget ran out, which says nothing about the upstream
+        self.assertEqual(self.breaker._failures, 0)
+        # Its own timeout running out does
+        with self.assertRaises(requests.Timeout):
+            upstream.get(self.breaker, "https://example.com/", timeout=0.1)
+        self.assertEqual(self.breaker._failures, 1)
+
+    def test_user_page_degrades_while_weather_is_down(self):
+        user = User.objects.create_user(username="outage")
+        self.client.force_login(user)
+        cache.clear()
+        self.addCleanup(weather.breaker.reset)
+        for _ in range(weather.breaker.threshold):
+            weather.breaker.record_failure()
+
+        response = self.client.get(reverse("calendar_app:user_page"))
+        self.assertContains(response, "Unable to fetch weather data")
+        self.assertIn("no-store", response["Cache-Control"])
+        self.mock_get.assert_not_called()
+
+
+class EventStreamTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(CALENDAR_EVENTS_DIR=self.tmp.name)
+        self.settings_override.enable()
+        self.user = User.objects.create_user(username="live")
+        self.other = User.objects.create_user(username="elsewhere")
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmp.cleanup()
+
+    async def test_publish_reaches_only_addressed_subscribers(self):
+        mine = await events.broker.subscribe(self.user.id)
+        theirs = await events.broker.subscribe(self.other.id)
+        try:
+            # Published from a worker thread, like a sync view would
+            await asyncio.to_thread(events.publish, [self.user.id], {"type": "created", "id": 1})
+            self.assertEqual(await mine.get(1), {"type": "created", "id": 1})
+            with self.assertRaises(asyncio.TimeoutError):
+                await theirs.get(0.05)
+        finally:
+            mine.close()
+            theirs.close()
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    async def test_stream_pushes_task_changes(self):
+        request = AsyncRequestFactory().get(reverse("calendar_app:event_stream"))
+        user = self.user
+
+        async def auser():
+            return user
+
+        request.auser = auser
+        response = await views.event_stream(request)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = response.streaming_content
+        self.assertEqual(await anext(stream), b"retry: 5000\n\n")
+
+        def complete_task():
+            with self.captureOnCommitCallbacks(execute=True):
+                task = Task.objects.create(user=user, title="Ping", date=date(2025, 3, 3))
+            with self.captureOnCommitCallbacks(execute=True):
+                task.completed = True
+                task.save()
+            return task.id
+
+        task_id = await sync_to_async(complete_task)()
+        created = await asyncio.wait_for(anext(stream), 1)
+        completed = await asyncio.wait_for(anext(stream), 1)
+        await stream.aclose()
+        self.assertTrue(created.startswith(b"event: created\n"))
+        self.assertIn(f'"id": {task_id}'.encode(), created)
+        self.assertTrue(completed.startswith(b"event: completed\n"))
+
+    def test_requires_login(self):
+        self.assertEqual(self.client.get(reverse("calendar_app:event_stream")).status_code, 401)
+
+    def test_no_stream_under_wsgi(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("calendar_app:event_stream"))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(response.streaming)
+
+    def test_large_fan_out_is_split_into_refreshes(self):
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        listener.bind(os.path.join(self.tmp.name, "listener"))
+        listener.setblocking(False)
+        try:
+            user_ids = list(range(1000000, 1000000 + events.REFRESH_BATCH * 3 + 1))
+            events.publish(user_ids, {"type": "created", "id": 1})
+            received = []
+            while True:
+                try:
+                    data = listener.recv(events.MAX_DATAGRAM * 2)
+                except BlockingIOError:
+                    break
+                self.assertLessEqual(len(data), events.MAX_DATAGRAM)
+                received.append(json.loads(data))
+        finally:
+            listener.close()
+        self.assertEqual(len(received), 4)
+        self.assertEqual({message["event"]["type"] for message in received}, {"refresh"})
+        self.assertEqual([u for message in received for u in message["users"]], user_ids)
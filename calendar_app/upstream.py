@@ -0,0 +1,174 @@
+"""
+Guards for the third-party HTTP APIs we call (weather.gov, Nominatim).
+
+Each upstream has a CircuitBreaker: after UPSTREAM_FAILURE_THRESHOLD
+failures in a row it opens and calls fail at once, without touching the
+network, for UPSTREAM_RESET_TIMEOUT seconds. After that one probe call is
+let through (half-open); its success closes the circuit again and its
+failure re-opens it. Breakers are per process.
+
+A view can also give all of its outbound calls one shared latency budget
+with @latency_budget(seconds): each call's timeout is cut to what is left
+of it, and once it is spent the remaining calls fail at once.
+
+requests' own timeout only bounds each socket read, so get() streams the
+body in chunks and gives up once the call's timeout has passed in
+wall-clock time, checked between chunks, however steadily a slow upstream
+keeps trickling bytes in.
+
+Both failures raise Unavailable, a requests.RequestException, so callers'
+existing error handling degrades the page instead of failing it.
+"""
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+import requests
+from django.conf import settings
+
+FAILURE_THRESHOLD = getattr(settings, "UPSTREAM_FAILURE_THRESHOLD", 5)
+RESET_TIMEOUT = getattr(settings, "UPSTREAM_RESET_TIMEOUT", 30)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+# Bytes per chunk of a streamed body; the deadline is checked between chunks
+CHUNK_SIZE = 8192
+
+# time.monotonic() by which the current request's outbound calls must be
+# done, or None outside a budgeted view (e.g. on background threads)
+_deadline = ContextVar("upstream_deadline", default=None)
+
+
+class Unavailable(requests.RequestException):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, name, threshold=None, reset_timeout=None):
+        self.name = name
+        self.threshold = threshold or FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout or RESET_TIMEOUT
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+        return self._state
+
+    def allow(self):
+        """Whether a call may go out now; half-open lets one probe through"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def release(self):
+        """A call ended without telling us anything about the upstream"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.threshold:
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+def latency_budget(seconds):
+    """Give the view's outbound calls `seconds` in total"""
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            token = _deadline.set(time.monotonic() + seconds)
+            try:
+                return view_func(request, *args, **kwargs)
+            finally:
+                _deadline.reset(token)
+
+        return wrapper
+
+    return decorator
+
+
+def _read_body(response, stop):
+    """
+    The streamed `response`'s body, raising requests.ReadTimeout once
+    time.monotonic() passes `stop`
+    """
+    chunks = []
+    try:
+        for chunk in response.iter_content(CHUNK_SIZE):
+            chunks.append(chunk)
+            if time.monotonic() > stop:
+                raise requests.ReadTimeout(
+                    f"{response.url} is taking too long", response=response
+                )
+    finally:
+        response.close()
+    return b"".join(chunks)
+
+
+def get(breaker, url, timeout, **kwargs):
+    """
+    requests.get(url) through `breaker`, with `timeout` cut to the rest of
+    the request's latency budget and applied to the whole call, body
+    included. Returns the response and its body, already read. 5xx and
+    429 responses count as failures but are returned like any other
+    response.
+    """
+    now = time.monotonic()
+    deadline = _deadline.get()
+    cut = False
+    if deadline is not None:
+        left = deadline - now
+        if left <= 0:
+            raise Unavailable(f"No time left to call {breaker.name}")
+        cut = left < timeout
+        timeout = min(timeout, left)
+    if not breaker.allow():
+        raise Unavailable(f"{breaker.name} is unavailable")
+    try:
+        response = requests.get(url, timeout=timeout, stream=True, **kwargs)
+        body = _read_body(response, now + timeout)
+    except requests.Timeout:
+        # Timing out on a shortened budget says little about the upstream
+        if cut:
+            breaker.release()
+        else:
+            breaker.record_failure()
+        raise
+    except Exception:
+        breaker.record_failure()
+        raise
+    if response.status_code >= 500 or response.status_code == 429:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return response, body
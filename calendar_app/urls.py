@@ -1,15 +1,32 @@
 # calendar_app/urls.py
 from django.urls import path
-from . import views
+from . import views, api_views, feed_views
 
 app_name = 'calendar_app'
 
 urlpatterns = [
     # Calendar views
     path('', views.calendar_view, name='calendar_view'),
+    path('week/', views.week_view, name='week_view'),
+    path('day/', views.day_view, name='day_view'),
+    path('year/', views.year_view, name='year_view'),
+    path('agenda/', views.agenda_view, name='agenda_view'),
+    path('events/', views.event_stream, name='event_stream'),
     path('delete-task/<int:task_id>/', views.delete_task, name='delete_task'),
     path('user-page/', views.user_page, name='user_page'),
     path('complete-task/<int:task_id>/', views.complete_task, name='complete_task'),
+    path('import/', views.import_tasks, name='import_tasks'),
+
+    # JSON API
+    path('api/tasks', api_views.tasks_api, name='tasks_api'),
+    path('api/agenda', api_views.agenda_api, name='agenda_api'),
+    path('api/changes', api_views.changes_api, name='changes_api'),
+    path('api/tasks/bulk', api_views.bulk_tasks_api, name='bulk_tasks_api'),
+
+    # iCalendar subscription feeds
+    path('feeds/reset/', feed_views.reset_feed_token, name='reset_feed_token'),
+    path('feeds/<str:token>.ics', feed_views.user_feed, name='user_feed'),
+    path('feeds/<str:token>/projects/<int:project_id>.ics', feed_views.project_feed, name='project_feed'),
     
     # Document management URLs
     path('documents/', views.document_list, name='document_list'),
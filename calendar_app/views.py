@@ -1,20 +1,82 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.db.models import Q
-from datetime import datetime, date
+from datetime import MAXYEAR, MINYEAR, datetime, date, time
 from django.utils import timezone
 from datetime import timedelta
-import requests
 import calendar
 from django.contrib import messages
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
 from home.models import Task  # Use Task from home app
-from .forms import TaskForm, CalendarSearchForm, DocumentUploadForm, DocumentFilterForm
+from home import scheduling
+from home.decorators import user_data_condition
+from .forms import (
+    TaskForm, CalendarSearchForm, DocumentUploadForm, DocumentFilterForm, TaskImportForm,
+    IMPORT_MAX_SIZE,
+)
 from .models import Document
+from . import agenda, cache as month_cache, events, geocoding, importer, upstream, weather
+import asyncio
 import json
-import urllib.parse
+
+
+def _build_month(user, year, month, filters):
+    """Compute the month grid and the filtered tasks for each day"""
+    month_start = date(year, month, 1)
+    month_end = date(year, month, calendar.monthrange(year, month)[1])
+    # Fetch what the grid renders up front so cached tasks need no queries
+    tasks = Task.objects.select_related("assigned_by", "group")
+
+    search_keyword = filters.get("search")
+    category_filter = filters.get("category")
+    start_date = filters.get("start_date")
+    end_date = filters.get("end_date")
+
+    # Apply filters
+    if search_keyword:
+        # Full-text prefix match, ranked by relevance below
+        tasks = tasks.search(search_keyword)
+
+    if category_filter:
+        tasks = tasks.filter(category=category_filter)
+
+    # Date filters narrow the window recurring tasks are expanded over
+    window_start = max(month_start, start_date) if start_date else month_start
+    window_end = min(month_end, end_date) if end_date else month_end
+
+    # Get tasks assigned to user OR to groups the user is a member of
+    occurrences = []
+    if window_start <= window_end:
+        occurrences = tasks.occurrences(user, window_start, window_end)
+    if search_keyword:
+        # Best matches first within each day
+        occurrences.sort(key=lambda task: (task.date, task.search_rank))
+
+    # Flag clashing tasks with one sweep over what was already fetched
+    conflict_pairs = scheduling.mark_conflicts(occurrences)
+
+    # Calendar logic
+    cal = calendar.Calendar(firstweekday=6)  # Start with Sunday
+    month_days = cal.monthdayscalendar(year, month)
+
+    tasks_by_date = {}
+    for task in occurrences:
+        day = task.date.day
+        if day not in tasks_by_date:
+            tasks_by_date[day] = []
+        tasks_by_date[day].append(task)
+
+    return {
+        "calendar": month_days,
+        "tasks_by_date": tasks_by_date,
+        "conflict_pairs": conflict_pairs,
+    }
 
 
 @login_required
+@user_data_condition("calendar")
 def calendar_view(request):
     # Get current month/year or from request
     today = date.today()
@@ -48,7 +110,7 @@ def calendar_view(request):
                     end_time=task.end_time,
                 )
 
-                if conflicts.exists():
+                if conflicts:
                     conflict_list = ", ".join(
                         [
                             f"'{c.title}' ({c.start_time.strftime('%I:%M %p')} - {c.end_time.strftime('%I:%M %p')})"
@@ -69,44 +131,20 @@ def calendar_view(request):
 
     # Handle search and filters
     search_form = CalendarSearchForm(request.GET or None)
-    # Get tasks assigned to user OR to groups the user is a member of
-    tasks = Task.objects.filter(
-        Q(user=request.user) | Q(group__memberships__user=request.user)
-    ).distinct()
-
-    if search_form.is_valid():
-        search_keyword = search_form.cleaned_data.get("search")
-        category_filter = search_form.cleaned_data.get("category")
-        start_date = search_form.cleaned_data.get("start_date")
-        end_date = search_form.cleaned_data.get("end_date")
-
-        # Apply filters
-        if search_keyword:
-            tasks = tasks.filter(
-                Q(title__icontains=search_keyword)
-                | Q(description__icontains=search_keyword)
-                | Q(location__icontains=search_keyword)
-            )
-
-        if category_filter:
-            tasks = tasks.filter(category=category_filter)
-
-        if start_date:
-            tasks = tasks.filter(date__gte=start_date)
-        if end_date:
-            tasks = tasks.filter(date__lte=end_date)
-
-    # Calendar logic
-    cal = calendar.Calendar(firstweekday=6)  # Start with Sunday
-    month_days = cal.monthdayscalendar(year, month)
-
-    # Get tasks for the current month view
-    tasks_by_date = {}
-    for task in tasks.filter(date__year=year, date__month=month):
-        day = task.date.day
-        if day not in tasks_by_date:
-            tasks_by_date[day] = []
-        tasks_by_date[day].append(task)
+    filters = search_form.cleaned_data if search_form.is_valid() else {}
+
+    # The month grid and its tasks only change when one of the user's tasks
+    # does, so they are cached per user/month/filters (see calendar_app.cache)
+    payload = month_cache.get_month(
+        request.user.id,
+        year,
+        month,
+        filters,
+        lambda: _build_month(request.user, year, month, filters),
+    )
+    month_days = payload["calendar"]
+    tasks_by_date = payload["tasks_by_date"]
+    conflict_pairs = payload["conflict_pairs"]
 
     # Navigation
     prev_month = month - 1 if month > 1 else 12
@@ -120,6 +158,7 @@ def calendar_view(request):
         "month_name": date(year, month, 1).strftime("%B"),
         "calendar": month_days,
         "tasks_by_date": tasks_by_date,
+        "conflict_pairs": conflict_pairs,
         "prev_month": prev_month,
         "prev_year": prev_year,
         "next_month": next_month,
@@ -135,14 +174,183 @@ def calendar_view(request):
     return render(request, "calendar_app/calendar.html", context)
 
 
+def _percent(minutes):
+    return f"{minutes * 100 / (24 * 60):.3f}"
+
+
+def _build_time_grid(user, start, end):
+    """Tasks for each day in [start, end], timed ones laid out in columns"""
+    occurrences = Task.objects.select_related("assigned_by", "group").occurrences(
+        user, start, end
+    )
+    conflict_pairs = scheduling.mark_conflicts(occurrences)
+    scheduling.pack_columns(occurrences)
+
+    days = {}
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        days[day] = {"date": day, "all_day": [], "timed": []}
+
+    for task in occurrences:
+        if not scheduling.is_timed(task):
+            days[task.date]["all_day"].append(task)
+            continue
+        top = task.start_time.hour * 60 + task.start_time.minute
+        bottom = task.end_time.hour * 60 + task.end_time.minute
+        # Positions as percentages of the day column, ready for inline styles
+        task.layout = {
+            "top": _percent(top),
+            "height": _percent(max(bottom - top, 15)),
+            "left": f"{task.column * 100 / task.columns:.3f}",
+            "width": f"{100 / task.columns:.3f}",
+        }
+        days[task.date]["timed"].append(task)
+
+    return {"days": list(days.values()), "conflict_pairs": conflict_pairs}
+
+
+# Keeps the week and the prev/next links inside date.min..date.max
+TIME_GRID_MARGIN = timedelta(days=14)
+
+
+def _time_grid(request, kind):
+    try:
+        anchor = date.fromisoformat(request.GET.get("date", ""))
+    except ValueError:
+        anchor = date.today()
+    anchor = min(max(anchor, date.min + TIME_GRID_MARGIN), date.max - TIME_GRID_MARGIN)
+
+    if kind == "week":
+        # Sunday to Saturday, like the month grid
+        start = anchor - timedelta(days=(anchor.weekday() + 1) % 7)
+        end = start + timedelta(days=6)
+        step = timedelta(days=7)
+        title = f"{start.strftime('%b %d')} – {end.strftime('%b %d, %Y')}"
+    else:
+        start = end = anchor
+        step = timedelta(days=1)
+        title = anchor.strftime("%A, %B %d, %Y")
+
+    # Only this window is fetched, and its layout is cached with it
+    payload = month_cache.get_window(
+        request.user.id,
+        kind,
+        start,
+        end,
+        lambda: _build_time_grid(request.user, start, end),
+    )
+
+    context = {
+        "view": kind,
+        "title": title,
+        "days": payload["days"],
+        "conflict_pairs": payload["conflict_pairs"],
+        "hours": [time(hour) for hour in range(24)],
+        "anchor": anchor,
+        "start": start,
+        "end": end,
+        "prev_date": (start - step).isoformat(),
+        "next_date": (start + step).isoformat(),
+        "today": date.today(),
+    }
+    return render(request, "calendar_app/time_grid.html", context)
+
+
+def _build_year(user, year):
+    """Per-day task and completion counts for the year, as heatmap months"""
+    counts = Task.objects.day_counts(user, date(year, 1, 1), date(year, 12, 31))
+    busiest = max((total for total, _ in counts.values()), default=0)
+
+    cal = calendar.Calendar(firstweekday=6)  # Start with Sunday
+    months = []
+    for month in range(1, 13):
+        weeks = []
+        for week in cal.monthdatescalendar(year, month):
+            cells = []
+            for day in week:
+                if day.month != month:
+                    cells.append(None)
+                    continue
+                total, done = counts.get(day, (0, 0))
+                # Five shades, scaled to the user's busiest day
+                level = -(-total * 4 // busiest) if busiest else 0
+                cells.append({"date": day, "count": total, "done": done, "level": level})
+            weeks.append(cells)
+        months.append({"number": month, "name": calendar.month_name[month], "weeks": weeks})
+
+    return {
+        "months": months,
+        "total": sum(total for total, _ in counts.values()),
+        "completed": sum(done for _, done in counts.values()),
+        "busiest": busiest,
+    }
+
+
+@login_required
+@user_data_condition("calendar-year")
+def year_view(request):
+    try:
+        year = int(request.GET.get("year", date.today().year))
+    except ValueError:
+        year = date.today().year
+    # The first and last years' grids spill into years date can't hold
+    if not MINYEAR < year < MAXYEAR:
+        year = date.today().year
+
+    # One aggregate for the whole year, cached until a task in it changes
+    payload = month_cache.get_window(
+        request.user.id,
+        "year",
+        date(year, 1, 1),
+        date(year, 12, 31),
+        lambda: _build_year(request.user, year),
+    )
+
+    context = dict(payload, year=year, prev_year=year - 1, next_year=year + 1)
+    return render(request, "calendar_app/year.html", context)
+
+
+@login_required
+@user_data_condition("agenda")
+def agenda_view(request):
+    """Everything from ?start= (default today) onward, a page at a time"""
+    try:
+        start = date.fromisoformat(request.GET.get("start", ""))
+    except ValueError:
+        start = date.today()
+    try:
+        cursor = request.GET.get("cursor")
+        cursor = agenda.decode_cursor(cursor) if cursor else None
+    except agenda.InvalidCursor:
+        cursor = None
+
+    tasks, next_cursor = agenda.page(request.user, start, cursor=cursor)
+
+    context = {
+        "tasks": tasks,
+        "start": start,
+        "next_cursor": next_cursor,
+        "page_size": agenda.DEFAULT_PAGE_SIZE,
+    }
+    return render(request, "calendar_app/agenda.html", context)
+
+
+@login_required
+@user_data_condition("calendar-week")
+def week_view(request):
+    return _time_grid(request, "week")
+
+
+@login_required
+@user_data_condition("calendar-day")
+def day_view(request):
+    return _time_grid(request, "day")
+
+
 @login_required
 def delete_task(request, task_id):
     # Get task that belongs to user OR their groups
-    task = get_object_or_404(
-        Task,
-        Q(id=task_id)
-        & (Q(user=request.user) | Q(group__memberships__user=request.user)),
-    )
+    task = get_object_or_404(Task.objects.visible_to(request.user), id=task_id)
     if request.method == "POST":
         # Check if task can be deleted (respects is_deletable for assigned tasks)
         if task.can_be_deleted_by(request.user):
@@ -154,42 +362,54 @@ def delete_task(request, task_id):
     return redirect("calendar_app:calendar_view")
 
 
-def get_weather(lat, long):
-    headers = {"User-Agent": "calender_buddy", "Accept": "application/json"}
-    points_url = f"https://api.weather.gov/points/{lat},{long}"
-    print("Fetching weather data from:", points_url)
-    resp = requests.get(points_url, headers=headers)
-    print("Status code:", resp.status_code)
-    print("Content snippet:", resp.text[:500])
-
-    if resp.status_code != 200:
-        return {}
-    grid_data = resp.json()
-    if "properties" not in grid_data:
-        print("No properties key found in response!")
-        return {}
-    forecast_url = grid_data["properties"]["forecast"]
-
-    forecast_resp = requests.get(forecast_url, headers=headers)
-    if forecast_resp.status_code != 200:
-        return {}
-
-    forecast_data = forecast_resp.json()
-    # Return just the first period (today or next)
-    first_period = forecast_data["properties"]["periods"][0]
-    print("test", first_period)
-    return {
-        "name": first_period["name"],
-        "temperature": first_period["temperature"],
-        "temperatureUnit": first_period["temperatureUnit"],
-        "precipitation": first_period.get("probabilityOfPrecipitation", {}).get(
-            "value", 0
-        ),
-        "detailedForecast": first_period["detailedForecast"],
-    }
+# Seconds between keep-alive comments on an idle event stream
+EVENT_STREAM_HEARTBEAT = 20
+
+
+async def event_stream(request):
+    """
+    Server-Sent Events with the user's task changes, for open calendar
+    tabs to refresh themselves instead of polling. Needs an ASGI server;
+    see calendar_app.events for how changes reach every worker.
+
+    Under WSGI the whole response would be produced before any of it is
+    sent, holding a worker thread forever, so it answers 204 instead and
+    live.js stops trying.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    async def stream():
+        subscription = await events.broker.subscribe(user.id)
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = await subscription.get(EVENT_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # don't let a proxy hold events back
+    return response
+
+
+# Seconds user_page may spend on weather.gov in total, so an outage can't
+# hold a worker for a timeout per call
+USER_PAGE_BUDGET = 3
 
 
 @login_required
+@user_data_condition("user_page", per_hour=True)  # weather is hourly
+@upstream.latency_budget(USER_PAGE_BUDGET)
 def user_page(request):
     today = timezone.now().date()
     start_of_week = today - timedelta(days=today.weekday())  # Monday
@@ -197,75 +417,91 @@ def user_page(request):
 
     # Filter tasks for the user OR group tasks
     weekly_tasks = (
-        Task.objects.filter(
-            Q(user=request.user) | Q(group__memberships__user=request.user),
-            date__range=[start_of_week, end_of_week],
-            completed=False,
-        )
-        .distinct()
-        .order_by("date", "start_time")
+        Task.objects.select_related("place")
+        .filter(completed=False)
+        .occurrences(request.user, start_of_week, end_of_week)
     )
 
     # ---------- BUILD MAP MARKERS ----------
+    # Coordinates are looked up when tasks are saved; anything still
+    # missing or out of date is queued for next time
     markers = []
-
+    unresolved = set()
     for task in weekly_tasks:
-        if task.location and task.location.strip():
-            try:
-                query = urllib.parse.quote(task.location)
-                url = (
-                    f"https://nominatim.openstreetmap.org/search"
-                    f"?q={query}&format=json&limit=1"
-                )
-                headers = {"User-Agent": "calendar_buddy_app"}
-
-                r = requests.get(url, headers=headers, timeout=5)
-                data = r.json()
-
-                if data:
-                    lat = float(data[0]["lat"])
-                    lon = float(data[0]["lon"])
-
-                    markers.append(
-                        {
-                            "title": task.title,
-                            "location": task.location,
-                            "lat": lat,
-                            "lon": lon,
-                            "date": str(task.date),
-                        }
-                    )
-
-            except Exception as e:
-                print("GEOCODING ERROR:", e)
+        if not task.location.strip():
+            continue
+        place = geocoding.stored_place(task)
+        if place is not None and place.found:
+            markers.append(
+                {
+                    "title": task.title,
+                    "location": task.location,
+                    "lat": place.latitude,
+                    "lon": place.longitude,
+                    "date": str(task.date),
+                }
+            )
+        if geocoding.needs_lookup(task):
+            unresolved.add(task.pk)
+    if unresolved:
+        geocoding.worker.enqueue(unresolved)
 
     markers_json = json.dumps(markers)
 
-    # ---------- WEATHER ----------
-    weather = get_weather(33.7756, -84.3963)
+    # Cached; a stale forecast is refreshed in the background
+    forecast = weather.forecast(33.7756, -84.3963)
 
     context = {
         "weekly_tasks": weekly_tasks,
         "start_of_week": start_of_week,
         "end_of_week": end_of_week,
-        "weather": weather,
+        "weather": forecast,
         "markers_json": markers_json,  # ← CRITICAL
     }
 
-    return render(request, "calendar_app/user_page.html", context)
+    response = render(request, "calendar_app/user_page.html", context)
+    if not forecast:
+        # Don't let a 304 keep showing "unavailable" once weather.gov is back
+        patch_cache_control(response, no_store=True)
+    return response
 
 
 def complete_task(request, task_id):
-    task = get_object_or_404(
-        Task,
-        Q(id=task_id)
-        & (Q(user=request.user) | Q(group__memberships__user=request.user)),
-    )
-    task.completed = True
-    task.save()
+    task = get_object_or_404(Task.objects.visible_to(request.user), id=task_id)
+    # Recurring tasks are completed one occurrence at a time
+    try:
+        day = date.fromisoformat(request.POST.get("date", ""))
+    except ValueError:
+        day = task.date
+    task.complete_occurrence(day)
     return redirect("calendar_app:user_page")
 
 
+@login_required
+def import_tasks(request):
+    """Create many tasks at once from an .ics or .csv file"""
+    result = None
+    if request.method == "POST":
+        form = TaskImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data["file"]
+            result = importer.import_tasks(request.user, importer.rows_from_upload(upload))
+            if result.created:
+                messages.success(request, f"Imported {result.created} task(s).")
+    else:
+        form = TaskImportForm()
+    return render(
+        request,
+        "calendar_app/import_tasks.html",
+        {
+            "form": form,
+            "result": result,
+            "columns": list(TaskForm.base_fields),
+            "max_size": IMPORT_MAX_SIZE,
+        },
+    )
+
+
 # ================== DOCUMENT VIEWS ==================
 
 
@@ -387,11 +623,7 @@ def delete_document(request, document_id):
 @login_required
 def task_documents(request, task_id):
     """View all documents linked to a specific task"""
-    task = get_object_or_404(
-        Task,
-        Q(id=task_id)
-        & (Q(user=request.user) | Q(group__memberships__user=request.user)),
-    )
+    task = get_object_or_404(Task.objects.visible_to(request.user), id=task_id)
 
     documents = Document.objects.filter(user=request.user, task=task)
 
@@ -0,0 +1,149 @@
+"""
+The forecast box on user_page, from api.weather.gov.
+
+A forecast takes two requests: /points/<lat>,<lon> names the grid cell's
+forecast URL, which then gives the forecast. The grid mapping doesn't
+change, so it is cached with no expiry. Forecasts are cached for as long as
+the upstream Cache-Control max-age (or Expires) allows, and then kept for
+WEATHER_STALE_TTL more: a page that finds an expired forecast shows it
+anyway and refreshes it in the background, so only the very first view
+ever waits on weather.gov.
+
+Requests go through the weather.gov circuit breaker and the view's latency
+budget (see upstream), so an outage shows "weather unavailable" quickly.
+"""
+import json
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+from . import upstream
+
+POINTS_URL = "https://api.weather.gov/points/{lat:.4f},{lon:.4f}"
+HEADERS = {"User-Agent": "calender_buddy", "Accept": "application/json"}
+# Seconds to wait for weather.gov
+TIMEOUT = 5
+
+# Used when a forecast comes without caching headers
+FORECAST_TTL = getattr(settings, "WEATHER_FORECAST_TTL", 60 * 60)
+# How long past its expiry a forecast is still shown while it's refreshed
+STALE_TTL = getattr(settings, "WEATHER_STALE_TTL", 24 * 60 * 60)
+# Floor for max-age=0 and friends, so a burst of views costs one refresh
+MIN_TTL = 60
+
+# A fetch that failed, including one with an unexpected body
+ERRORS = (requests.RequestException, ValueError, KeyError, IndexError)
+
+breaker = upstream.CircuitBreaker("weather.gov")
+
+MAX_AGE_RE = re.compile(r"(?:^|,)\s*max-age\s*=\s*(\d+)", re.IGNORECASE)
+
+
+def _grid_key(lat, lon):
+    return f"weather:grid:{lat:.4f},{lon:.4f}"
+
+
+def _forecast_key(url):
+    return f"weather:forecast:{url}"
+
+
+def ttl_from(headers):
+    """Seconds a response may be reused for, from its caching headers"""
+    cache_control = headers.get("Cache-Control", "")
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return MIN_TTL
+    match = MAX_AGE_RE.search(cache_control)
+    if match:
+        return max(int(match.group(1)), MIN_TTL)
+    if headers.get("Expires"):
+        try:
+            expires = parsedate_to_datetime(headers["Expires"]).timestamp()
+        except (TypeError, ValueError):
+            return MIN_TTL  # RFC 9111: an invalid Expires means already expired
+        return max(int(expires - time.time()), MIN_TTL)
+    return FORECAST_TTL
+
+
+def _forecast_url(lat, lon):
+    """The grid cell's forecast URL, or None if weather.gov didn't say"""
+    key = _grid_key(lat, lon)
+    url = cache.get(key)
+    if url is None:
+        response, body = upstream.get(
+            breaker, POINTS_URL.format(lat=lat, lon=lon), headers=HEADERS, timeout=TIMEOUT
+        )
+        if response.status_code != 200:
+            return None
+        url = json.loads(body).get("properties", {}).get("forecast")
+        if not url:
+            return None
+        cache.set(key, url, None)
+    return url
+
+
+def _refresh(lat, lon, url):
+    """Fetch and cache the forecast at `url`; the weather dict or None"""
+    response, body = upstream.get(breaker, url, headers=HEADERS, timeout=TIMEOUT)
+    if response.status_code == 404:
+        # The grid was remapped; look the point up again next time
+        cache.delete(_grid_key(lat, lon))
+    if response.status_code != 200:
+        return None
+    # Just the first period (today or next)
+    period = json.loads(body)["properties"]["periods"][0]
+    weather = {
+        "name": period["name"],
+        "temperature": period["temperature"],
+        "temperatureUnit": period["temperatureUnit"],
+        "precipitation": (period.get("probabilityOfPrecipitation") or {}).get("value") or 0,
+        "detailedForecast": period["detailedForecast"],
+    }
+    ttl = ttl_from(response.headers)
+    cache.set(
+        _forecast_key(url),
+        {"weather": weather, "expires": time.time() + ttl},
+        ttl + STALE_TTL,
+    )
+    return weather
+
+
+def _in_background(func, *args):
+    threading.Thread(target=func, args=args, daemon=True).start()
+
+
+def _revalidate(lat, lon, url):
+    lock = f"{_forecast_key(url)}:refreshing"
+    # One refresh at a time, however many views find the forecast stale
+    if not cache.add(lock, True, TIMEOUT * 2):
+        return
+
+    def run():
+        try:
+            _refresh(lat, lon, url)
+        except ERRORS:
+            pass  # keep showing the stale forecast; try again next view
+        finally:
+            cache.delete(lock)
+
+    _in_background(run)
+
+
+def forecast(lat, lon):
+    """The current forecast period at (lat, lon) as a dict; {} if unknown"""
+    try:
+        url = _forecast_url(lat, lon)
+        if url is None:
+            return {}
+        entry = cache.get(_forecast_key(url))
+        if entry is None:
+            return _refresh(lat, lon, url) or {}
+    except ERRORS:
+        return {}
+    if entry["expires"] <= time.time():
+        _revalidate(lat, lon, url)
+    return entry["weather"]
@@ -74,13 +74,17 @@ class TaskAdminForm(forms.ModelForm):
 class TaskAdmin(admin.ModelAdmin):
     form = TaskAdminForm
     list_display = ['title', 'user', 'date', 'category', 'group', 'project', 'assigned_by', 'is_deletable', 'created_at']
-    list_filter = ['date', 'color', 'category', 'is_deletable', 'group', 'project']
+    list_filter = ['date', 'color', 'category', 'recurrence', 'is_deletable', 'group', 'project']
     search_fields = ['title', 'description', 'user__username', 'project__name']
     readonly_fields = ['created_at', 'updated_at']
     fieldsets = (
         ('Basic Information', {
             'fields': ('title', 'description', 'date', 'start_time', 'end_time', 'location', 'color', 'category', 'completed')
         }),
+        ('Recurrence', {
+            'fields': ('recurrence', 'recurrence_interval', 'recurrence_until', 'recurrence_count', 'recurrence_exceptions'),
+            'classes': ('collapse',)
+        }),
         ('Assignment', {
             'fields': ('user', 'group', 'project', 'assigned_by', 'is_deletable'),
             'description': 'Assign to EITHER a user OR a group (not both). Optionally link to a project.'
@@ -0,0 +1,113 @@
+"""
+Operations on many tasks at once (see calendar_app.api_views.bulk_tasks_api).
+
+Each operation is one set-based UPDATE or DELETE over the chosen tasks
+rather than a save() or delete() per task. The per-task signal handlers
+don't run for those, so the visibility rows, tombstones and a single
+tasks_changed for the whole batch are handled here instead, in the same
+transaction.
+"""
+from django.db import transaction
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from django.utils import timezone
+
+from .models import Task, TaskTombstone, TaskVisibility
+from .signals import bulk_operation, tasks_changed
+
+# Most tasks one request may touch
+MAX_TASKS = 500
+
+OK, NOT_FOUND, FORBIDDEN, RECURRING = "ok", "not_found", "forbidden", "recurring"
+
+# operation -> tasks_changed action
+OPERATIONS = {
+    "complete": "completed",
+    "delete": "deleted",
+    "move": "updated",
+    "recolor": "updated",
+}
+
+# Operations that would change every occurrence of a series at once: all
+# of them done, or the whole series shifted (past its end, possibly).
+# Series are left out of these; see Task.complete_occurrence.
+PER_OCCURRENCE = {"complete", "move"}
+
+# Same rule as Task.can_be_deleted_by, as a filter
+DELETABLE = ExpressionWrapper(
+    Q(assigned_by__isnull=True) | Q(group__isnull=True) | Q(is_deletable=True),
+    output_field=BooleanField(),
+)
+
+
+def apply(user, task_ids, operation, date=None, color=None):
+    """
+    Apply `operation` to the tasks among `task_ids` that `user` can see
+    (and, for "delete", may delete). `date` is required for "move",
+    `color` for "recolor". Recurring series can't be completed or moved
+    in bulk. Returns {task_id: OK | NOT_FOUND | FORBIDDEN | RECURRING}.
+    """
+    if operation not in OPERATIONS:
+        raise ValueError(f"Unknown operation {operation!r}")
+    task_ids = list(dict.fromkeys(task_ids))
+
+    with transaction.atomic():
+        visible = {
+            task_id: (deletable, bool(freq))
+            for task_id, deletable, freq in Task.objects.visible_to(user)
+            .filter(id__in=task_ids)
+            .values_list("id", DELETABLE, "recurrence")
+        }
+        results = {}
+        for task_id in task_ids:
+            if task_id not in visible:
+                results[task_id] = NOT_FOUND
+            elif operation == "delete" and not visible[task_id][0]:
+                results[task_id] = FORBIDDEN
+            elif operation in PER_OCCURRENCE and visible[task_id][1]:
+                results[task_id] = RECURRING
+            else:
+                results[task_id] = OK
+        allowed = {task_id for task_id, status in results.items() if status == OK}
+        if not allowed:
+            return results
+
+        # Everyone who saw the tasks before, not just the requester
+        before = list(
+            TaskVisibility.objects.filter(task_id__in=allowed).values_list(
+                "user_id", "date", "recurring", "task_id"
+            )
+        )
+        changes = TaskVisibility.change_pairs(row[:3] for row in before)
+        tasks = Task.objects.filter(id__in=allowed)
+        visibility = TaskVisibility.objects.filter(task_id__in=allowed)
+
+        if operation == "delete":
+            TaskTombstone.record((user_id, task_id) for user_id, _, _, task_id in before)
+            token = bulk_operation.set(True)
+            try:
+                tasks.delete()
+            finally:
+                bulk_operation.reset(token)
+        else:
+            values = {"updated_at": timezone.now()}
+            if operation == "complete":
+                values["completed"] = True
+            elif operation == "recolor":
+                values["color"] = color
+            else:
+                values["date"] = date
+            tasks.update(**values)
+            if operation == "move":
+                visibility.update(date=date, seq=0)
+                changes |= TaskVisibility.change_pairs(
+                    (user_id, date, recurring) for user_id, _, recurring, _ in before
+                )
+            else:
+                # Back to pending so the change feed picks the edit up
+                visibility.update(seq=0)
+
+        tasks_changed.send(
+            sender=Task, changes=changes, action=OPERATIONS[operation], task_ids=allowed
+        )
+    return results
+
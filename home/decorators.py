@@ -0,0 +1,64 @@
+from functools import wraps
+
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .models import UserDataVersion
+
+
+def user_data_condition(scope, per_hour=False):
+    """
+    Conditional GET for pages that only depend on the user's visible tasks.
+
+    The ETag and Last-Modified combine the page scope, the user's data
+    version, their last login (the CSRF secret rotates on login) and the
+    start of today, since week/month windows move with the date;
+    `per_hour` narrows that to the hour for pages showing hourly data.
+    A matching If-None-Match/If-Modified-Since returns 304 after a single
+    primary-key lookup, before the view runs.
+    """
+
+    def decorator(view_func):
+        def lookup(request):
+            if not hasattr(request, "_user_data_version"):
+                request._user_data_version = UserDataVersion.objects.filter(
+                    user_id=request.user.pk
+                ).first()
+            return request._user_data_version
+
+        def window_start():
+            now = timezone.localtime().replace(minute=0, second=0, microsecond=0)
+            return now if per_hour else now.replace(hour=0)
+
+        def etag(request, *args, **kwargs):
+            row = lookup(request)
+            if row is None:
+                return None
+            login = request.user.last_login.timestamp() if request.user.last_login else 0
+            window = int(window_start().timestamp())
+            return f"{scope}-{request.user.pk}-{row.version}-{int(login)}-{window}"
+
+        def last_modified(request, *args, **kwargs):
+            row = lookup(request)
+            if row is None:
+                return None
+            return max(
+                filter(None, [row.updated_at, request.user.last_login, window_start()])
+            )
+
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(
+            view_func
+        )
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view_func(request, *args, **kwargs)
+            response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        return wrapper
+
+    return decorator
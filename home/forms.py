@@ -36,6 +36,14 @@ class TaskAssignmentForm(forms.Form):
     date = forms.DateField(
         widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
     )
+    start_time = forms.TimeField(
+        required=False,
+        widget=forms.TimeInput(attrs={'class': 'form-control', 'type': 'time'})
+    )
+    end_time = forms.TimeField(
+        required=False,
+        widget=forms.TimeInput(attrs={'class': 'form-control', 'type': 'time'})
+    )
     location = forms.CharField(
         required=False,
         max_length=200,
@@ -63,6 +71,12 @@ class TaskAssignmentForm(forms.Form):
         widget=forms.CheckboxSelectMultiple(attrs={'class': 'form-check-input'}),
         label="Or select specific users"
     )
+    # Set by the buttons on the conflict report; empty means check first
+    conflict_action = forms.ChoiceField(
+        choices=[('', 'Check'), ('skip', 'Skip'), ('force', 'Force')],
+        required=False,
+        widget=forms.HiddenInput()
+    )
 
     def __init__(self, *args, **kwargs):
         group = kwargs.pop('group', None)
@@ -81,6 +95,11 @@ class TaskAssignmentForm(forms.Form):
         if not assign_to_all and not users:
             raise forms.ValidationError("Please either select 'Assign to all' or choose specific users.")
 
+        start_time = cleaned_data.get('start_time')
+        end_time = cleaned_data.get('end_time')
+        if start_time and end_time and end_time <= start_time:
+            self.add_error('end_time', "End time must be after the start time.")
+
         return cleaned_data
 
 
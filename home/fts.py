@@ -0,0 +1,41 @@
+"""
+Helpers for the SQLite FTS5 index over Task title/description/location.
+
+The index (home_task_fts) and the triggers that keep it in sync are created
+by migration 0011_task_fts when the database supports FTS5. SQLite drops
+triggers when Django rebuilds home_task (AddField with a default,
+AlterField, ...), so any migration that does that must finish by
+re-creating them; copy install_triggers from 0012_task_recurrence rather
+than importing app code into the migration.
+"""
+import re
+
+from django.db import connections
+
+FTS_TABLE = "home_task_fts"
+
+_available = {}
+
+
+def available(using="default"):
+    """True if the FTS table exists on this database (checked once)"""
+    connection = connections[using]
+    key = (using, str(connection.settings_dict["NAME"]))
+    if key not in _available:
+        _available[key] = (
+            connection.vendor == "sqlite"
+            and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _available[key]
+
+
+def match_expression(keyword):
+    """
+    Turn free text into an FTS5 query: every word must match as a prefix.
+    Words are quoted so user input can't inject FTS syntax. Returns None
+    if there is nothing searchable in the keyword.
+    """
+    words = re.findall(r"\w+", keyword or "")
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
@@ -3,10 +3,16 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.contrib.auth.models import User
 from django.http import JsonResponse
+from django.db import transaction
 from django.db.models import Q
-from .models import Group, GroupMembership, Task
+from datetime import date, time, timedelta
+from . import recurrence, scheduling
+from .models import Group, GroupMembership, Task, TaskVisibility
 from .forms import GroupCreateForm, TaskAssignmentForm
 
+# Longest range the free-time finder will search in one request
+MAX_FREE_TIME_DAYS = 92
+
 
 @login_required
 def group_list(request):
@@ -186,11 +192,14 @@ def assign_task(request, group_id):
             title = form.cleaned_data['title']
             description = form.cleaned_data['description']
             date = form.cleaned_data['date']
+            start_time = form.cleaned_data['start_time']
+            end_time = form.cleaned_data['end_time']
             location = form.cleaned_data['location']
             color = form.cleaned_data['color']
             is_deletable = form.cleaned_data['is_deletable']
             assign_to_all = form.cleaned_data['assign_to_all']
             selected_users = form.cleaned_data.get('users', [])
+            conflict_action = form.cleaned_data['conflict_action']
 
             # Determine which users to assign to
             if assign_to_all:
@@ -199,27 +208,60 @@ def assign_task(request, group_id):
                 ).distinct()
             else:
                 users = selected_users
+            users = list(users)
+
+            # Check every assignee's schedule in one query
+            conflicts = Task.get_conflicts_for_users(
+                [user.id for user in users], date, start_time, end_time
+            )
+
+            if conflicts and not conflict_action:
+                # Nothing is created until the admin picks skip or force
+                conflict_report = [
+                    {'user': user, 'tasks': conflicts[user.id]}
+                    for user in users if user.id in conflicts
+                ]
+                context = {
+                    'group': group,
+                    'form': form,
+                    'conflict_report': conflict_report,
+                }
+                return render(request, 'home/assign_task.html', context)
+
+            skipped = []
+            if conflict_action == 'skip':
+                skipped = [user for user in users if user.id in conflicts]
+                users = [user for user in users if user.id not in conflicts]
 
             # Create tasks for each user
             tasks_created = 0
-            for user in users:
-                Task.objects.create(
-                    user=user,
-                    title=title,
-                    description=description,
-                    date=date,
-                    location=location,
-                    color=color,
-                    assigned_by=request.user,
-                    group=group,
-                    is_deletable=is_deletable
-                )
-                tasks_created += 1
+            with transaction.atomic():
+                for user in users:
+                    Task.objects.create(
+                        user=user,
+                        title=title,
+                        description=description,
+                        date=date,
+                        start_time=start_time,
+                        end_time=end_time,
+                        location=location,
+                        color=color,
+                        assigned_by=request.user,
+                        group=group,
+                        is_deletable=is_deletable
+                    )
+                    tasks_created += 1
 
             messages.success(
                 request,
                 f'Task "{title}" assigned to {tasks_created} user(s) in {group.name}.'
             )
+            if skipped:
+                messages.warning(
+                    request,
+                    f'Skipped {len(skipped)} user(s) with conflicts: '
+                    + ", ".join(user.username for user in skipped)
+                )
             return redirect('group_detail', group_id=group_id)
     else:
         form = TaskAssignmentForm(group=group)
@@ -231,6 +273,105 @@ def assign_task(request, group_id):
     return render(request, 'home/assign_task.html', context)
 
 
+def _parse_param(parse, value, default):
+    if not value:
+        return default
+    try:
+        return parse(value)
+    except ValueError:
+        return None
+
+
+@login_required
+def group_free_time(request, group_id):
+    """
+    Common free windows for every member of the group, as JSON.
+
+    ?start=&end= (dates, default the next two weeks), ?duration= (minutes,
+    default 60), ?day_start=&day_end= (default 08:00-18:00), ?limit=
+    (default 5). All members' timed tasks in the range, recurring series
+    included, come from one query and are packed into 15-minute slot
+    bitsets per day (see home.scheduling), so the search itself is a few
+    integer operations per day.
+    """
+    group = get_object_or_404(Group, id=group_id)
+    if not GroupMembership.objects.filter(group=group, user=request.user).exists():
+        return JsonResponse({'error': 'You are not a member of this group.'}, status=403)
+
+    today = date.today()
+    start = _parse_param(date.fromisoformat, request.GET.get('start'), today)
+    end = _parse_param(date.fromisoformat, request.GET.get('end'), (start or today) + timedelta(days=13))
+    day_start = _parse_param(time.fromisoformat, request.GET.get('day_start'), time(8, 0))
+    day_end = _parse_param(time.fromisoformat, request.GET.get('day_end'), time(18, 0))
+    duration = _parse_param(int, request.GET.get('duration'), 60)
+    limit = _parse_param(int, request.GET.get('limit'), 5)
+
+    if None in (start, end, day_start, day_end, duration, limit):
+        return JsonResponse(
+            {'error': 'Use YYYY-MM-DD dates, HH:MM times and whole minutes.'}, status=400
+        )
+    if end < start or (end - start).days >= MAX_FREE_TIME_DAYS:
+        return JsonResponse(
+            {'error': f'end must be on or after start and within {MAX_FREE_TIME_DAYS} days.'},
+            status=400,
+        )
+    if day_end <= day_start or duration <= 0 or not 1 <= limit <= 50:
+        return JsonResponse(
+            {'error': 'day_end must be after day_start, duration positive and limit 1-50.'},
+            status=400,
+        )
+
+    rows = TaskVisibility.objects.filter(
+        Q(recurring=False, date__range=(start, end))
+        | Q(recurring=True, date__lte=end)
+        & (Q(task__recurrence_end__isnull=True) | Q(task__recurrence_end__gte=start)),
+        user__in=group.memberships.values('user'),
+        task__start_time__isnull=False,
+        task__end_time__isnull=False,
+    ).values_list(
+        'date', 'recurring', 'task__start_time', 'task__end_time',
+        'task__recurrence', 'task__recurrence_interval', 'task__recurrence_until',
+        'task__recurrence_count', 'task__recurrence_exceptions',
+    ).distinct()  # a group task has one visibility row per member
+
+    # OR every member's busy slots into one bitset per day
+    busy_by_day = {}
+    for day, recurring, start_time, end_time, freq, interval, until, count, exceptions in rows:
+        if start_time >= end_time:
+            continue
+        mask = scheduling.slot_mask(start_time, end_time)
+        days = [day]
+        if recurring:
+            days = recurrence.occurrence_dates(
+                day, freq, interval, start, end, until=until, count=count, exceptions=exceptions
+            )
+        for busy_day in days:
+            busy_by_day[busy_day] = busy_by_day.get(busy_day, 0) | mask
+
+    min_slots = -(-duration // scheduling.SLOT_MINUTES)
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    windows = scheduling.common_free_windows(
+        busy_by_day, days, day_start, day_end, min_slots, limit
+    )
+
+    return JsonResponse({
+        'group': group.id,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'duration': duration,
+        'slot_minutes': scheduling.SLOT_MINUTES,
+        'windows': [
+            {
+                'date': day.isoformat(),
+                'start': scheduling.slot_time(first).strftime('%H:%M'),
+                'end': scheduling.slot_time(first + length).strftime('%H:%M'),
+                'minutes': length * scheduling.SLOT_MINUTES,
+            }
+            for day, first, length in windows
+        ],
+    })
+
+
 @login_required
 def my_assigned_tasks(request):
     """View all tasks assigned to the current user"""
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from home.models import TaskStats
+
+
+class Command(BaseCommand):
+    help = "Recompute every user's dashboard counters from the task visibility table"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = TaskStats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt task stats for {total} users."))
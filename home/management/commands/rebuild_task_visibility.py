@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from home.models import TaskVisibility
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized task visibility table from tasks and group memberships"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows per bulk insert (default: 1000)",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = TaskVisibility.rebuild(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} task visibility rows."))
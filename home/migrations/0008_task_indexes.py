@@ -0,0 +1,43 @@
+# Generated by Django 5.1.13 on 2026-10-17 04:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0007_project_task_project_projectmembership'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'date'], name='task_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['group', 'date'], name='task_group_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['project', 'date'], name='task_project_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'completed', 'date'], name='task_user_completed_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('completed', False)), fields=['group', 'date'], name='task_group_open_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('end_time__isnull', False), ('start_time__isnull', False)), fields=['user', 'date', 'start_time', 'end_time'], name='task_user_timed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('end_time__isnull', False), ('start_time__isnull', False)), fields=['group', 'date', 'start_time', 'end_time'], name='task_group_timed_idx'),
+        ),
+    ]
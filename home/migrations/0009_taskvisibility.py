@@ -0,0 +1,49 @@
+# Generated by Django 5.1.13 on 2026-10-17 04:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_visibility(apps, schema_editor):
+    Task = apps.get_model('home', 'Task')
+    TaskVisibility = apps.get_model('home', 'TaskVisibility')
+
+    direct = Task.objects.filter(user__isnull=False).values_list('user_id', 'id', 'date')
+    via_group = Task.objects.filter(group__memberships__isnull=False).values_list(
+        'group__memberships__user_id', 'id', 'date'
+    )
+    for source in (direct, via_group):
+        TaskVisibility.objects.bulk_create(
+            [
+                TaskVisibility(user_id=user_id, task_id=task_id, date=task_date)
+                for user_id, task_id, task_date in source.iterator()
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0008_task_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskVisibility',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visibility', to='home.task')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_visibility', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'date', 'task'], name='taskvis_user_date_idx')],
+                'unique_together': {('user', 'task')},
+            },
+        ),
+        migrations.RunPython(populate_visibility, migrations.RunPython.noop),
+    ]
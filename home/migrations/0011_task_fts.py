@@ -0,0 +1,78 @@
+# Full-text index over Task.title/description/location (SQLite FTS5 only).
+# The SQL is copied here rather than imported from home.fts, so this
+# migration keeps doing what it did whatever happens to that module.
+
+from django.db import migrations
+
+CREATE_TABLE_SQL = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS home_task_fts USING fts5(
+        title, description, location,
+        content='home_task', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+"""
+
+TRIGGER_SQL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS home_task_fts_ai AFTER INSERT ON home_task BEGIN
+        INSERT INTO home_task_fts(rowid, title, description, location)
+        VALUES (new.id, new.title, new.description, new.location);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS home_task_fts_ad AFTER DELETE ON home_task BEGIN
+        INSERT INTO home_task_fts(home_task_fts, rowid, title, description, location)
+        VALUES ('delete', old.id, old.title, old.description, old.location);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS home_task_fts_au
+    AFTER UPDATE OF title, description, location ON home_task BEGIN
+        INSERT INTO home_task_fts(home_task_fts, rowid, title, description, location)
+        VALUES ('delete', old.id, old.title, old.description, old.location);
+        INSERT INTO home_task_fts(rowid, title, description, location)
+        VALUES (new.id, new.title, new.description, new.location);
+    END
+    """,
+]
+
+
+def fts5_supported(connection):
+    if connection.vendor != "sqlite":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def install(apps, schema_editor):
+    """Create the FTS table and triggers and index existing tasks"""
+    if not fts5_supported(schema_editor.connection):
+        return
+    schema_editor.execute(CREATE_TABLE_SQL)
+    for sql in TRIGGER_SQL:
+        schema_editor.execute(sql)
+    schema_editor.execute("INSERT INTO home_task_fts(home_task_fts) VALUES ('rebuild')")
+
+
+def uninstall(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in [
+        "DROP TRIGGER IF EXISTS home_task_fts_ai",
+        "DROP TRIGGER IF EXISTS home_task_fts_ad",
+        "DROP TRIGGER IF EXISTS home_task_fts_au",
+        "DROP TABLE IF EXISTS home_task_fts",
+    ]:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0010_userdataversion'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 5.1.13 on 2026-10-17 04:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+# The FTS sync triggers as of 0011_task_fts, copied rather than imported
+# from home.fts so this migration never changes under it
+TRIGGER_SQL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS home_task_fts_ai AFTER INSERT ON home_task BEGIN
+        INSERT INTO home_task_fts(rowid, title, description, location)
+        VALUES (new.id, new.title, new.description, new.location);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS home_task_fts_ad AFTER DELETE ON home_task BEGIN
+        INSERT INTO home_task_fts(home_task_fts, rowid, title, description, location)
+        VALUES ('delete', old.id, old.title, old.description, old.location);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS home_task_fts_au
+    AFTER UPDATE OF title, description, location ON home_task BEGIN
+        INSERT INTO home_task_fts(home_task_fts, rowid, title, description, location)
+        VALUES ('delete', old.id, old.title, old.description, old.location);
+        INSERT INTO home_task_fts(rowid, title, description, location)
+        VALUES (new.id, new.title, new.description, new.location);
+    END
+    """,
+]
+
+
+def fts5_supported(connection):
+    if connection.vendor != "sqlite":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def install_triggers(apps, schema_editor):
+    """Re-create the sync triggers after home_task was rebuilt"""
+    if not fts5_supported(schema_editor.connection):
+        return
+    for sql in TRIGGER_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0011_task_fts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='recurrence',
+            field=models.CharField(blank=True, choices=[('', 'Does not repeat'), ('daily', 'Daily'), ('weekly', 'Weekly'), ('monthly', 'Monthly')], default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='recurrence_count',
+            field=models.PositiveIntegerField(blank=True, help_text='Total number of occurrences', null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='recurrence_end',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='recurrence_exceptions',
+            field=models.JSONField(blank=True, default=list, help_text='Skipped occurrence dates (YYYY-MM-DD)'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='recurrence_interval',
+            field=models.PositiveSmallIntegerField(default=1, help_text='Repeat every N days/weeks/months'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='recurrence_until',
+            field=models.DateField(blank=True, help_text='Last date the task may repeat on', null=True),
+        ),
+        migrations.AddField(
+            model_name='taskvisibility',
+            name='recurring',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='taskvisibility',
+            index=models.Index(condition=models.Q(('recurring', True)), fields=['user', 'date'], name='taskvis_user_series_idx'),
+        ),
+        # Adding fields with defaults rebuilt home_task on SQLite
+        migrations.RunPython(install_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.1.13 on 2026-10-17 04:48
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def stamp_existing(apps, schema_editor):
+    """Existing rows get a fresh version each, like a rebuild"""
+    TaskVisibility = apps.get_model('home', 'TaskVisibility')
+    UserDataVersion = apps.get_model('home', 'UserDataVersion')
+
+    user_ids = set(TaskVisibility.objects.values_list('user_id', flat=True).distinct())
+    UserDataVersion.objects.bulk_create(
+        [UserDataVersion(user_id=uid) for uid in user_ids], ignore_conflicts=True
+    )
+    UserDataVersion.objects.filter(user_id__in=user_ids).update(version=F('version') + 1)
+    for user_id, version in UserDataVersion.objects.filter(
+        user_id__in=user_ids
+    ).values_list('user_id', 'version'):
+        TaskVisibility.objects.filter(user_id=user_id).update(seq=version)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0012_task_recurrence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.PositiveBigIntegerField()),
+                ('seq', models.PositiveBigIntegerField(default=0)),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='taskvisibility',
+            name='seq',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='taskvisibility',
+            index=models.Index(fields=['user', 'seq'], name='taskvis_user_seq_idx'),
+        ),
+        migrations.AddField(
+            model_name='tasktombstone',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_tombstones', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='tasktombstone',
+            index=models.Index(fields=['user', 'seq'], name='tasktomb_user_seq_idx'),
+        ),
+        migrations.RunPython(stamp_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.13 on 2026-10-17 04:57
+
+import django.db.models.deletion
+import django.utils.timezone
+import home.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('home', '0013_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedToken',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='feed_token', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('token', models.CharField(default=home.models._new_feed_token, max_length=64, unique=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -1,6 +1,25 @@
-from django.db import models
+import copy
+import secrets
+import time as time_module
+
+from django.db import models, transaction
+from django.db.models import F, OuterRef, Q, Subquery, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest, RowNumber
+from django.utils import timezone
 from django.contrib.auth.models import User
-from datetime import datetime, time
+from datetime import date, datetime, time, timedelta
+
+from . import recurrence, scheduling
+
+# Task columns that describe a recurrence rule, in occurrence_dates order
+RULE_FIELDS = [
+    "recurrence",
+    "recurrence_interval",
+    "recurrence_until",
+    "recurrence_count",
+    "recurrence_exceptions",
+]
 
 # Create your models here.
 
@@ -117,6 +136,156 @@ class ProjectMembership(models.Model):
         return self.role == "admin"
 
 
+class TaskQuerySet(models.QuerySet):
+    def visible_to(self, user, start=None, end=None):
+        """
+        Tasks assigned to the user directly or to any group they belong to.
+
+        Resolved through the TaskVisibility table, so the whole lookup is a
+        single (user, date) index range scan. Pass start/end to bound the
+        date range on that index.
+        """
+        lookups = {"visibility__user": user}
+        if start is not None:
+            lookups["visibility__date__gte"] = start
+        if end is not None:
+            lookups["visibility__date__lte"] = end
+        return self.filter(**lookups)
+
+    def search(self, keyword):
+        """
+        Tasks whose title, description or location match every word of
+        `keyword` as a prefix, annotated with `search_rank` (lower is more
+        relevant). Uses the FTS5 index where available and falls back to
+        icontains on other backends, where every match ranks equally.
+        """
+        from . import fts
+
+        match = fts.match_expression(keyword)
+        if match is None or not fts.available(self.db):
+            return self.filter(
+                Q(title__icontains=keyword)
+                | Q(description__icontains=keyword)
+                | Q(location__icontains=keyword)
+            ).annotate(search_rank=models.Value(0.0, output_field=models.FloatField()))
+
+        # Correlated on rowid, so FTS5 only probes the candidate rows the
+        # outer (indexed) query already narrowed down.
+        rank = RawSQL(
+            f"SELECT bm25({fts.FTS_TABLE}) FROM {fts.FTS_TABLE} "
+            f"WHERE {fts.FTS_TABLE} MATCH %s AND {fts.FTS_TABLE}.rowid = home_task.id",
+            (match,),
+            output_field=models.FloatField(),
+        )
+        return self.annotate(search_rank=rank).filter(search_rank__isnull=False)
+
+    def series_visible_to(self, user, start, end):
+        """
+        Recurring series visible to the user that may have an occurrence in
+        [start, end]: started by `end` and not finished before `start`.
+        """
+        return self.filter(
+            Q(recurrence_end__isnull=True) | Q(recurrence_end__gte=start),
+            visibility__user=user,
+            visibility__recurring=True,
+            visibility__date__lte=end,
+        )
+
+    def occurrences(self, user, start, end):
+        """
+        Everything the user sees dated in [start, end], as a list sorted
+        like Task.Meta.ordering. One-off tasks come from the visibility
+        range; recurring series are fetched once and expanded for just
+        this window.
+        """
+        items = list(self.visible_to(user, start, end).filter(recurrence=""))
+        for series in self.series_visible_to(user, start, end):
+            items.extend(series.occurrences_between(start, end))
+        items.sort(key=lambda t: (t.date, t.start_time or time.min, t.created_at))
+        return items
+
+    def day_counts(self, user, start, end):
+        """
+        {date: (tasks, completed)} for every day in [start, end] the user
+        has something on. One-off tasks are counted by a single GROUP BY
+        over the visibility range; recurring series add one per occurrence
+        (counted as completed when the series is).
+        """
+        rows = (
+            self.visible_to(user, start, end)
+            .filter(recurrence="")
+            .order_by()
+            .values_list("visibility__date")
+            .annotate(
+                total=models.Count("id"),
+                done=models.Count("id", filter=Q(completed=True)),
+            )
+        )
+        counts = {day: (total, done) for day, total, done in rows}
+        series = self.series_visible_to(user, start, end).order_by().values_list(
+            "date", "completed", *RULE_FIELDS
+        )
+        for first, completed, freq, interval, until, count, exceptions in series:
+            for day in recurrence.occurrence_dates(
+                first, freq, interval, start, end,
+                until=until, count=count, exceptions=exceptions,
+            ):
+                total, done = counts.get(day, (0, 0))
+                counts[day] = (total + 1, done + int(completed))
+        return counts
+
+
+class Location(models.Model):
+    """
+    Geocoding result for one address, shared by every task that uses it.
+    `query` is the normalized address text (see calendar_app.geocoding);
+    `found` is False for addresses the geocoder had no match for, which
+    are kept too so they aren't looked up again until they expire.
+    """
+
+    query = models.CharField(max_length=200, unique=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    found = models.BooleanField(default=True)
+    fetched_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        if not self.found:
+            return f"{self.query} (not found)"
+        return f"{self.query} ({self.latitude}, {self.longitude})"
+
+
+class RateLimit(models.Model):
+    """
+    Pacing for a rate-limited upstream (see calendar_app.geocoding),
+    shared by every process: `next_at` is the time.time() before which
+    the next request may not go out.
+    """
+
+    name = models.CharField(max_length=50, primary_key=True)
+    next_at = models.FloatField(default=0)
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def reserve(cls, name, interval):
+        """
+        Claim the next free slot, `interval` seconds after the previous
+        one, and return how many seconds to wait for it. The UPDATE comes
+        first so concurrent callers queue on the row instead of reading
+        the same slot.
+        """
+        cls.objects.bulk_create([cls(name=name)], ignore_conflicts=True)
+        now = time_module.time()
+        with transaction.atomic():
+            cls.objects.filter(name=name).update(
+                next_at=Greatest(F("next_at"), Value(now)) + Value(interval)
+            )
+            next_at = cls.objects.filter(name=name).values_list("next_at", flat=True).get()
+        return max(next_at - interval - now, 0)
+
+
 class Task(models.Model):
     COLOR_CHOICES = [
         ("blue", "Blue"),
@@ -136,6 +305,13 @@ class Task(models.Model):
         ("other", "Other"),
     ]
 
+    RECURRENCE_CHOICES = [
+        ("", "Does not repeat"),
+        (recurrence.DAILY, "Daily"),
+        (recurrence.WEEKLY, "Weekly"),
+        (recurrence.MONTHLY, "Monthly"),
+    ]
+
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -152,6 +328,10 @@ class Task(models.Model):
     )
     end_time = models.TimeField(null=True, blank=True, help_text="End time of the task")
     location = models.CharField(max_length=200, blank=True)
+    # Where `location` geocoded to, once it has been looked up
+    place = models.ForeignKey(
+        Location, on_delete=models.SET_NULL, null=True, blank=True, related_name="tasks"
+    )
     color = models.CharField(max_length=20, choices=COLOR_CHOICES, default="blue")
     category = models.CharField(
         max_length=50, choices=CATEGORY_CHOICES, blank=True, default=""
@@ -189,12 +369,150 @@ class Task(models.Model):
         help_text="Project this task belongs to",
     )
 
+    # Recurrence rule; `date` is the first occurrence
+    recurrence = models.CharField(
+        max_length=10, choices=RECURRENCE_CHOICES, blank=True, default=""
+    )
+    recurrence_interval = models.PositiveSmallIntegerField(
+        default=1, help_text="Repeat every N days/weeks/months"
+    )
+    recurrence_until = models.DateField(
+        null=True, blank=True, help_text="Last date the task may repeat on"
+    )
+    recurrence_count = models.PositiveIntegerField(
+        null=True, blank=True, help_text="Total number of occurrences"
+    )
+    recurrence_exceptions = models.JSONField(
+        default=list, blank=True, help_text="Skipped occurrence dates (YYYY-MM-DD)"
+    )
+    # Derived from the rule on save; null for series that never end
+    recurrence_end = models.DateField(null=True, blank=True, editable=False)
+
+    objects = TaskQuerySet.as_manager()
+
     class Meta:
         ordering = ["date", "start_time", "created_at"]
+        indexes = [
+            models.Index(fields=["user", "date"], name="task_user_date_idx"),
+            models.Index(fields=["group", "date"], name="task_group_date_idx"),
+            models.Index(fields=["project", "date"], name="task_project_date_idx"),
+            models.Index(
+                fields=["user", "completed", "date"],
+                name="task_user_completed_date_idx",
+            ),
+            # Open tasks only (user_page, dashboards)
+            models.Index(
+                fields=["group", "date"],
+                condition=Q(completed=False),
+                name="task_group_open_date_idx",
+            ),
+            # Timed tasks only (get_conflicts)
+            models.Index(
+                fields=["user", "date", "start_time", "end_time"],
+                condition=Q(start_time__isnull=False, end_time__isnull=False),
+                name="task_user_timed_idx",
+            ),
+            models.Index(
+                fields=["group", "date", "start_time", "end_time"],
+                condition=Q(start_time__isnull=False, end_time__isnull=False),
+                name="task_group_timed_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.date}"
 
+    # Lets post_save tell a completion apart from any other edit
+    _loaded_completed = False
+    # Lets save() drop a place that no longer matches the location
+    _loaded_location = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_completed = instance.__dict__.get("completed", False)
+        instance._loaded_location = instance.__dict__.get("location")
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Fields may be assigned strings (create(date="2025-03-03")); the
+        # rule below and the post_save receivers work with the dates
+        for name in ("date", "recurrence_until"):
+            setattr(self, name, self._meta.get_field(name).to_python(getattr(self, name)))
+        if self.recurrence:
+            self.recurrence_end = recurrence.series_end(
+                self.date,
+                self.recurrence,
+                self.recurrence_interval,
+                self.recurrence_until,
+                self.recurrence_count,
+            )
+        else:
+            self.recurrence_end = None
+        if self._loaded_location is not None and self.location != self._loaded_location:
+            self.place = None
+        super().save(*args, **kwargs)
+        self._loaded_location = self.location
+
+    def is_recurring(self):
+        return bool(self.recurrence)
+
+    def occurrences_between(self, start, end):
+        """
+        Copies of this task dated on each occurrence in [start, end].
+        Each copy keeps the series' id; `series_date` is the first date.
+        """
+        if not self.recurrence:
+            return [self] if start <= self.date <= end else []
+        items = []
+        for day in recurrence.occurrence_dates(
+            self.date,
+            self.recurrence,
+            self.recurrence_interval,
+            start,
+            end,
+            until=self.recurrence_until,
+            count=self.recurrence_count,
+            exceptions=self.recurrence_exceptions,
+        ):
+            occurrence = copy.copy(self)
+            occurrence.series_date = self.date
+            occurrence.date = day
+            items.append(occurrence)
+        return items
+
+    def complete_occurrence(self, day):
+        """
+        Mark one date done. A one-off task is simply completed; for a
+        series, `day` is split off: skipped in the series and recreated
+        as a completed one-off task, so the other occurrences stay open.
+        Returns the completed task, or None if the series has no
+        occurrence on `day`.
+        """
+        if not self.recurrence:
+            self.completed = True
+            self.save()
+            return self
+        if not self.occurrences_between(day, day):
+            return None
+        with transaction.atomic():
+            self.recurrence_exceptions = [*self.recurrence_exceptions, day.isoformat()]
+            self.save()
+            occurrence = copy.copy(self)
+            occurrence.pk = None
+            occurrence._state = copy.copy(self._state)
+            occurrence._state.adding = True
+            occurrence.date = day
+            occurrence.completed = True
+            occurrence.recurrence = ""
+            occurrence.recurrence_interval = 1
+            occurrence.recurrence_until = None
+            occurrence.recurrence_count = None
+            occurrence.recurrence_exceptions = []
+            occurrence.created_at = None
+            occurrence.save()
+        return occurrence
+
     def is_assigned_task(self):
         """Returns True if this is an assigned task (not personal)"""
         return self.assigned_by is not None and self.group is not None
@@ -210,18 +528,14 @@ class Task(models.Model):
     @classmethod
     def get_conflicts(cls, user, date, start_time, end_time, exclude_task_id=None):
         """
-        Find tasks that conflict with the given time range.
-        Returns a queryset of conflicting tasks.
+        Find tasks that conflict with the given time range, including
+        occurrences of recurring series. Returns a list.
         """
-        from django.db.models import Q
-
         if not start_time or not end_time:
-            return cls.objects.none()
+            return []
 
         # Get tasks for this user on this date that have times set
         tasks = cls.objects.filter(
-            Q(user=user) | Q(group__memberships__user=user),
-            date=date,
             start_time__isnull=False,
             end_time__isnull=False,
         )
@@ -229,8 +543,517 @@ class Task(models.Model):
         if exclude_task_id:
             tasks = tasks.exclude(id=exclude_task_id)
 
-        # Find overlapping tasks
-        # Conflict exists if: existing_start < new_end AND existing_end > new_start
-        conflicts = tasks.filter(start_time__lt=end_time, end_time__gt=start_time)
+        # One query for the day, then the same sweep the month view uses
+        return scheduling.overlapping(
+            date, start_time, end_time, tasks.occurrences(user, date, date)
+        )
+
+    @classmethod
+    def get_conflicts_for_users(cls, user_ids, date, start_time, end_time):
+        """
+        Batched get_conflicts: {user_id: [conflicting tasks]} for every user
+        with at least one clash. One query fetches all of the users' timed
+        tasks (and recurring series) on the date through TaskVisibility.
+        """
+        if not start_time or not end_time or not user_ids:
+            return {}
+
+        rows = (
+            TaskVisibility.objects.filter(
+                Q(recurring=False, date=date)
+                | Q(recurring=True, date__lte=date)
+                & (Q(task__recurrence_end__isnull=True) | Q(task__recurrence_end__gte=date)),
+                user_id__in=user_ids,
+                task__start_time__isnull=False,
+                task__end_time__isnull=False,
+            )
+            .select_related("task")
+        )
+
+        by_user = {}
+        for row in rows:
+            if row.recurring:
+                by_user.setdefault(row.user_id, []).extend(
+                    row.task.occurrences_between(date, date)
+                )
+            else:
+                by_user.setdefault(row.user_id, []).append(row.task)
+
+        conflicts = {}
+        for user_id, tasks in by_user.items():
+            found = scheduling.overlapping(date, start_time, end_time, tasks)
+            if found:
+                conflicts[user_id] = found
+        return conflicts
+
+
+class TaskVisibility(models.Model):
+    """
+    Denormalized (user, task, date) rows, one per user who can see a task.
+    For recurring series `date` is the first occurrence and `recurring` is
+    set. Kept in sync by the Task/GroupMembership signal handlers in
+    home.signals; rebuild with `manage.py rebuild_task_visibility`.
+
+    `seq` orders the rows for the change feed: 0 while a change is being
+    written, then the user's data version once it is bumped (see
+    UserDataVersion.stamp). Rows the user loses leave a TaskTombstone.
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="task_visibility"
+    )
+    task = models.ForeignKey(
+        Task, on_delete=models.CASCADE, related_name="visibility"
+    )
+    date = models.DateField()
+    recurring = models.BooleanField(default=False)
+    seq = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ["user", "task"]
+        indexes = [
+            models.Index(fields=["user", "date", "task"], name="taskvis_user_date_idx"),
+            models.Index(fields=["user", "seq"], name="taskvis_user_seq_idx"),
+            models.Index(
+                fields=["user", "date"],
+                condition=Q(recurring=True),
+                name="taskvis_user_series_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.task_id} ({self.date})"
+
+    @staticmethod
+    def change_pairs(rows):
+        """
+        (user_id, date) pairs for rows of (user_id, date, recurring). A
+        recurring series may show up on any date, which is reported as
+        (user_id, None).
+        """
+        changes = set()
+        for user_id, task_date, is_recurring in rows:
+            changes.add((user_id, None if is_recurring else task_date))
+        return changes
+
+    @classmethod
+    def sync_task(cls, task):
+        """
+        Bring the rows for one task in line with its user/group/date.
+        Returns the (user_id, date) pairs that saw the task before or after.
+        """
+        user_ids = set()
+        if task.user_id:
+            user_ids.add(task.user_id)
+        if task.group_id:
+            user_ids.update(
+                GroupMembership.objects.filter(group_id=task.group_id).values_list(
+                    "user_id", flat=True
+                )
+            )
+        recurring = task.is_recurring()
+
+        existing = {
+            user_id: (task_date, is_recurring)
+            for user_id, task_date, is_recurring in cls.objects.filter(
+                task=task
+            ).values_list("user_id", "date", "recurring")
+        }
+
+        stale = set(existing) - user_ids
+        if stale:
+            TaskTombstone.record((uid, task.pk) for uid in stale)
+            cls.objects.filter(task=task, user_id__in=stale).delete()
+
+        # Every remaining row goes back to pending so the change feed
+        # picks up the edit, whether or not the date moved
+        kept = set(existing) & user_ids
+        if kept:
+            cls.objects.filter(task=task, user_id__in=kept).update(
+                date=task.date, recurring=recurring, seq=0
+            )
+
+        cls.objects.bulk_create(
+            [
+                cls(user_id=uid, task_id=task.pk, date=task.date, recurring=recurring)
+                for uid in user_ids - set(existing)
+            ]
+        )
+        return cls.change_pairs(
+            [(uid, d, r) for uid, (d, r) in existing.items()]
+            + [(uid, task.date, recurring) for uid in user_ids]
+        )
+
+    @classmethod
+    def grant_group(cls, group_id, user_id):
+        """
+        Give a (new) group member visibility of the group's tasks.
+        Returns the (user_id, date) pairs granted.
+        """
+        rows = [
+            cls(user_id=user_id, task_id=task_id, date=task_date, recurring=bool(rule))
+            for task_id, task_date, rule in Task.objects.filter(
+                group_id=group_id
+            ).values_list("id", "date", "recurrence")
+        ]
+        cls.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+        return cls.change_pairs((user_id, row.date, row.recurring) for row in rows)
+
+    @classmethod
+    def revoke_group(cls, group_id, user_id):
+        """
+        Drop a former member's rows for group tasks not assigned to them
+        directly. Returns the (user_id, date) pairs revoked.
+        """
+        rows = cls.objects.filter(user_id=user_id, task__group_id=group_id).exclude(
+            task__user_id=user_id
+        )
+        revoked = list(rows.values_list("user_id", "date", "recurring", "task_id"))
+        TaskTombstone.record((uid, task_id) for uid, _, _, task_id in revoked)
+        rows.delete()
+        return cls.change_pairs(row[:3] for row in revoked)
+
+    @classmethod
+    def rebuild(cls, batch_size=1000):
+        """Recompute the whole table from Task and GroupMembership"""
+        cls.objects.all().delete()
+
+        direct = Task.objects.filter(user__isnull=False).values_list(
+            "user_id", "id", "date", "recurrence"
+        )
+        via_group = (
+            Task.objects.filter(group__memberships__isnull=False)
+            .values_list("group__memberships__user_id", "id", "date", "recurrence")
+            .order_by()
+        )
+
+        for source in (direct, via_group):
+            batch = []
+            for user_id, task_id, task_date, rule in source.iterator(chunk_size=batch_size):
+                batch.append(
+                    cls(user_id=user_id, task_id=task_id, date=task_date, recurring=bool(rule))
+                )
+                if len(batch) >= batch_size:
+                    cls.objects.bulk_create(batch, ignore_conflicts=True)
+                    batch = []
+            cls.objects.bulk_create(batch, ignore_conflicts=True)
+
+        # Rebuilt rows start pending; give them fresh versions so change
+        # feed clients pick everything up again
+        user_ids = set(cls.objects.values_list("user_id", flat=True).distinct())
+        UserDataVersion.bump(user_ids)
+        UserDataVersion.stamp(user_ids)
+        return cls.objects.count()
+
+
+class TaskTombstone(models.Model):
+    """
+    A task a user could see and no longer can: deleted, moved to someone
+    else, or lost with a group membership. Feeds the change feed's
+    deletions; `seq` works like TaskVisibility.seq.
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="task_tombstones"
+    )
+    task_id = models.PositiveBigIntegerField()
+    seq = models.PositiveBigIntegerField(default=0)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "seq"], name="tasktomb_user_seq_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} x {self.task_id} (#{self.seq})"
+
+    @classmethod
+    def record(cls, pairs):
+        """Pending tombstones for (user_id, task_id) pairs"""
+        cls.objects.bulk_create(
+            [cls(user_id=user_id, task_id=task_id) for user_id, task_id in pairs],
+            batch_size=1000,
+        )
+
+
+class UserDataVersion(models.Model):
+    """
+    Counter bumped whenever any task a user can see changes. Used to answer
+    conditional GETs (ETag/Last-Modified) without touching the task table.
+    """
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="data_version"
+    )
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.user_id} v{self.version}"
+
+    @classmethod
+    def bump(cls, user_ids):
+        user_ids = set(user_ids)
+        if not user_ids:
+            return
+        cls.objects.bulk_create(
+            [cls(user_id=uid) for uid in user_ids], ignore_conflicts=True
+        )
+        cls.objects.filter(user_id__in=user_ids).update(
+            version=F("version") + 1, updated_at=timezone.now()
+        )
+
+    @classmethod
+    def stamp(cls, user_ids):
+        """
+        Give the users' pending change-feed rows (seq 0) their current
+        version. Run in the same transaction as bump(), which locks the
+        version rows, so versions are handed out in commit order and a
+        feed cursor never skips a row committed after it.
+        """
+        user_ids = set(user_ids)
+        if not user_ids:
+            return
+        version = Subquery(
+            cls.objects.filter(user_id=OuterRef("user_id")).values("version")[:1]
+        )
+        for model in (TaskVisibility, TaskTombstone):
+            model.objects.filter(user_id__in=user_ids, seq=0).update(seq=version)
+
+
+def _month_key(day):
+    return day.strftime("%Y-%m")
+
+
+def _week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+class TaskStats(models.Model):
+    """
+    Dashboard numbers for one user, so account_dashboard is a single
+    primary-key lookup: totals, [total, completed] per month ("YYYY-MM")
+    and per week (keyed by its Monday), and the next few tasks. Tasks
+    count on their visibility date, so a series counts once, on its
+    first date.
+
+    Kept up to date by the tasks_changed receiver in home.signals, in the
+    same transaction as the change: the buckets a change touches are
+    recounted from the visibility table (see refresh). Rebuild everything
+    with `manage.py rebuild_task_stats`.
+    """
+
+    # Upcoming tasks stored; the dashboard shows DASHBOARD_UPCOMING of them
+    UPCOMING_KEPT = 10
+    DASHBOARD_UPCOMING = 5
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="task_stats"
+    )
+    total = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    months = models.JSONField(default=dict)
+    weeks = models.JSONField(default=dict)
+    # [{"id", "date", "title", "location"}] from `upcoming_from` on
+    upcoming = models.JSONField(default=list)
+    upcoming_from = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.total} tasks"
+
+    @classmethod
+    def refresh(cls, changes, today=None, exclude=()):
+        """
+        Recount what `changes` ((user_id, date) pairs, as sent with
+        tasks_changed) can have touched. Months and weeks around the
+        changed dates are recounted with one grouped query over the
+        (user, date) visibility index; a None date (a recurring series
+        moved) recounts that user from scratch. Tasks in `exclude` are
+        left out, for deletes reported before the rows go.
+        """
+        today = today or timezone.now().date()
+        spans = {}  # user_id -> (first, last), or None for everything
+        for user_id, day in changes:
+            if day is None or (user_id in spans and spans[user_id] is None):
+                spans[user_id] = None
+                continue
+            first, last = spans.get(user_id, (day, day))
+            spans[user_id] = (min(first, day), max(last, day))
+        if not spans:
+            return
+        existing = cls.objects.in_bulk(list(spans))
+        for user_id in spans.keys() - existing.keys():
+            spans[user_id] = None  # no row yet; count everything
+
+        # Whole months, widened to whole weeks, so every bucket with a
+        # changed date is recounted completely
+        scope = Q()
+        for user_id, span in spans.items():
+            if span is None:
+                scope |= Q(user_id=user_id)
+                continue
+            month_first = span[0].replace(day=1)
+            next_month = span[1].replace(day=28) + timedelta(days=4)
+            month_last = next_month - timedelta(days=next_month.day)
+            first = _week_start(month_first)
+            last = _week_start(month_last) + timedelta(days=6)
+            spans[user_id] = (first, last, month_first, month_last)
+            scope |= Q(user_id=user_id, date__range=(first, last))
+
+        counts = {}
+        for user_id, day, total, done in (
+            TaskVisibility.objects.filter(scope)
+            .exclude(task_id__in=exclude)
+            .values("user_id", "date")
+            .annotate(
+                total=models.Count("id"),
+                done=models.Count("id", filter=Q(task__completed=True)),
+            )
+            .values_list("user_id", "date", "total", "done")
+            .order_by()
+        ):
+            counts.setdefault(user_id, []).append((day, total, done))
+
+        upcoming = cls._upcoming(list(spans), today, exclude)
+        rows = []
+        for user_id, span in spans.items():
+            stats = existing.get(user_id) or cls(user_id=user_id)
+            months, weeks = stats.months, stats.weeks
+            if span is None:
+                months, weeks = {}, {}
+                month_first = month_last = None
+            else:
+                first, last, month_first, month_last = span
+                months = {
+                    key: value for key, value in months.items()
+                    if not month_first <= date.fromisoformat(key + "-01") <= month_last
+                }
+                weeks = {
+                    key: value for key, value in weeks.items()
+                    if not first <= date.fromisoformat(key) <= last
+                }
+            for day, total, done in counts.get(user_id, ()):
+                keys = [(weeks, _week_start(day).isoformat())]
+                # The edges of the range belong to months not being recounted
+                if month_first is None or month_first <= day <= month_last:
+                    keys.append((months, _month_key(day)))
+                for buckets, key in keys:
+                    bucket = buckets.setdefault(key, [0, 0])
+                    bucket[0] += total
+                    bucket[1] += done
+            stats.months, stats.weeks = months, weeks
+            stats.total = sum(bucket[0] for bucket in months.values())
+            stats.completed = sum(bucket[1] for bucket in months.values())
+            stats.upcoming = upcoming.get(user_id, [])
+            stats.upcoming_from = today
+            stats.updated_at = timezone.now()
+            rows.append(stats)
+
+        cls.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=["user"],
+            update_fields=[
+                "total", "completed", "months", "weeks", "upcoming", "upcoming_from",
+                "updated_at",
+            ],
+        )
+
+    @classmethod
+    def _upcoming(cls, user_ids, today, exclude=()):
+        """The next UPCOMING_KEPT tasks per user, in one windowed query"""
+        rank = models.Window(
+            RowNumber(),
+            partition_by=[F("user_id")],
+            order_by=[F("date").asc(), F("task__created_at").asc()],
+        )
+        upcoming = {}
+        for user_id, task_id, day, title, location in (
+            TaskVisibility.objects.filter(user_id__in=user_ids, date__gte=today)
+            .exclude(task_id__in=exclude)
+            .annotate(rank=rank)
+            .filter(rank__lte=cls.UPCOMING_KEPT)
+            .order_by("user_id", "rank")
+            .values_list("user_id", "task_id", "date", "task__title", "task__location")
+        ):
+            upcoming.setdefault(user_id, []).append(
+                {"id": task_id, "date": day.isoformat(), "title": title, "location": location}
+            )
+        return upcoming
+
+    @classmethod
+    def for_user(cls, user, today=None):
+        """
+        The user's row, with `upcoming` trimmed to what is still ahead of
+        `today`. Recounts first if the row is missing, or so many stored
+        tasks have passed that tasks beyond them might be due to show.
+        """
+        today = today or timezone.now().date()
+        stats = cls.objects.filter(pk=user.pk).first()
+        if stats is not None:
+            ahead = [item for item in stats.upcoming if item["date"] >= today.isoformat()]
+            # Tasks past the stored ones may be due by now
+            exhausted = len(stats.upcoming) == cls.UPCOMING_KEPT
+            if len(ahead) < cls.DASHBOARD_UPCOMING and exhausted:
+                stats = None
+        if stats is None:
+            cls.refresh({(user.pk, None)}, today)
+            stats = cls.objects.get(pk=user.pk)
+        stats.upcoming = [
+            dict(item, date=date.fromisoformat(item["date"]))
+            for item in stats.upcoming
+            if item["date"] >= today.isoformat()
+        ][: cls.DASHBOARD_UPCOMING]
+        return stats
+
+    def month(self, day):
+        """[total, completed] for the month of `day`"""
+        return self.months.get(_month_key(day), [0, 0])
+
+    def week(self, day):
+        """[total, completed] for the week of `day`"""
+        return self.weeks.get(_week_start(day).isoformat(), [0, 0])
+
+    @classmethod
+    def rebuild(cls):
+        """Recount every user from scratch. Returns the number of rows."""
+        cls.objects.all().delete()
+        user_ids = sorted(
+            set(TaskVisibility.objects.values_list("user_id", flat=True).distinct())
+        )
+        for chunk in range(0, len(user_ids), 500):
+            cls.refresh({(user_id, None) for user_id in user_ids[chunk : chunk + 500]})
+        return cls.objects.count()
+
+
+def _new_feed_token():
+    return secrets.token_urlsafe(24)
+
+
+class FeedToken(models.Model):
+    """
+    Secret that authenticates a user's iCalendar subscription URLs, since
+    calendar clients polling a feed can't log in. Resetting it cuts off
+    every client subscribed with the old one.
+    """
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="feed_token"
+    )
+    token = models.CharField(max_length=64, unique=True, default=_new_feed_token)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.user_id} feed"
+
+    @classmethod
+    def for_user(cls, user):
+        token, _ = cls.objects.get_or_create(user=user)
+        return token
 
-        return conflicts.distinct()
+    def reset(self):
+        self.token = _new_feed_token()
+        self.created_at = timezone.now()
+        self.save(update_fields=["token", "created_at"])
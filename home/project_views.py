@@ -3,7 +3,8 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.contrib.auth.models import User
 from django.db.models import Q
-from .models import Project, ProjectMembership, Task
+from django.urls import reverse
+from .models import FeedToken, Project, ProjectMembership, Task
 from .forms import ProjectCreateForm
 
 
@@ -199,5 +200,9 @@ def project_calendar(request, project_id):
         'tasks': tasks,
         'tasks_by_user': tasks_by_user,
         'members': member_users,
+        'feed_url': request.build_absolute_uri(reverse(
+            'calendar_app:project_feed',
+            args=[FeedToken.for_user(request.user).token, project.id],
+        )),
     }
     return render(request, 'home/project_calendar.html', context)
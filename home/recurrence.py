@@ -0,0 +1,92 @@
+"""
+Date arithmetic for recurring tasks.
+
+A series is stored once on its Task (start date plus rule) and expanded
+only for the window being displayed. Expansion jumps straight to the
+first occurrence at or after the window start, so its cost depends on the
+size of the window, not on how long the series has been running.
+"""
+import calendar
+from datetime import MAXYEAR, MINYEAR, date, timedelta
+
+DAILY = "daily"
+WEEKLY = "weekly"
+MONTHLY = "monthly"
+
+
+def add_months(d, months):
+    """Same day `months` later, clamped to the end of shorter months"""
+    month_index = d.month - 1 + months
+    year = d.year + month_index // 12
+    month = month_index % 12 + 1
+    if not MINYEAR <= year <= MAXYEAR:
+        # As adding a timedelta past date.max does
+        raise OverflowError("date value out of range")
+    return date(year, month, min(d.day, calendar.monthrange(year, month)[1]))
+
+
+def nth_occurrence(start, freq, interval, n):
+    """Date of the n-th occurrence (0 = the series start)"""
+    if freq == DAILY:
+        return start + timedelta(days=n * interval)
+    if freq == WEEKLY:
+        return start + timedelta(weeks=n * interval)
+    if freq == MONTHLY:
+        return add_months(start, n * interval)
+    raise ValueError(f"Unknown recurrence: {freq!r}")
+
+
+def first_index_on_or_after(start, freq, interval, day):
+    """Smallest n whose occurrence could fall on or after `day`"""
+    if day <= start:
+        return 0
+    if freq == MONTHLY:
+        months = (day.year - start.year) * 12 + day.month - start.month
+        # Clamping can pull an occurrence before `day`; callers skip those
+        return max(0, months // interval)
+    step = interval * (7 if freq == WEEKLY else 1)
+    return -(-(day - start).days // step)
+
+
+def series_end(start, freq, interval, until=None, count=None):
+    """Last possible occurrence date, or None for open-ended series"""
+    ends = []
+    if until:
+        ends.append(until)
+    if count:
+        ends.append(nth_occurrence(start, freq, interval, count - 1))
+    return min(ends) if ends else None
+
+
+def iter_occurrence_dates(
+    start, freq, interval, window_start, window_end, until=None, count=None, exceptions=()
+):
+    """
+    Dates of the series that fall in [window_start, window_end], in
+    order, computed as they are asked for. `exceptions` are skipped but
+    still count towards `count` (as EXDATE does in iCalendar).
+    """
+    interval = max(interval or 1, 1)
+    skipped = {d if isinstance(d, date) else date.fromisoformat(d) for d in exceptions or ()}
+    n = first_index_on_or_after(start, freq, interval, window_start)
+    while not count or n < count:
+        try:
+            day = nth_occurrence(start, freq, interval, n)
+        except OverflowError:
+            return  # the series runs past date.max
+        if day > window_end or (until and day > until):
+            return
+        if day >= window_start and day not in skipped:
+            yield day
+        n += 1
+
+
+def occurrence_dates(
+    start, freq, interval, window_start, window_end, until=None, count=None, exceptions=()
+):
+    """iter_occurrence_dates as a list"""
+    return list(
+        iter_occurrence_dates(
+            start, freq, interval, window_start, window_end, until, count, exceptions
+        )
+    )
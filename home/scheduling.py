@@ -0,0 +1,166 @@
+"""
+Interval helpers shared by conflict checks and calendar layouts.
+
+Tasks only take part when they have both a start and an end time, and
+only overlap with tasks on the same date.
+"""
+import heapq
+from datetime import time
+from types import SimpleNamespace
+
+
+def is_timed(task):
+    return (
+        task.start_time is not None
+        and task.end_time is not None
+        and task.start_time < task.end_time
+    )
+
+
+def overlap_pairs(tasks):
+    """
+    Yield (earlier, later) for every pair of tasks whose times overlap.
+
+    A single sweep over the tasks sorted by (date, start_time), keeping a
+    heap of the ones still running: O(n log n) plus one step per pair.
+    Touching intervals (one ends when the next starts) do not overlap.
+    """
+    timed = sorted(
+        (task for task in tasks if is_timed(task)),
+        key=lambda task: (task.date, task.start_time),
+    )
+    active = []  # (end_time, seq, task) for tasks still running
+    current_date = None
+    for seq, task in enumerate(timed):
+        if task.date != current_date:
+            active = []
+            current_date = task.date
+        while active and active[0][0] <= task.start_time:
+            heapq.heappop(active)
+        for _, _, other in active:
+            yield other, task
+        heapq.heappush(active, (task.end_time, seq, task))
+
+
+def mark_conflicts(tasks):
+    """
+    Set `conflicts` on every task to the list of tasks it overlaps with.
+    Returns the number of overlapping pairs.
+    """
+    for task in tasks:
+        task.conflicts = []
+    pairs = 0
+    for a, b in overlap_pairs(tasks):
+        a.conflicts.append(b)
+        b.conflicts.append(a)
+        pairs += 1
+    return pairs
+
+
+def overlapping(date, start_time, end_time, tasks):
+    """Tasks overlapping the given slot, in start-time order"""
+    probe = SimpleNamespace(date=date, start_time=start_time, end_time=end_time)
+    found = []
+    for a, b in overlap_pairs([probe, *tasks]):
+        if a is probe:
+            found.append(b)
+        elif b is probe:
+            found.append(a)
+    found.sort(key=lambda task: task.start_time)
+    return found
+
+
+def pack_columns(tasks):
+    """
+    Lay timed tasks out side by side: set `column` and `columns` on each
+    so that overlapping tasks never share a column.
+
+    Greedy interval-graph colouring in start order, always reusing the
+    lowest freed column, which needs no more columns than the largest set
+    of mutually overlapping tasks. `columns` is the width of the task's
+    cluster (a chain of overlaps), so unrelated tasks keep full width.
+    Returns the widest cluster's column count.
+    """
+    timed = sorted(
+        (task for task in tasks if is_timed(task)),
+        key=lambda task: (task.date, task.start_time, task.end_time),
+    )
+    widest = 0
+    cluster = []
+    cluster_end = None
+    running = []  # (end_time, column) of tasks still running
+    free = []  # columns freed within the current cluster
+
+    def close_cluster():
+        width = max(task.column for task in cluster) + 1
+        for task in cluster:
+            task.columns = width
+        return width
+
+    for task in timed:
+        if cluster and (task.date != cluster[0].date or task.start_time >= cluster_end):
+            widest = max(widest, close_cluster())
+            cluster, running, free, cluster_end = [], [], [], None
+        while running and running[0][0] <= task.start_time:
+            heapq.heappush(free, heapq.heappop(running)[1])
+        task.column = heapq.heappop(free) if free else len(running)
+        heapq.heappush(running, (task.end_time, task.column))
+        cluster.append(task)
+        if cluster_end is None or task.end_time > cluster_end:
+            cluster_end = task.end_time
+    if cluster:
+        widest = max(widest, close_cluster())
+    return widest
+
+
+# Day bitsets: bit i is the 15-minute slot starting at i * SLOT_MINUTES
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+
+def slot_index(value, round_up=False):
+    minutes = value.hour * 60 + value.minute
+    if round_up:
+        return -(-minutes // SLOT_MINUTES)
+    return minutes // SLOT_MINUTES
+
+
+def slot_time(index):
+    minutes = index * SLOT_MINUTES
+    if minutes >= 24 * 60:
+        return time(23, 59)
+    return time(minutes // 60, minutes % 60)
+
+
+def slot_mask(start_time, end_time):
+    """Bits for every slot the interval touches, partially or fully"""
+    first = slot_index(start_time)
+    last = max(slot_index(end_time, round_up=True), first + 1)
+    return ((1 << (last - first)) - 1) << first
+
+
+def free_runs(mask):
+    """Yield (first_slot, length) for each run of set bits, low to high"""
+    while mask:
+        first = (mask & -mask).bit_length() - 1
+        shifted = mask >> first
+        length = (shifted ^ (shifted + 1)).bit_length() - 1
+        yield first, length
+        mask &= ~(((1 << length) - 1) << first)
+
+
+def common_free_windows(busy_by_day, days, day_start, day_end, min_slots, limit):
+    """
+    The `limit` longest windows of at least `min_slots` slots inside
+    [day_start, day_end) on any of `days` where nobody is busy, longest
+    first and then earliest. `busy_by_day` maps a date to the OR of every
+    member's busy bitset, so "everyone is free" is just its complement.
+    """
+    hours = slot_mask(day_start, day_end)
+    windows = []
+    for day in days:
+        free = hours & ~busy_by_day.get(day, 0)
+        for first, length in free_runs(free):
+            if length >= min_slots:
+                windows.append((day, first, length))
+    return heapq.nsmallest(limit, windows, key=lambda w: (-w[2], w[0], w[1]))
@@ -0,0 +1,87 @@
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from .models import (
+    GroupMembership, Task, TaskStats, TaskTombstone, TaskVisibility, UserDataVersion,
+)
+
+# Sent whenever tasks appear, change or disappear for some users.
+# `changes` is a set of (user_id, date) pairs, covering both the old and the
+# new date of a moved task, so listeners can invalidate precisely. The date
+# is None when a recurring series changed, meaning "any date". Single-task
+# changes also pass `task` and `action` ("created", "assigned", "updated",
+# "completed" or "deleted"); membership changes pass `action` "granted" or
+# "revoked" and no task. Bulk operations (home.bulk) pass `action` and
+# `task_ids` instead of a task.
+tasks_changed = Signal()
+
+# True while home.bulk deletes a batch of tasks and does the bookkeeping
+# for all of them itself
+bulk_operation = ContextVar("bulk_operation", default=False)
+
+
+@receiver(post_save, sender=Task)
+def task_saved(sender, instance, created, raw=False, **kwargs):
+    """Keep the task's visibility rows in line with its user/group/date"""
+    if raw:
+        return
+    changes = TaskVisibility.sync_task(instance)
+    if created:
+        action = "assigned" if instance.assigned_by_id else "created"
+    elif instance.completed and not instance._loaded_completed:
+        action = "completed"
+    else:
+        action = "updated"
+    instance._loaded_completed = instance.completed
+    tasks_changed.send(sender=Task, changes=changes, task=instance, action=action)
+
+
+@receiver(pre_delete, sender=Task)
+def task_deleting(sender, instance, **kwargs):
+    """Visibility rows cascade with the task, so read them before they go"""
+    if bulk_operation.get():
+        return
+    rows = list(
+        TaskVisibility.objects.filter(task=instance).values_list(
+            "user_id", "date", "recurring"
+        )
+    )
+    TaskTombstone.record((user_id, instance.pk) for user_id, _, _ in rows)
+    tasks_changed.send(
+        sender=Task, changes=TaskVisibility.change_pairs(rows), task=instance, action="deleted"
+    )
+
+
+@receiver(post_save, sender=GroupMembership)
+def membership_saved(sender, instance, created, raw=False, **kwargs):
+    """New members can see every task already assigned to the group"""
+    if raw or not created:
+        return
+    changes = TaskVisibility.grant_group(instance.group_id, instance.user_id)
+    tasks_changed.send(sender=GroupMembership, changes=changes, action="granted")
+
+
+@receiver(post_delete, sender=GroupMembership)
+def membership_deleted(sender, instance, **kwargs):
+    """Removed members lose the group's tasks (task rows cascade on their own)"""
+    changes = TaskVisibility.revoke_group(instance.group_id, instance.user_id)
+    tasks_changed.send(sender=GroupMembership, changes=changes, action="revoked")
+
+
+@receiver(tasks_changed)
+def bump_data_versions(sender, changes, **kwargs):
+    user_ids = {user_id for user_id, _ in changes}
+    with transaction.atomic():
+        UserDataVersion.bump(user_ids)
+        UserDataVersion.stamp(user_ids)
+
+
+@receiver(tasks_changed)
+def update_task_stats(sender, changes, task=None, action=None, **kwargs):
+    # A single delete is reported before its visibility rows cascade
+    exclude = [task.pk] if action == "deleted" and task is not None else []
+    with transaction.atomic():
+        TaskStats.refresh(changes, exclude=exclude)
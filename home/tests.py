@@ -1,8 +1,15 @@
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.contrib.auth.models import User
-from .models import Project, ProjectMembership, Task, Group, GroupMembership
-from datetime import date
+from django.core.management import call_command
+from .models import (
+    Project, ProjectMembership, Task, Group, GroupMembership, TaskStats, TaskVisibility,
+    UserDataVersion,
+)
+from datetime import date, time
+import json
+from io import StringIO
+from . import recurrence, scheduling, views
 
 
 class ProjectModelTests(TestCase):
@@ -217,3 +224,412 @@ class TaskProjectIntegrationTests(TestCase):
         )
         self.assertEqual(task.project, self.project)
         self.assertIn(task, self.project.tasks.all())
+
+
+class TaskVisibilityTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin_user')
+        self.member = User.objects.create_user(username='member_user')
+        self.outsider = User.objects.create_user(username='outsider')
+        self.group = Group.objects.create(name='Team', created_by=self.admin)
+        GroupMembership.objects.create(group=self.group, user=self.admin, role='admin')
+        GroupMembership.objects.create(group=self.group, user=self.member)
+
+    def visible_ids(self, user):
+        return set(Task.objects.visible_to(user).values_list('id', flat=True))
+
+    def test_personal_task_visible_to_owner_only(self):
+        task = Task.objects.create(title='Mine', date=date(2025, 1, 5), user=self.member)
+        self.assertEqual(self.visible_ids(self.member), {task.id})
+        self.assertEqual(self.visible_ids(self.admin), set())
+
+    def test_group_task_visible_to_all_members(self):
+        task = Task.objects.create(title='Retro', date=date(2025, 1, 5), group=self.group)
+        self.assertEqual(self.visible_ids(self.admin), {task.id})
+        self.assertEqual(self.visible_ids(self.member), {task.id})
+        self.assertEqual(self.visible_ids(self.outsider), set())
+
+    def test_membership_changes_update_visibility(self):
+        task = Task.objects.create(title='Retro', date=date(2025, 1, 5), group=self.group)
+        GroupMembership.objects.create(group=self.group, user=self.outsider)
+        self.assertEqual(self.visible_ids(self.outsider), {task.id})
+
+        GroupMembership.objects.get(group=self.group, user=self.member).delete()
+        self.assertEqual(self.visible_ids(self.member), set())
+
+    def test_removed_member_keeps_directly_assigned_task(self):
+        task = Task.objects.create(
+            title='Assigned', date=date(2025, 1, 5), user=self.member,
+            group=self.group, assigned_by=self.admin,
+        )
+        GroupMembership.objects.get(group=self.group, user=self.member).delete()
+        self.assertEqual(self.visible_ids(self.member), {task.id})
+        self.assertEqual(self.visible_ids(self.admin), {task.id})
+
+    def test_date_range_follows_task_moves(self):
+        task = Task.objects.create(title='Move me', date=date(2025, 1, 5), user=self.member)
+        task.date = date(2025, 2, 10)
+        task.save()
+        january = Task.objects.visible_to(self.member, start=date(2025, 1, 1), end=date(2025, 1, 31))
+        february = Task.objects.visible_to(self.member, start=date(2025, 2, 1), end=date(2025, 2, 28))
+        self.assertFalse(january.exists())
+        self.assertEqual(list(february), [task])
+
+    def test_date_given_as_string(self):
+        task = Task.objects.create(title='Typed', date='2025-03-03', user=self.member)
+        self.assertEqual(task.date, date(2025, 3, 3))
+        march = Task.objects.visible_to(self.member, start=date(2025, 3, 1), end=date(2025, 3, 31))
+        self.assertEqual(list(march), [task])
+
+        series = Task.objects.create(
+            title='Weekly', date='2025-03-03', user=self.member,
+            recurrence='weekly', recurrence_count=3, recurrence_until='2025-03-31',
+        )
+        self.assertEqual(series.recurrence_end, date(2025, 3, 17))
+        self.assertEqual(series.recurrence_until, date(2025, 3, 31))
+        march = Task.objects.occurrences(self.member, date(2025, 3, 1), date(2025, 3, 31))
+        dates = [t.date for t in march if t.pk == series.pk]
+        self.assertEqual(dates, [date(2025, 3, 3), date(2025, 3, 10), date(2025, 3, 17)])
+
+    def test_rebuild_command(self):
+        personal = Task.objects.create(title='Mine', date=date(2025, 1, 5), user=self.member)
+        shared = Task.objects.create(title='Retro', date=date(2025, 1, 6), group=self.group)
+        TaskVisibility.objects.all().delete()
+
+        out = StringIO()
+        call_command('rebuild_task_visibility', stdout=out)
+        self.assertIn('Rebuilt 3', out.getvalue())
+        self.assertEqual(self.visible_ids(self.member), {personal.id, shared.id})
+        self.assertEqual(self.visible_ids(self.admin), {shared.id})
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='etag_user')
+        Task.objects.create(title='Mine', date=date.today(), user=self.user)
+        self.client.force_login(self.user)
+        self.url = reverse('account_dashboard')
+
+    def test_unchanged_data_returns_304_without_task_queries(self):
+        etag = self.client.get(self.url)['ETag']
+        # session, user, data version
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_task_change_changes_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        Task.objects.create(title='Another', date=date.today(), user=self.user)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_profile_edit_changes_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.post(reverse('account_edit'), {'first_name': 'New', 'last_name': '', 'email': ''})
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'New')
+
+    def test_other_users_changes_keep_etag(self):
+        other = User.objects.create_user(username='someone_else')
+        etag = self.client.get(self.url)['ETag']
+        Task.objects.create(title='Theirs', date=date.today(), user=other)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(UserDataVersion.objects.get(user=other).version, 1)
+
+
+class AccountExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='exporter')
+        self.group = Group.objects.create(name='Team', created_by=self.user)
+        GroupMembership.objects.create(group=self.group, user=self.user, role='admin')
+        Task.objects.create(
+            title='Standup', date=date(2025, 3, 4), user=self.user,
+            start_time=time(9, 0), end_time=time(9, 15), category='work', completed=True,
+        )
+        Task.objects.create(title='Retro', date=date(2025, 3, 3), group=self.group)
+        Task.objects.create(
+            title='Gym', date=date(2025, 3, 1), user=self.user, recurrence='weekly',
+        )
+        self.client.force_login(self.user)
+        self.url = reverse('account_export_json')
+
+    def test_json_streams_every_field(self):
+        response = self.client.get(self.url, {'start': '2025-03-01', 'end': '2025-03-14'})
+        self.assertTrue(response.streaming)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(data['user']['username'], 'exporter')
+        self.assertEqual([t['title'] for t in data['tasks']], ['Gym', 'Retro', 'Standup'])
+        standup = data['tasks'][2]
+        self.assertEqual(
+            (standup['start_time'], standup['end_time'], standup['category'], standup['completed']),
+            ('09:00:00', '09:15:00', 'work', True),
+        )
+        self.assertEqual(data['tasks'][1]['group'], self.group.id)
+        self.assertEqual([o['date'] for o in data['occurrences']], ['2025-03-01', '2025-03-08'])
+
+    def test_occurrence_window_is_capped(self):
+        response = self.client.get(
+            self.url, {'format': 'ndjson', 'start': '2025-03-01', 'end': '2125-03-01'}
+        )
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        days = [json.loads(line)['date'] for line in lines if '"occurrence"' in line]
+        self.assertEqual(days[0], '2025-03-01')
+        self.assertLessEqual(len(days), views.EXPORT_MAX_RANGE_DAYS // 7 + 1)
+
+    def test_ndjson_one_object_per_line(self):
+        response = self.client.get(self.url, {'format': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([r['type'] for r in rows], ['user', 'task', 'task', 'task'])
+
+
+class TaskStatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='counter')
+        self.admin = User.objects.create_user(username='lead')
+        self.group = Group.objects.create(name='Team', created_by=self.admin)
+        GroupMembership.objects.create(group=self.group, user=self.admin, role='admin')
+        self.today = date.today()
+        self.task = Task.objects.create(title='Today', date=self.today, user=self.user)
+        Task.objects.create(title='Done', date=self.today, user=self.user, completed=True)
+        Task.objects.create(title='Next year', date=self.today.replace(year=self.today.year + 1), user=self.user)
+        Task.objects.create(title='Team task', date=self.today, group=self.group)
+
+    def snapshot(self, user):
+        stats = TaskStats.objects.get(user=user)
+        return stats.total, stats.completed, stats.months, stats.weeks, stats.upcoming
+
+    def assert_matches_rebuild(self):
+        kept = {u.pk: self.snapshot(u) for u in (self.user, self.admin)}
+        out = StringIO()
+        call_command('rebuild_task_stats', stdout=out)
+        self.assertIn('Rebuilt task stats', out.getvalue())
+        for user in (self.user, self.admin):
+            self.assertEqual(kept[user.pk], self.snapshot(user))
+
+    def test_counters_follow_task_and_membership_changes(self):
+        stats = TaskStats.objects.get(user=self.user)
+        self.assertEqual((stats.total, stats.completed), (3, 1))
+        self.assertEqual(stats.month(self.today), [2, 1])
+
+        GroupMembership.objects.create(group=self.group, user=self.user)
+        self.assertEqual(TaskStats.objects.get(user=self.user).week(self.today), [3, 1])
+        self.task.date = self.today.replace(year=self.today.year + 2)
+        self.task.completed = True
+        self.task.save()
+        Task.objects.get(title='Done').delete()
+        stats = TaskStats.objects.get(user=self.user)
+        self.assertEqual((stats.total, stats.completed, stats.month(self.today)), (3, 1, [1, 0]))
+        self.assert_matches_rebuild()
+
+    def test_dashboard_reads_one_stats_row(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('account_dashboard'))
+        Task.objects.create(title='Another', date=self.today, user=self.user)
+        # session, user, data version, stats, feed token
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('account_dashboard'))
+        self.assertEqual(response.context['total_tasks'], 4)
+        self.assertEqual(
+            [t['title'] for t in response.context['upcoming']],
+            ['Today', 'Done', 'Another', 'Next year'],
+        )
+
+
+class RecurrenceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='repeat_user')
+
+    def test_weekly_expansion_only_covers_window(self):
+        dates = recurrence.occurrence_dates(
+            date(2020, 1, 6), recurrence.WEEKLY, 1, date(2025, 3, 1), date(2025, 3, 31)
+        )
+        self.assertEqual(dates, [date(2025, 3, 3), date(2025, 3, 10), date(2025, 3, 17),
+                                 date(2025, 3, 24), date(2025, 3, 31)])
+
+    def test_interval_until_count_and_exceptions(self):
+        every_other_day = recurrence.occurrence_dates(
+            date(2025, 3, 1), recurrence.DAILY, 2, date(2025, 3, 1), date(2025, 3, 31),
+            until=date(2025, 3, 9), exceptions=['2025-03-05'],
+        )
+        self.assertEqual(every_other_day, [date(2025, 3, 1), date(2025, 3, 3),
+                                           date(2025, 3, 7), date(2025, 3, 9)])
+        three_times = recurrence.occurrence_dates(
+            date(2025, 3, 1), recurrence.DAILY, 1, date(2025, 3, 2), date(2025, 3, 31), count=3,
+        )
+        self.assertEqual(three_times, [date(2025, 3, 2), date(2025, 3, 3)])
+
+    def test_monthly_clamps_to_month_end(self):
+        dates = recurrence.occurrence_dates(
+            date(2025, 1, 31), recurrence.MONTHLY, 1, date(2025, 2, 1), date(2025, 4, 30)
+        )
+        self.assertEqual(dates, [date(2025, 2, 28), date(2025, 3, 31), date(2025, 4, 30)])
+
+    def test_series_end_is_derived_on_save(self):
+        task = Task.objects.create(
+            title='Standup', date=date(2025, 3, 3), user=self.user,
+            recurrence=recurrence.WEEKLY, recurrence_count=4,
+        )
+        self.assertEqual(task.recurrence_end, date(2025, 3, 24))
+        open_ended = Task.objects.create(
+            title='Gym', date=date(2025, 3, 3), user=self.user, recurrence=recurrence.DAILY,
+        )
+        self.assertIsNone(open_ended.recurrence_end)
+
+    def test_occurrences_merge_series_and_one_offs(self):
+        series = Task.objects.create(
+            title='Standup', date=date(2025, 1, 6), user=self.user,
+            start_time=time(9, 0), end_time=time(9, 15), recurrence=recurrence.WEEKLY,
+        )
+        one_off = Task.objects.create(title='Dentist', date=date(2025, 3, 4), user=self.user)
+        Task.objects.create(
+            title='Finished', date=date(2025, 1, 6), user=self.user,
+            recurrence=recurrence.DAILY, recurrence_until=date(2025, 1, 31),
+        )
+        items = Task.objects.occurrences(self.user, date(2025, 3, 3), date(2025, 3, 9))
+        self.assertEqual([(t.id, t.date) for t in items],
+                         [(series.id, date(2025, 3, 3)), (one_off.id, date(2025, 3, 4))])
+        self.assertEqual(items[0].series_date, date(2025, 1, 6))
+
+    def test_get_conflicts_sees_occurrences(self):
+        Task.objects.create(
+            title='Standup', date=date(2025, 1, 6), user=self.user,
+            start_time=time(9, 0), end_time=time(9, 30), recurrence=recurrence.WEEKLY,
+        )
+        conflicts = Task.get_conflicts(self.user, date(2025, 3, 10), time(9, 15), time(10, 0))
+        self.assertEqual([c.title for c in conflicts], ['Standup'])
+        self.assertEqual(Task.get_conflicts(self.user, date(2025, 3, 11), time(9, 15), time(10, 0)), [])
+
+
+class SchedulingTests(TestCase):
+    def make(self, day, start, end, title=''):
+        return Task(title=title, date=date(2025, 3, day), start_time=time(*start), end_time=time(*end))
+
+    def test_overlap_pairs(self):
+        a = self.make(1, (9, 0), (10, 0), 'a')
+        b = self.make(1, (9, 30), (11, 0), 'b')
+        c = self.make(1, (10, 0), (10, 30), 'c')  # touches a, overlaps b
+        d = self.make(2, (9, 0), (10, 0), 'd')  # other day
+        untimed = Task(title='all day', date=date(2025, 3, 1))
+        pairs = {(x.title, y.title) for x, y in scheduling.overlap_pairs([d, c, untimed, b, a])}
+        self.assertEqual(pairs, {('a', 'b'), ('b', 'c')})
+
+    def test_mark_conflicts(self):
+        a = self.make(1, (9, 0), (12, 0), 'a')
+        b = self.make(1, (9, 30), (10, 0), 'b')
+        c = self.make(1, (10, 30), (11, 0), 'c')
+        self.assertEqual(scheduling.mark_conflicts([a, b, c]), 2)
+        self.assertEqual({t.title for t in a.conflicts}, {'b', 'c'})
+        self.assertEqual(c.conflicts, [a])
+
+    def test_pack_columns(self):
+        a = self.make(1, (9, 0), (12, 0), 'a')
+        b = self.make(1, (9, 30), (10, 0), 'b')
+        c = self.make(1, (10, 0), (11, 0), 'c')  # reuses b's column
+        d = self.make(1, (10, 30), (11, 30), 'd')
+        e = self.make(1, (13, 0), (14, 0), 'e')  # separate cluster
+        self.assertEqual(scheduling.pack_columns([e, d, c, b, a]), 3)
+        self.assertEqual([(t.column, t.columns) for t in (a, b, c, d, e)],
+                         [(0, 3), (1, 3), (1, 3), (2, 3), (0, 1)])
+
+    def test_calendar_flags_conflicts(self):
+        user = User.objects.create_user(username='busy')
+        Task.objects.create(title='One', date=date(2025, 3, 3), user=user,
+                            start_time=time(9, 0), end_time=time(10, 0))
+        Task.objects.create(title='Two', date=date(2025, 3, 3), user=user,
+                            start_time=time(9, 30), end_time=time(10, 30))
+        self.client.force_login(user)
+        response = self.client.get(reverse('calendar_app:calendar_view'), {'month': 3, 'year': 2025})
+        self.assertEqual(response.context['conflict_pairs'], 1)
+        self.assertContains(response, 'class="conflict-badge"', count=2)
+
+
+class AssignTaskConflictTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin_user')
+        self.busy = User.objects.create_user(username='busy_member')
+        self.free = User.objects.create_user(username='free_member')
+        self.group = Group.objects.create(name='Team', created_by=self.admin)
+        GroupMembership.objects.create(group=self.group, user=self.admin, role='admin')
+        GroupMembership.objects.create(group=self.group, user=self.busy)
+        GroupMembership.objects.create(group=self.group, user=self.free)
+        Task.objects.create(title='Standup', date=date(2025, 3, 3), user=self.busy,
+                            start_time=time(9, 0), end_time=time(9, 30))
+        Task.objects.create(title='Weekly sync', date=date(2025, 2, 24), user=self.free,
+                            start_time=time(8, 0), end_time=time(8, 30),
+                            recurrence=recurrence.WEEKLY)
+        self.client.force_login(self.admin)
+        self.url = reverse('assign_task', args=[self.group.id])
+        self.data = {
+            'title': 'Review', 'date': '2025-03-03', 'start_time': '09:15',
+            'end_time': '10:00', 'color': 'blue', 'assign_to_all': 'on',
+        }
+
+    def assigned_to(self):
+        return set(Task.objects.filter(title='Review').values_list('user__username', flat=True))
+
+    def test_conflicts_for_all_users_in_one_query(self):
+        ids = [self.admin.id, self.busy.id, self.free.id]
+        with self.assertNumQueries(1):
+            conflicts = Task.get_conflicts_for_users(ids, date(2025, 3, 3), time(8, 15), time(9, 15))
+        self.assertEqual(set(conflicts), {self.busy.id, self.free.id})
+        self.assertEqual([t.title for t in conflicts[self.free.id]], ['Weekly sync'])
+
+    def test_conflicts_are_reported_before_creating(self):
+        response = self.client.post(self.url, self.data)
+        self.assertEqual(response.status_code, 200)
+        report = response.context['conflict_report']
+        self.assertEqual([entry['user'] for entry in report], [self.busy])
+        self.assertContains(response, 'Standup')
+        self.assertEqual(self.assigned_to(), set())
+
+    def test_skip_leaves_out_conflicting_users(self):
+        self.client.post(self.url, dict(self.data, conflict_action='skip'))
+        self.assertEqual(self.assigned_to(), {'admin_user', 'free_member'})
+
+    def test_force_assigns_everyone(self):
+        self.client.post(self.url, dict(self.data, conflict_action='force'))
+        self.assertEqual(self.assigned_to(), {'admin_user', 'busy_member', 'free_member'})
+
+
+class GroupFreeTimeTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin_user')
+        self.member = User.objects.create_user(username='member_user')
+        self.group = Group.objects.create(name='Team', created_by=self.admin)
+        GroupMembership.objects.create(group=self.group, user=self.admin, role='admin')
+        GroupMembership.objects.create(group=self.group, user=self.member)
+        self.url = reverse('group_free_time', args=[self.group.id])
+        self.client.force_login(self.admin)
+
+    def test_free_runs(self):
+        self.assertEqual(list(scheduling.free_runs(0b1110011)), [(0, 2), (4, 3)])
+        self.assertEqual(scheduling.slot_mask(time(9, 10), time(9, 40)), 0b111 << 36)
+
+    def test_windows_avoid_every_members_tasks(self):
+        day = date(2025, 3, 3)
+        Task.objects.create(title='A', date=day, user=self.admin,
+                            start_time=time(9, 0), end_time=time(12, 0))
+        Task.objects.create(title='B', date=day, user=self.member,
+                            start_time=time(13, 0), end_time=time(14, 30))
+        Task.objects.create(title='Daily', date=date(2025, 3, 1), user=self.member,
+                            start_time=time(16, 0), end_time=time(17, 0),
+                            recurrence=recurrence.DAILY)
+        with self.assertNumQueries(5):  # session, user, group, membership, tasks
+            response = self.client.get(self.url, {
+                'start': '2025-03-03', 'end': '2025-03-03', 'duration': 30, 'limit': 5,
+            })
+        windows = [(w['start'], w['end']) for w in response.json()['windows']]
+        self.assertEqual(windows, [('14:30', '16:00'), ('08:00', '09:00'),
+                                   ('12:00', '13:00'), ('17:00', '18:00')])
+
+    def test_non_member_forbidden_and_bad_params(self):
+        outsider = User.objects.create_user(username='outsider')
+        self.client.force_login(outsider)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(self.url, {'duration': 'soon'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start': '2025-01-01', 'end': '2025-12-31'}).status_code, 400)
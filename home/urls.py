@@ -18,6 +18,7 @@ urlpatterns = [
     path("groups/<int:group_id>/add-member/", group_views.group_add_member, name="group_add_member"),
     path("groups/<int:group_id>/remove-member/<int:user_id>/", group_views.group_remove_member, name="group_remove_member"),
     path("groups/<int:group_id>/assign-task/", group_views.assign_task, name="assign_task"),
+    path("groups/<int:group_id>/free-time/", group_views.group_free_time, name="group_free_time"),
     path("my-assigned-tasks/", group_views.my_assigned_tasks, name="my_assigned_tasks"),
     # Project management
     path("projects/", project_views.project_list, name="project_list"),
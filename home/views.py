@@ -3,11 +3,14 @@ from django.contrib.auth import login, logout
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from datetime import timedelta
-from .models import Task
+from datetime import date, timedelta
+from .models import RULE_FIELDS, FeedToken, Task, TaskStats, UserDataVersion
+from . import recurrence
 from .forms import UserUpdateForm
+from .decorators import user_data_condition
 from django.urls import reverse
 
 
@@ -62,33 +65,30 @@ def logout_view(request):
 
 
 @login_required
+@user_data_condition("account")
 def account_dashboard(request):
     user = request.user
     today = timezone.now().date()
 
-    # Get tasks assigned to user OR to groups the user is a member of
-    from django.db.models import Q
-    tasks_qs = Task.objects.filter(
-        Q(user=user) | Q(group__memberships__user=user)
-    ).distinct().order_by("date", "created_at")
-
-    upcoming = tasks_qs.filter(date__gte=today)[:5]
-    total_tasks = tasks_qs.count()
-    this_month = tasks_qs.filter(date__month=today.month, date__year=today.year).count()
-
-    # Simple "next week" window
+    # Counters kept up to date by home.signals; one primary-key lookup
+    stats = TaskStats.for_user(user, today)
     start_week = today - timedelta(days=today.weekday())
     end_week = start_week + timedelta(days=6)
-    weekly = tasks_qs.filter(date__range=[start_week, end_week])
+    feed_token = FeedToken.for_user(user).token
 
     context = {
         "user_obj": user,
-        "total_tasks": total_tasks,
-        "this_month": this_month,
-        "weekly_count": weekly.count(),
-        "upcoming": upcoming,
+        "total_tasks": stats.total,
+        "completed_tasks": stats.completed,
+        "open_tasks": stats.total - stats.completed,
+        "this_month": stats.month(today)[0],
+        "weekly_count": stats.week(today)[0],
+        "upcoming": stats.upcoming,
         "start_week": start_week,
         "end_week": end_week,
+        "feed_url": request.build_absolute_uri(
+            reverse("calendar_app:user_feed", args=[feed_token])
+        ),
     }
     return render(request, "home/account_dashboard.html", context)
 
@@ -99,6 +99,8 @@ def account_edit(request):
         form = UserUpdateForm(request.POST, instance=request.user)
         if form.is_valid():
             form.save()
+            # The dashboard shows the profile, so let its ETag change too
+            UserDataVersion.bump([request.user.pk])
             messages.success(request, "Profile updated.")
             return redirect("account_dashboard")
     else:
@@ -106,37 +108,118 @@ def account_edit(request):
     return render(request, "home/account_edit.html", {"form": form})
 
 
+# Fields of each exported task
+EXPORT_TASK_FIELDS = [
+    "id",
+    "title",
+    "description",
+    "date",
+    "start_time",
+    "end_time",
+    "location",
+    "color",
+    "category",
+    "completed",
+    "group",
+    "project",
+    "created_at",
+    "updated_at",
+    "recurrence",
+    "recurrence_interval",
+    "recurrence_until",
+    "recurrence_count",
+    "recurrence_exceptions",
+]
+# Rows fetched from the database per round trip while exporting
+EXPORT_CHUNK_SIZE = 500
+# Longest ?start=&end= window recurring tasks are expanded for; longer
+# ones are cut short (the same cap as the calendar API's)
+EXPORT_MAX_RANGE_DAYS = 400
+
+
+def _occurrences(user, start, end):
+    """
+    {"task_id", "date"} for each occurrence of the user's series in
+    [start, end], one series at a time so only one is ever expanded
+    """
+    series = (
+        Task.objects.series_visible_to(user, start, end)
+        .order_by("id")
+        .values_list("id", "date", *RULE_FIELDS)
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for task_id, first, freq, interval, until, count, exceptions in series:
+        for day in recurrence.occurrence_dates(
+            first, freq, interval, start, end, until=until, count=count, exceptions=exceptions
+        ):
+            yield {"task_id": task_id, "date": day}
+
+
 @login_required
 def account_export_json(request):
-    """Export ALL user-specific data (profile + tasks) as JSON."""
-    from django.db.models import Q
+    """
+    Export ALL user-specific data (profile + tasks) as JSON.
+
+    Recurring tasks are exported once, with their rule. Pass ?start=&end=
+    (YYYY-MM-DD) to also get their occurrences expanded for that window,
+    series by series; the window is capped at EXPORT_MAX_RANGE_DAYS.
+
+    The response is streamed: tasks are read EXPORT_CHUNK_SIZE rows at a
+    time and written out as they arrive, so memory stays flat however
+    big the account is. ?format=ndjson gives one JSON object per line
+    instead, each with a "type" of "user", "task" or "occurrence".
+    """
     user = request.user
-    # Export tasks assigned to user OR to groups the user is a member of
-    tasks = list(
-        Task.objects.filter(
-            Q(user=user) | Q(group__memberships__user=user)
-        )
-        .distinct()
-        .order_by("date", "created_at")
-        .values(
-            "id",
-            "title",
-            "description",
-            "date",
-            "location",
-            "color",
-            "created_at",
-        )
-    )
-    data = {
-        "user": {
-            "username": user.username,
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-            "email": user.email,
-            "date_joined": user.date_joined,
-            "last_login": user.last_login,
-        },
-        "tasks": tasks,
+    ndjson = request.GET.get("format") == "ndjson"
+    profile = {
+        "username": user.username,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "email": user.email,
+        "date_joined": user.date_joined,
+        "last_login": user.last_login,
     }
-    return JsonResponse(data, safe=True)
+    # Export tasks assigned to user OR to groups the user is a member of,
+    # in (user, date, task) index order so the database needn't sort
+    tasks = (
+        Task.objects.visible_to(user)
+        .order_by("visibility__date", "id")
+        .values(*EXPORT_TASK_FIELDS)
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+    try:
+        start = date.fromisoformat(request.GET["start"])
+        end = date.fromisoformat(request.GET["end"])
+    except (KeyError, ValueError):
+        start = end = None
+    occurrences = None
+    if start and end and start <= end:
+        end = min(end, start + timedelta(days=EXPORT_MAX_RANGE_DAYS))
+        occurrences = _occurrences(user, start, end)
+
+    encode = DjangoJSONEncoder(separators=(",", ":")).encode
+
+    def stream_ndjson():
+        yield encode({"type": "user", **profile}) + "\n"
+        for task in tasks:
+            yield encode({"type": "task", **task}) + "\n"
+        for occurrence in occurrences or ():
+            yield encode({"type": "occurrence", **occurrence}) + "\n"
+
+    def stream_json():
+        # One JSON document, written out a piece at a time
+        yield '{"user":' + encode(profile) + ',"tasks":['
+        for i, task in enumerate(tasks):
+            yield ("," if i else "") + encode(task)
+        yield "]"
+        if occurrences is not None:
+            yield ',"occurrences":['
+            for i, occurrence in enumerate(occurrences):
+                yield ("," if i else "") + encode(occurrence)
+            yield "]"
+        yield "}"
+
+    if ndjson:
+        return StreamingHttpResponse(stream_ndjson(), content_type="application/x-ndjson")
+    return StreamingHttpResponse(stream_json(), content_type="application/json")